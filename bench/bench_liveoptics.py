@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - LiveOptics normalization benchmark
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+# Times the LiveOptics normalization (unit conversion, and the guest IP lists when they are wanted) and the join of the
+# VM Performance tab, against a plain pd.merge, on a synthetic inventory; with --workbook, also times reading a generated
+# LiveOptics workbook end to end:
+#   python3 bench/bench_liveoptics.py --vms 100000 --workbook
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_transform import lova_normalize, indexed_join, lova_inventory
+from generate_inventory import liveoptics_workbook
+
+
+def vm_frame(vms, rng):
+    '''The VMs tab as lova_inventory holds it before normalization.'''
+    return pd.DataFrame({
+        "vmId": [f'vm-{count}' for count in range(vms)],
+        "sourceFile": "liveoptics.xlsx",
+        "os": rng.choice(["Ubuntu", None], vms),
+        "Guest IP1": rng.choice(["10.0.0.1", None], vms),
+        "Guest IP2": rng.choice(["10.0.0.2", None], vms),
+        "Guest IP3": None,
+        "Guest IP4": None,
+        "vmdkUsed": rng.integers(1, 1000000, vms).astype(float),
+        "vmdkTotal": rng.integers(1, 1000000, vms).astype(float),
+        "vRam": rng.integers(1, 100000, vms)
+        })
+
+
+def best_of(runs, setup, timed):
+    best = None
+    for run in range(runs):
+        data = setup()
+        started = time.perf_counter()
+        timed(data)
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmarks the LiveOptics normalization and performance join.")
+    parser.add_argument('--vms', type = int, default = 100000)
+    parser.add_argument('--runs', type = int, default = 3)
+    parser.add_argument('--workbook', action = 'store_true', help = "Also time lova_inventory on a generated workbook (slow to generate).")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    performance = pd.DataFrame({"vmId": [f'vm-{count}' for count in range(args.vms)], "sourceFile": "liveoptics.xlsx", "readIOPS": 1.0, "writeIOPS": 2.0})
+    performance = performance.sample(frac = 1, random_state = 0)
+
+    timings = {
+        "normalize": (best_of(args.runs, lambda: vm_frame(args.vms, rng), lambda vms: lova_normalize(vms, False)), args.runs),
+        "normalize with IP lists": (best_of(args.runs, lambda: vm_frame(args.vms, rng), lambda vms: lova_normalize(vms, True)), args.runs),
+        "performance join (indexed)": (best_of(args.runs, lambda: lova_normalize(vm_frame(args.vms, rng)), lambda vms: indexed_join(vms, performance)), args.runs),
+        "performance join (pd.merge)": (best_of(args.runs, lambda: lova_normalize(vm_frame(args.vms, rng)), lambda vms: pd.merge(vms, performance, on = ["vmId", "sourceFile"], how = "left")), args.runs)
+        }
+
+    if args.workbook is True:
+        with tempfile.TemporaryDirectory() as input_path:
+            liveoptics_workbook(os.path.join(input_path, 'liveoptics.xlsx'), args.vms)
+            timings["lova_inventory (workbook)"] = (best_of(1, lambda: None, lambda data: lova_inventory(input_path = os.path.join(input_path, ''), file_name = ['liveoptics.xlsx'], dedup = None)), 1)
+
+    for name, (seconds, runs) in timings.items():
+        print(f'{name:30s} {seconds * 1000:8.0f} ms   ({args.vms} VMs, best of {runs})')
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - streaming and inventory store benchmark
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+# Sizes a generated RVTools workbook against the mock Sizer three ways - the csv-based batch path, --stream and --store -
+# each in a process of its own, and reports the wall time and peak memory of each, and whether they sent the same request
+# (the batch path saves the request indented, so the requests are compared as parsed):
+#   python3 bench/bench_stream.py --vms 100000 300000
+
+import argparse
+import json
+import os
+import resource
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from generate_inventory import rvtools_workbook
+
+
+def run_sizing(cli_args):
+    '''Run in a process of its own: sizes against the mock Sizer, then reports the peak memory of the process.'''
+    from mock_sizer import serve, redirect_sizer
+    redirect_sizer(serve(latency = 0))
+    cli = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sizer-cli.py')
+    sys.argv = [cli] + cli_args
+    try:
+        runpy.run_path(cli, run_name = '__main__')
+    finally:
+        print(peak_memory_mb(), file = sys.stderr)
+
+
+def peak_memory_mb():
+    # ru_maxrss carries over the parent's peak across fork and exec on Linux; VmHWM is this program's alone
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status', "r") as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) // 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def saved_request(output_path):
+    with open(os.path.join(output_path, 'custom_recommendation_request.txt'), "r") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmarks the batch, streamed and inventory store sizing paths.")
+    parser.add_argument('--vms', type = int, nargs = '+', default = [100000])
+    parser.add_argument('--chunk_size', type = int, default = 50000)
+    parser.add_argument('--run', nargs = argparse.REMAINDER, help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        run_sizing(args.run)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as work_path:
+        for vms in args.vms:
+            input_path = os.path.join(work_path, f'input_{vms}')
+            os.makedirs(input_path)
+            rvtools_workbook(os.path.join(input_path, 'rvtools.xlsx'), vms)
+            modes = {"batch": [], "stream": ['-stream'], "store": ['-store', os.path.join(work_path, f'store_{vms}')]}
+            for mode, mode_args in modes.items():
+                output_path = os.path.join(work_path, f'output_{vms}_{mode}')
+                cli_args = ['custom', '-ft', 'rv-tools', '-fn', 'rvtools.xlsx', '-in', input_path, '-out', output_path, '-wp', 'all_clusters', '-ps', 'p', '-chunk', str(args.chunk_size)] + mode_args
+                started = time.perf_counter()
+                result = subprocess.run([sys.executable, __file__, '--run'] + cli_args, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True, check = True)
+                seconds = time.perf_counter() - started
+                same = saved_request(output_path) == saved_request(os.path.join(work_path, f'output_{vms}_batch'))
+                print(f'{vms:8d} VMs  {mode:6s}  {seconds:6.1f}s  peak RSS {result.stderr.split()[-1]:>5s} MB  request {"identical to batch" if same else "DIFFERS from batch"}')
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - adapter upload benchmark
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+# Uploads several files to the mock Sizer's adapter endpoint, one at a time and then concurrently, and reports the
+# throughput and the peak memory of each run.  The mock counts the bytes it receives without parsing them, so the files
+# are random bytes:
+#   python3 bench/bench_upload.py --files 4 --size_mb 50 --workers 1 4
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def upload(input_path, file_name, workers):
+    '''Run in a process of its own, so the peak memory reported is that of the upload alone.'''
+    from mock_sizer import serve, redirect_sizer
+    from sizer_json import parse_excel_api
+    redirect_sizer(serve())
+    started = time.perf_counter()
+    json_response = parse_excel_api(file_type = 'rvtools', input_path = input_path, file_name = file_name, workers = workers)
+    seconds = time.perf_counter() - started
+    received = sum(profile['bytes'] for profile in json_response['response']['sizerRequest']['workloadProfiles'])
+    print(f'workers={workers} files={len(file_name)} {received / 1e6:.0f} MB in {seconds:.2f}s = {received / 1e6 / seconds:.0f} MB/s, peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmarks concurrent uploads to the adapter endpoint of the mock Sizer.")
+    parser.add_argument('--files', type = int, default = 4)
+    parser.add_argument('--size_mb', type = int, default = 50)
+    parser.add_argument('--workers', type = int, nargs = '+', default = [1, 4])
+    parser.add_argument('--upload', nargs = '+', help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.upload is not None:
+        upload(args.upload[0], args.upload[1:], args.workers[0])
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as input_path:
+        file_name = [f'upload_{count}.xlsx' for count in range(1, args.files + 1)]
+        for file in file_name:
+            with open(os.path.join(input_path, file), "wb") as f:
+                for block in range(args.size_mb):
+                    f.write(os.urandom(1 << 20))
+        for workers in args.workers:
+            subprocess.run([sys.executable, __file__, '--workers', str(workers), '--upload', os.path.join(input_path, '')] + file_name, check = True)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - synthetic inventory generator
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+# Writes RVTools or LiveOptics workbooks of any size, for the benchmarks and the stress tests:
+#   python3 bench/generate_inventory.py rv-tools 100000 input/rvtools_100k.xlsx
+
+import argparse
+import numpy as np
+import pandas as pd
+
+
+def rvtools_workbook(path, vms, start=0, vcenter="vc1", seed=0):
+    '''Writes an RVTools export of vms VMs, numbered from start, with the vInfo, vDisk and vPartition tabs.'''
+    rng = np.random.default_rng(seed)
+    vm_ids = [f'vm-{count}' for count in range(start, start + vms)]
+    vinfo = pd.DataFrame({
+        "VM": [f'name{count}' for count in range(start, start + vms)],
+        "Powerstate": rng.choice(["poweredOn", "poweredOff", "suspended"], vms),
+        "CPUs": rng.integers(1, 16, vms),
+        "Memory": rng.integers(1, 64, vms) * 1024,
+        "Provisioned MiB": rng.integers(10, 500, vms) * 1024.0,
+        "In Use MiB": rng.integers(5, 100, vms) * 1024.0,
+        "Primary IP Address": "10.0.0.1",
+        "DNS Name": "host",
+        "Cluster": rng.choice(["clA", "clB", "clC"], vms),
+        "Datacenter": "dc",
+        "OS according to the VMware Tools": rng.choice(["Ubuntu Linux (64-bit)", "Microsoft Windows Server 2019"], vms),
+        "VM ID": vm_ids,
+        "VM UUID": [f'uuid-{count}' for count in range(start, start + vms)],
+        "VI SDK Server": vcenter
+        })
+    vdisk = pd.DataFrame({"VM ID": vm_ids * 2, "Capacity MiB": 50 * 1024.0})
+    vpartition = pd.DataFrame({"VM ID": vm_ids, "Consumed MiB": 20 * 1024.0})
+    with pd.ExcelWriter(path) as writer:
+        vinfo.to_excel(writer, sheet_name = "vInfo", index = False)
+        vdisk.to_excel(writer, sheet_name = "vDisk", index = False)
+        vpartition.to_excel(writer, sheet_name = "vPartition", index = False)
+
+
+def liveoptics_workbook(path, vms, start=0, seed=0):
+    '''Writes a LiveOptics export of vms VMs, numbered from start, with the VMs and VM Performance tabs.'''
+    rng = np.random.default_rng(seed)
+    vm_ids = [f'vm-{count}' for count in range(start, start + vms)]
+    vm_tab = pd.DataFrame({
+        "VM Name": [f'name{count}' for count in range(start, start + vms)],
+        "MOB ID": vm_ids,
+        "Power State": rng.choice(["poweredOn", "poweredOff"], vms),
+        "Virtual CPU": rng.integers(1, 16, vms),
+        "Provisioned Memory (MiB)": rng.integers(1, 64, vms) * 1024,
+        "Virtual Disk Size (MiB)": rng.integers(10, 500, vms) * 1024.0,
+        "Virtual Disk Used (MiB)": rng.integers(5, 100, vms) * 1024.0,
+        "Cluster": rng.choice(["clA", "clB"], vms),
+        "Datacenter": "dc",
+        "VM OS": rng.choice(["Ubuntu", "Windows"], vms),
+        "Guest Hostname": "host",
+        "Guest IP1": "10.0.0.1",
+        "Guest IP2": None,
+        "Guest IP3": None,
+        "Guest IP4": None
+        })
+    performance_tab = pd.DataFrame({
+        "MOB ID": vm_ids,
+        "Avg Read IOPS": 10, "Avg Write IOPS": 5, "Peak Read IOPS": 20, "Peak Write IOPS": 10,
+        "Avg Read MB/s": 1, "Avg Write MB/s": 1, "Peak Read MB/s": 2, "Peak Write MB/s": 2
+        })
+    with pd.ExcelWriter(path) as writer:
+        vm_tab.to_excel(writer, sheet_name = "VMs", index = False)
+        performance_tab.to_excel(writer, sheet_name = "VM Performance", index = False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Writes a synthetic RVTools or LiveOptics workbook.")
+    parser.add_argument('file_type', choices = ['rv-tools', 'live-optics'])
+    parser.add_argument('vms', type = int)
+    parser.add_argument('path')
+    parser.add_argument('--start', type = int, default = 0, help = "Number of the first VM; overlapping ranges make duplicate VMs.")
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+    match args.file_type:
+        case 'rv-tools':
+            rvtools_workbook(args.path, args.vms, args.start, seed = args.seed)
+        case 'live-optics':
+            liveoptics_workbook(args.path, args.vms, args.start, seed = args.seed)
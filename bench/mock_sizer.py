@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - mock Sizer service
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+# A local stand-in for the VMware Cloud Sizer API, for the benchmarks and the stress tests.  Run as a script, it runs the CLI
+# with every Sizer call sent to the mock:
+#   python3 bench/mock_sizer.py custom -ft rv-tools -fn rvtools_file.xlsx -wp all_clusters
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sizer_json import get_sizer_session
+
+
+def mock_recommendation(hosts=3, host_type="I4I"):
+    '''A recommendation shaped as the Sizer returns it, with one SAZ cluster of the given hosts.'''
+    host = {"hostType": host_type, "vmList": [{"vmName": "vm1"}], "cpu": 1}
+    return {
+        "calculationLog": "calculations",
+        "sizingAssumtions": ["The recommendation was made by the mock Sizer service."],
+        "sddcList": [{
+            "clusterList": {"sazClusters": {
+                "hostBreakupList": [{"hostType": host_type, "hostCount": hosts}],
+                "clusterInfoList": [{"hostList": [dict(host) for count in range(hosts)]}]}, "mazClusters": None},
+            "externalStorageList": [],
+            "vmExceptions": {"vmExceptionInfo": [], "limitedHostCompatibility": []}}]}
+
+
+class MockSizerHandler(BaseHTTPRequestHandler):
+    '''Answers the adapter and recommendation calls; the request body is read in blocks and counted, never held whole.'''
+    protocol_version = 'HTTP/1.1'
+    latency = 0.2
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        received = 0
+        while received < length:
+            received += len(self.rfile.read(min(1 << 20, length - received)))
+        time.sleep(self.latency)
+
+        if '/sizing/adapter/' in self.path:
+            profile = {"profileName": "WP1", "bytes": received, "vmList": [{"vmName": "vm1"}]}
+            body = {"response": {"sizerRequest": {"configurations": {"cloudType": "VMC_ON_AWS"}, "workloadProfiles": [profile]}}}
+        elif '/recommendation' in self.path:
+            body = mock_recommendation()
+        else:
+            self.send_error(404)
+            return
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class RedirectAdapter(HTTPAdapter):
+    '''Sends the calls addressed to the Sizer to the mock service instead.'''
+    def __init__(self, url, **kwargs):
+        self.url = url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace('https://vmc.vmware.com', self.url)
+        return super().send(request, **kwargs)
+
+
+def serve(port=0, latency=0.2):
+    '''Starts the mock service on a background thread; returns the server, listening on server.server_address.'''
+    handler = type('MockSizer', (MockSizerHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return server
+
+
+def redirect_sizer(server):
+    '''Points the shared Sizer session at the mock service.'''
+    get_sizer_session().mount('https://vmc.vmware.com', RedirectAdapter(f'http://127.0.0.1:{server.server_address[1]}', pool_maxsize = 32))
+
+
+if __name__ == "__main__":
+    import runpy
+    redirect_sizer(serve(latency = float(os.environ.get('MOCK_SIZER_LATENCY', 0.2))))
+    cli = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sizer-cli.py')
+    sys.argv = [cli] + sys.argv[1:]
+    runpy.run_path(cli, run_name = '__main__')
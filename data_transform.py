@@ -6,50 +6,222 @@
 ### SPDX-License-Identifier: MIT License
 ################################################################################
 
+import gzip
+import io
 import json
+import os
+import re
+import hashlib
+import shutil
+import tempfile
+import threading
+import zipfile
+import numpy as np
 import pandas as pd
 from pandas import json_normalize
+from pandas.io.parsers import TextParser
+from openpyxl import load_workbook
 import sys
+from inventory_store import InventoryStore
+from sizer_metrics import get_sizing_metrics, log
 
+try:
+    import pyarrow
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    CSV_ENGINE = 'c'
 
-def data_describe(output_path,csv_file):
-    vm_data_df = pd.read_csv(f'{output_path}{csv_file}')
+
+def inventory_signature(**kwargs):
+    '''Identifies a parsed inventory by the input files (name, size, modification time) and the dedup option used to produce it.'''
+    input_path = kwargs['input_path']
+    file_name = kwargs['file_name']
+
+    signature = hashlib.sha256()
+    signature.update(str(kwargs.get('dedup')).encode())
+    for file in file_name:
+        for path in input_files(f'{input_path}{file}'):
+            stat = os.stat(path)
+            signature.update(f'{path}|{stat.st_size}|{stat.st_mtime_ns}'.encode())
+    return signature.hexdigest()
+
+
+def input_files(file_path):
+    '''The files making up an input - the csv exports in a directory of them, or the file itself.'''
+    if os.path.isdir(file_path):
+        return [os.path.join(file_path, f) for f in sorted(os.listdir(file_path)) if os.path.isfile(os.path.join(file_path, f))]
+    return [file_path]
+
+
+def inventory_cache_current(**kwargs):
+    '''True if the converted csv file and its cached inventory were produced from the same inputs.'''
+    output_path = kwargs['output_path']
+    csv_file = kwargs['csv_file']
+    signature = kwargs['signature']
+
+    for suffix in ['', '.pkl', '.sig']:
+        if not os.path.exists(f'{output_path}{csv_file}{suffix}'):
+            return False
+    try:
+        with open(f'{output_path}{csv_file}.sig', "r") as f:
+            return f.read() == signature
+    except FileNotFoundError:
+        # removed by a run rewriting the cache
+        return False
+
+
+def read_inventory_cache(**kwargs):
+    '''Returns the cached, typed inventory for a converted csv file, or None if there is none or it cannot be read.'''
+    output_path = kwargs['output_path']
+    csv_file = kwargs['csv_file']
+
+    if not os.path.exists(f'{output_path}{csv_file}.pkl'):
+        return None
+    try:
+        return pd.read_pickle(f'{output_path}{csv_file}.pkl')
+    except Exception:
+        # a truncated or otherwise unreadable cache is treated as a miss - the csv file is read instead
+        return None
+
+
+def write_inventory_cache(**kwargs):
+    '''Writes the converted csv file and its cached inventory, each to a temporary file renamed into place.
+
+    The signature is removed first and written last, so a run interrupted part way leaves no signature - and so no cache hit - for a partial cache.'''
+    output_path = kwargs['output_path']
+    csv_file = kwargs['csv_file']
+    signature = kwargs['signature']
+    inventory = kwargs['inventory']
+
+    temp_suffix = f'{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        os.remove(f'{output_path}{csv_file}.sig')
+    except FileNotFoundError:
+        pass
+    inventory.to_csv(f'{output_path}{csv_file}.{temp_suffix}')
+    os.replace(f'{output_path}{csv_file}.{temp_suffix}', f'{output_path}{csv_file}')
+    inventory.to_pickle(f'{output_path}{csv_file}.pkl.{temp_suffix}')
+    os.replace(f'{output_path}{csv_file}.pkl.{temp_suffix}', f'{output_path}{csv_file}.pkl')
+    with open(f'{output_path}{csv_file}.sig.{temp_suffix}', "w") as f:
+        f.write(signature)
+    os.replace(f'{output_path}{csv_file}.sig.{temp_suffix}', f'{output_path}{csv_file}.sig')
+
+
+def inventory_summary(vm_data_df):
+    '''Computes the describe aggregates - totals, power states and per-cluster / per-OS rollups - as plain JSON-ready values.'''
+    metrics = ['vCpu', 'vRam', 'vmdkUsed', 'vmdkTotal']
+    aggregations = {"vms": ('vmId', 'size')}
+    aggregations.update({metric: (metric, 'sum') for metric in metrics})
+
+    # per-cluster and per-OS rollups in a single grouped pass each; overall totals are derived from the cluster rollup
+    cluster_rollup = vm_data_df.groupby('cluster', dropna = False, observed = True).agg(**aggregations)
+    os_rollup = vm_data_df.groupby('os', dropna = False, observed = True).agg(**aggregations)
+
+    summary = {}
+    summary['total_vms'] = int(cluster_rollup['vms'].sum())
+    summary['totals'] = {metric: cluster_rollup[metric].sum().item() for metric in metrics}
+    summary['power_states'] = {str(k): int(v) for k, v in vm_data_df['vmState'].value_counts().items()}
+    summary['total_clusters'] = len(cluster_rollup)
+    summary['total_os'] = len(os_rollup)
+    summary['clusters'] = json.loads(cluster_rollup.to_json(orient = 'index'))
+    summary['os'] = json.loads(os_rollup.to_json(orient = 'index'))
+    summary['statistics'] = json.loads(vm_data_df[metrics].describe().to_json())
+    return summary
+
+
+def data_describe(output_path,csv_file,preview_rows=10):
+    vm_data_df = read_inventory_cache(output_path=output_path, csv_file=csv_file)
+    if vm_data_df is None:
+        vm_data_df = pd.read_csv(f'{output_path}{csv_file}', index_col=0, dtype={'vmId':str, 'vmName':str, 'cluster':str, 'vmState':'category'})
 
     # Ensure guest OS column is cast as string to better handle blank values
     vm_data_df['os'] = vm_data_df['os'].astype(str)
 
-    print(f'\n{vm_data_df}')
-    print(f'\nTotal VM: {vm_data_df.vmName.count()}')
+    summary = inventory_summary(vm_data_df)
+    summary_file = csv_file.replace('.csv', '_summary.json')
+    with open(f'{output_path}{summary_file}', "w") as f:
+        print(json.dumps(summary, indent=2), file=f)
+
+    # show only a bounded preview on the terminal - the full summary is in the JSON file
+    print(f'\n{vm_data_df.head(preview_rows).to_string()}')
+    print(f'\nTotal VM: {summary["total_vms"]}')
     print("\nVM Power States:")
-    print(vm_data_df['vmState'].value_counts())
-    print(f'\nTotal unique operating systems: {vm_data_df.os.nunique()}')
-    print('\nGuest operating systems:')
-    print(vm_data_df.groupby('os')['vmId'].nunique())
-    print(f'\nTotal Clusters: {vm_data_df.cluster.nunique()}')
-    print(f'Cluster names: {vm_data_df.cluster.unique()}')
-    print(f'\nTotal vCPU: {vm_data_df.vCpu.sum()}')
-    print(f'\nTotal vRAM (GiB): {vm_data_df.vRam.sum()}')
-    print(f'\nTotal used VMDK (GiB): {vm_data_df.vmdkUsed.sum()}')
-    print(f'\nTotal provisioned VMDK (GiB): {vm_data_df.vmdkTotal.sum()}')
-    print(f'\n{vm_data_df.describe()}')
+    for state, count in summary['power_states'].items():
+        print(f'  {state}: {count}')
+    print(f'\nTotal unique operating systems: {summary["total_os"]}')
+    print(f'\nTotal Clusters: {summary["total_clusters"]}')
+    print(f'\nTotal vCPU: {summary["totals"]["vCpu"]}')
+    print(f'\nTotal vRAM (GiB): {summary["totals"]["vRam"]}')
+    print(f'\nTotal used VMDK (GiB): {summary["totals"]["vmdkUsed"]}')
+    print(f'\nTotal provisioned VMDK (GiB): {summary["totals"]["vmdkTotal"]}')
+
+    for rollup in ['clusters', 'os']:
+        rollup_df = pd.DataFrame.from_dict(summary[rollup], orient = 'index').sort_values('vms', ascending = False)
+        print(f'\nTop {min(preview_rows, len(rollup_df))} of {len(rollup_df)} by VM count ({rollup}):')
+        print(rollup_df.head(preview_rows).to_string())
+
+    print(f'\nFull summary saved to {output_path}{summary_file}')
 
 
 def lova_conversion(**kwargs):
+    output_path = kwargs['output_path']
+
+    # reuse the previously parsed inventory if the input files have not changed
+    csv_file = "1_vmdata_df_lova.csv"
+    signature = inventory_signature(**kwargs)
+    cached = inventory_cache_current(output_path=output_path, csv_file=csv_file, signature=signature)
+    get_sizing_metrics().cache_lookup('inventory', cached)
+    if cached is True:
+        log('info', f'\nInput file(s) unchanged - using cached inventory {output_path}{csv_file}')
+        return csv_file
+
+    # describe and custom share the converted inventory, so it always carries the guest IPs describe saves
+    vm_consolidated = lova_inventory(ip_addresses=True, **kwargs)
+
+    write_inventory_cache(output_path=output_path, csv_file=csv_file, signature=signature, inventory=vm_consolidated)
+    return csv_file
+
+
+def lova_inventory(**kwargs):
     input_path = kwargs['input_path']
     file_name = kwargs['file_name'] 
-    output_path = kwargs['output_path']
+    output_path = kwargs.get('output_path')
+    dedup_key = kwargs.get('dedup')
 
-    print()
-    print("Parsing LiveOptics file(s) locally.")
+    log('info', "\nParsing LiveOptics file(s) locally.")
 
     df_list = []
     for file in file_name:
-        file_df = pd.read_excel(f'{input_path}{file}', sheet_name="VMs")
+        file_df = read_sheet(f'{input_path}{file}', 'VMs')
+        file_df['sourceFile'] = file
         df_list.append(file_df)
     vmdata_df = pd.concat(df_list, axis=0, ignore_index=True)
 
+    vmdata_df = lova_vms(vmdata_df, kwargs.get('ip_addresses', False))
+
+    # collapse VMs seen in more than one export, if desired
+    if dedup_key is not None:
+        vmdata_df = dedup_workloads(vmdata_df=vmdata_df, dedup_key=dedup_key, output_path=output_path)
+
+    # pull in rows from VM Performance for storage performance metrics
+    diskperf_list = []
+    for file in file_name:
+        disk_df = read_sheet(f'{input_path}{file}', 'VM Performance')
+        disk_df['sourceFile'] = file
+        diskperf_list.append(disk_df)
+    diskperf_df = pd.concat(diskperf_list, axis=0, ignore_index=True)
+
+    diskperf_df = lova_performance(diskperf_df)
+
+    # performance rows are matched to the VM from the same file, so duplicates across files are not double-counted
+    vm_consolidated = indexed_join(vmdata_df, diskperf_df)
+
+    return vm_consolidated
+
+
+def lova_vms(vmdata_df, ip_addresses=False):
     # specify columns to KEEP - all others will be dropped
-    keep_columns = ['Cluster','Datacenter','Guest IP1','Guest IP2','Guest IP3','Guest IP4','VM OS','Guest Hostname', 'Power State', 'Virtual CPU', 'VM Name', 'MOB ID']
+    keep_columns = ['Cluster','Datacenter','Guest IP1','Guest IP2','Guest IP3','Guest IP4','VM OS','Guest Hostname', 'Power State', 'Virtual CPU', 'VM Name', 'MOB ID', 'VM UUID', 'vCenter', 'sourceFile']
     if 'Virtual Disk Size (MiB)' in vmdata_df:
         keep_columns.extend(['Virtual Disk Size (MiB)','Virtual Disk Used (MiB)', 'Provisioned Memory (MiB)'])
     else:
@@ -66,7 +238,8 @@ def lova_conversion(**kwargs):
         'Power State':'vmState',
         'Virtual CPU':'vCpu',
         'Cluster':'cluster',
-        'Datacenter':'virtualDatacenter'
+        'Datacenter':'virtualDatacenter',
+        'VM UUID':'vmUuid'
         }, inplace = True)
 
     if 'Virtual Disk Size (MiB)' in vmdata_df:
@@ -82,29 +255,12 @@ def lova_conversion(**kwargs):
             'Virtual Disk Used (MB)':'vmdkUsed',
             }, inplace = True)
 
-    fillna_values = {"Guest IP1": "no ip", "Guest IP2": "no ip", "Guest IP3": "no ip", "Guest IP4": "no ip", "os": "none specified"}
-    vmdata_df.fillna(value=fillna_values, inplace = True)
-
-    # aggregate IP addresses into one column
-    vmdata_df['ip_addresses'] = vmdata_df['Guest IP1'].map(str)+ ', ' + vmdata_df['Guest IP2'].map(str)+ ', ' + vmdata_df['Guest IP3'].map(str)+ ', ' + vmdata_df['Guest IP4'].map(str)
-    vmdata_df['ip_addresses'] = vmdata_df.ip_addresses.str.replace(', no ip' , '')
-    vmdata_df.drop(['Guest IP1', 'Guest IP2', 'Guest IP3', 'Guest IP4'], axis=1, inplace=True)
-
-    # convert RAM and storage numbers into GB
-    vmdata_df['vmdkUsed'] = vmdata_df['vmdkUsed']/1024
-    vmdata_df['vmdkTotal'] = vmdata_df['vmdkTotal']/1024
-    vmdata_df['vRam'] = vmdata_df['vRam']/1024
-
-    vm_df_export = vmdata_df.round({'vmdkUsed':0,'vmdkTotal':0,'vRam':0})
+    vmdata_df = lova_normalize(vmdata_df, ip_addresses)
+    return vmdata_df
 
-    # pull in rows from VM Performance for storage performance metrics
-    diskperf_list = []
-    for file in file_name:
-        disk_df = pd.read_excel(f'{input_path}{file}', sheet_name = 'VM Performance')
-        diskperf_list.append(disk_df)
-    diskperf_df = pd.concat(diskperf_list, axis=0, ignore_index=True)
 
-    perf_columns = ["MOB ID","Avg Read IOPS","Avg Write IOPS","Peak Read IOPS","Peak Write IOPS","Avg Read MB/s","Avg Write MB/s","Peak Read MB/s","Peak Write MB/s"]
+def lova_performance(diskperf_df):
+    perf_columns = ["sourceFile","MOB ID","Avg Read IOPS","Avg Write IOPS","Peak Read IOPS","Peak Write IOPS","Avg Read MB/s","Avg Write MB/s","Peak Read MB/s","Peak Write MB/s"]
     diskperf_df = diskperf_df.filter(items= perf_columns, axis= 1)
     diskperf_df.rename(columns = {
         'MOB ID':'vmId', 
@@ -117,32 +273,428 @@ def lova_conversion(**kwargs):
         'Peak Read MB/s':'peakReadThroughput',
         'Peak Write MB/s':'peakWriteThroughput'
         }, inplace = True)
+    return diskperf_df
 
-    vm_consolidated = pd.merge(vmdata_df, diskperf_df, on = "vmId", how = "left")
 
-    vm_consolidated.to_csv(f'{output_path}1_vmdata_df_lova.csv')
+def lova_normalize(vmdata_df, ip_addresses=False):
+    '''Converts LiveOptics MiB values to GiB in a single array operation; guest IPs are only aggregated if requested, as they are never sent to the sizer.'''
+    vmdata_df.fillna(value={"os": "none specified"}, inplace = True)
 
-    csv_file = "1_vmdata_df_lova.csv"
-    return csv_file
+    ip_columns = [column for column in ['Guest IP1', 'Guest IP2', 'Guest IP3', 'Guest IP4'] if column in vmdata_df]
+    if ip_addresses is True:
+        vmdata_df['ip_addresses'] = aggregate_ip_addresses(vmdata_df, ip_columns)
+    vmdata_df.drop(ip_columns, axis=1, inplace=True)
+
+    # convert RAM and storage numbers into GB
+    unit_columns = ['vmdkUsed', 'vmdkTotal', 'vRam']
+    vmdata_df[unit_columns] = vmdata_df[unit_columns].to_numpy(dtype = 'float64') / 1024
+    return vmdata_df
+
+
+def aggregate_ip_addresses(vmdata_df, ip_columns):
+    '''Joins the guest IP columns into one comma-separated string per VM, skipping blank addresses after the first.'''
+    if len(ip_columns) == 0:
+        return pd.Series("no ip", index = vmdata_df.index)
+    ip_addresses = vmdata_df[ip_columns[0]].fillna("no ip").astype(str).to_numpy(dtype = object)
+    for column in ip_columns[1:]:
+        # only VMs with an address in this column are touched
+        ip = vmdata_df[column].to_numpy(dtype = object)
+        present = pd.notna(ip)
+        if present.any():
+            ip_addresses[present] = ip_addresses[present] + ', ' + ip[present].astype(str)
+    return pd.Series(ip_addresses, index = vmdata_df.index)
+
+
+def indexed_join(vmdata_df, detail_df):
+    '''Left-joins per-VM detail rows onto the VMs from the same source file, using a hash index on vmId built once per file.'''
+    detail_columns = [column for column in detail_df if column not in ['vmId', 'sourceFile']]
+    if detail_df.duplicated(subset = ['vmId', 'sourceFile']).any():
+        # repeated detail rows for a VM fan out - leave that to a full merge
+        return pd.merge(vmdata_df, detail_df, on = ["vmId", "sourceFile"], how = "left")
+
+    # position of each VM's detail row, or -1 where there is none
+    positions = np.full(len(vmdata_df), -1)
+    vm_ids = vmdata_df['vmId'].to_numpy()
+    vm_sources = vmdata_df['sourceFile'].to_numpy()
+    detail_ids = detail_df['vmId'].to_numpy()
+    detail_sources = detail_df['sourceFile'].to_numpy()
+    for source in pd.unique(detail_sources):
+        detail_rows = np.flatnonzero(detail_sources == source)
+        vm_rows = vm_sources == source
+        found = pd.Index(detail_ids[detail_rows]).get_indexer(vm_ids[vm_rows])
+        positions[vm_rows] = np.where(found >= 0, detail_rows[found], -1)
+
+    vm_consolidated = vmdata_df.reset_index(drop = True)
+    matched = positions >= 0
+    for column in detail_columns:
+        values = np.full(len(vm_consolidated), np.nan)
+        values[matched] = pd.to_numeric(detail_df[column], errors = 'coerce').to_numpy(dtype = 'float64')[positions[matched]]
+        vm_consolidated[column] = values
+    return vm_consolidated
 
 
 def rvtools_conversion(**kwargs):
+    output_path = kwargs['output_path']
+
+    # reuse the previously parsed inventory if the input files have not changed
+    csv_file = "1_vmdata_df_rvtools.csv"
+    signature = inventory_signature(**kwargs)
+    cached = inventory_cache_current(output_path=output_path, csv_file=csv_file, signature=signature)
+    get_sizing_metrics().cache_lookup('inventory', cached)
+    if cached is True:
+        log('info', f'\nInput file(s) unchanged - using cached inventory {output_path}{csv_file}')
+        return csv_file
+
+    vm_consolidated = rvtools_inventory(**kwargs)
+
+    write_inventory_cache(output_path=output_path, csv_file=csv_file, signature=signature, inventory=vm_consolidated)
+    return csv_file
+
+
+def store_conversion(**kwargs):
+    '''Appends each input file to an on-disk inventory store, one file at a time; files already in the store are skipped.'''
+    input_path = kwargs['input_path']
+    file_name = kwargs['file_name']
+    file_type = kwargs['file_type']
+    store_path = kwargs['store']
+    dedup_key = kwargs.get('dedup')
+
+    store = InventoryStore(store_path)
+    manifest = store.manifest
+    if len(store) == 0 and len(store.sources) == 0:
+        manifest['file_type'] = file_type
+        manifest['dedup'] = dedup_key
+    if manifest.get('file_type') != file_type:
+        log('error', f'The inventory store at {store_path} holds {manifest.get("file_type")} files - it cannot be combined with {file_type} files.')
+        sys.exit(1)
+    if manifest.get('dedup') != dedup_key:
+        log('error', f'The inventory store at {store_path} was built with dedup={manifest.get("dedup")} - use the same dedup option, or a new store.')
+        sys.exit(1)
+
+    for file in file_name:
+        signature = inventory_signature(input_path=input_path, file_name=[file])
+        if file in store.sources:
+            if store.sources[file] == signature:
+                log('info', f'{file} is already in the inventory store - skipping.')
+                continue
+            log('error', f'{file} has changed since it was added to the inventory store at {store_path} - please use a new store.')
+            sys.exit(1)
+
+        # only one file is ever held in memory
+        match file_type:
+            case 'live-optics':
+                vmdata_df = lova_inventory(input_path=input_path, file_name=[file])
+            case 'rv-tools':
+                vmdata_df = rvtools_inventory(input_path=input_path, file_name=[file])
+
+        # duplicates are detected against the hashed keys of every VM already in the store
+        if dedup_key is not None:
+            key = resolve_dedup_key(vmdata_df, dedup_key)
+            keys_file = os.path.join(store_path, 'dedup.keys')
+            stored = store.memmap('dedup', 'keys', np.uint64) if os.path.exists(keys_file) else np.zeros(0, dtype=np.uint64)
+            duplicated, kept = hashed_duplicates(vmdata_df, key, stored)
+            del stored
+            if duplicated.any():
+                log('info', f'{int(duplicated.sum())} duplicate VM(s) in {file} removed using {key}.')
+            vmdata_df = vmdata_df[~duplicated]
+            with open(keys_file, "ab") as f:
+                kept.tofile(f)
+
+        store.append(vmdata_df, source=file, signature=signature)
+        log('info', f'Added {len(vmdata_df)} VM(s) from {file} - the inventory store now holds {len(store)} VM(s).')
+
+    return store
+
+
+# the columns read from each tab of a csv export, and their types; both the MB and MiB variants of each storage column are listed
+TAB_COLUMNS = {
+    "vInfo": dict(
+        {column: str for column in ['VM ID', 'Cluster', 'Datacenter', 'Primary IP Address', 'OS according to the VMware Tools', 'DNS Name', 'Powerstate', 'VM', 'VM UUID', 'VI SDK Server']},
+        **{column: 'float64' for column in ['CPUs', 'Memory', 'Provisioned MiB', 'In Use MiB', 'Provisioned MB', 'In Use MB']}),
+    "vDisk": {"VM ID": str, "Capacity MiB": 'float64', "Capacity MB": 'float64'},
+    "vPartition": {"VM ID": str, "Consumed MiB": 'float64', "Consumed MB": 'float64'},
+    "VMs": dict(
+        {column: str for column in ['Cluster', 'Datacenter', 'Guest IP1', 'Guest IP2', 'Guest IP3', 'Guest IP4', 'VM OS', 'Guest Hostname', 'Power State', 'VM Name', 'MOB ID', 'VM UUID', 'vCenter']},
+        **{column: 'float64' for column in ['Virtual CPU', 'Virtual Disk Size (MiB)', 'Virtual Disk Used (MiB)', 'Provisioned Memory (MiB)', 'Virtual Disk Size (MB)', 'Virtual Disk Used (MB)', 'Provisioned Memory (MB)']}),
+    "VM Performance": dict(
+        {"MOB ID": str},
+        **{column: 'float64' for column in ['Avg Read IOPS', 'Avg Write IOPS', 'Peak Read IOPS', 'Peak Write IOPS', 'Avg Read MB/s', 'Avg Write MB/s', 'Peak Read MB/s', 'Peak Write MB/s']})
+    }
+
+
+def csv_tab(file_path, sheet_name):
+    '''Finds the csv export of a tab in a directory or .zip bundle of per-tab exports (e.g. RVTools_tabvInfo.csv, or VMs.csv.gz).
+
+    Returns a function opening the (decompressed) csv, or None if file_path is an Excel workbook.'''
+    if os.path.isdir(file_path):
+        members = [f for f in sorted(os.listdir(file_path)) if os.path.isfile(os.path.join(file_path, f))]
+    elif file_path.lower().endswith('.zip'):
+        with zipfile.ZipFile(file_path) as bundle:
+            members = sorted(bundle.namelist())
+    else:
+        return None
+
+    # the tab name ends the file name, ignoring case, spaces and punctuation
+    tab = re.sub('[^a-z0-9]', '', sheet_name.lower())
+    found = None
+    for member in members:
+        name = os.path.basename(member).lower()
+        name = name[:-3] if name.endswith('.gz') else name
+        if name.endswith('.csv') and re.sub('[^a-z0-9]', '', name[:-4]).endswith(tab):
+            found = member
+            break
+    if found is None:
+        log('error', f'No csv export of the {sheet_name} tab could be found in {file_path}.')
+        sys.exit(1)
+
+    def open_tab():
+        if os.path.isdir(file_path):
+            handle = open(os.path.join(file_path, found), 'rb')
+        else:
+            handle = ZipMember(file_path, found)
+        return gzip.GzipFile(fileobj = handle) if found.lower().endswith('.gz') else handle
+    return open_tab
+
+
+class ZipMember(io.RawIOBase):
+    '''A member of a zip bundle, read as a stream; closing it closes the bundle.'''
+    def __init__(self, file_path, member):
+        self.bundle = zipfile.ZipFile(file_path)
+        self.member = self.bundle.open(member)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.member.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.member.close()
+            self.bundle.close()
+        super().close()
+
+
+def csv_read_params(open_tab, sheet_name):
+    # only the columns used are parsed, each with a fixed type
+    with open_tab() as f:
+        header = pd.read_csv(f, nrows = 0, encoding = 'utf-8-sig').columns
+    columns = TAB_COLUMNS[sheet_name]
+    usecols = [column for column in header if column in columns]
+    return {"usecols": usecols, "dtype": {column: columns[column] for column in usecols}, "encoding": 'utf-8-sig'}
+
+
+def read_sheet(file_path, sheet_name):
+    '''Reads one tab of an inventory - a sheet of an Excel workbook, or its csv export (plain or gzip-compressed) from a directory or zip bundle.'''
+    open_tab = csv_tab(file_path, sheet_name)
+    if open_tab is None:
+        return pd.read_excel(file_path, sheet_name = sheet_name)
+    read_params = csv_read_params(open_tab, sheet_name)
+    with open_tab() as f:
+        return pd.read_csv(io.BufferedReader(f) if isinstance(f, ZipMember) else f, engine = CSV_ENGINE, **read_params)
+
+
+def sheet_chunks(file_path, sheet_name, chunk_size):
+    '''Yields the rows of one tab of an inventory as dataframes of at most chunk_size rows.'''
+    open_tab = csv_tab(file_path, sheet_name)
+    if open_tab is None:
+        yield from workbook_chunks(file_path, sheet_name, chunk_size)
+        return
+    read_params = csv_read_params(open_tab, sheet_name)
+    with open_tab() as f:
+        # the pyarrow reader does not read in chunks
+        for chunk in pd.read_csv(f, chunksize = chunk_size, **read_params):
+            yield chunk.reset_index(drop = True)
+
+
+def workbook_chunks(file_path, sheet_name, chunk_size):
+    '''Yields the rows of a worksheet as dataframes of at most chunk_size rows, reading the workbook row by row rather than as a whole.
+
+    Cells are converted and typed as pd.read_excel converts them, so a chunk holds the same values as the matching rows of the whole sheet.'''
+    workbook = load_workbook(file_path, read_only = True, data_only = True)
+    try:
+        sheet = workbook[sheet_name]
+        sheet.reset_dimensions()
+        rows = sheet.rows
+        header = trim_row([excel_cell(cell) for cell in next(rows, [])])
+        width = len(header)
+
+        batch = []
+        empty_rows = []
+        yielded = False
+        for row in rows:
+            values = trim_row([excel_cell(cell) for cell in row])
+            # empty rows are only kept if more data follows, as trailing empty rows are dropped
+            if len(values) == 0:
+                empty_rows.append([""] * width)
+                continue
+            batch.extend(empty_rows)
+            empty_rows = []
+            batch.append((values + [""] * width)[:width])
+            if len(batch) >= chunk_size:
+                yield TextParser([header] + batch, header = 0).read()
+                batch = []
+                yielded = True
+        # a sheet without rows still gives its columns
+        if len(batch) > 0 or (yielded is False and width > 0):
+            yield TextParser([header] + batch, header = 0).read()
+    finally:
+        workbook.close()
+
+
+def excel_cell(cell):
+    # as pandas converts cells read with openpyxl
+    if cell.value is None:
+        return ""
+    elif cell.data_type == 'e':
+        return np.nan
+    elif cell.data_type == 'n':
+        value = int(cell.value)
+        if value == cell.value:
+            return value
+        return float(cell.value)
+    return cell.value
+
+
+def trim_row(values):
+    while len(values) > 0 and values[-1] == "":
+        values.pop()
+    return values
+
+
+def sheet_totals(file_path, sheet_name, chunk_size, transform):
+    '''Totals a per-disk or per-partition sheet per VM, one chunk at a time.'''
+    file = os.path.basename(file_path)
+    totals = []
+    for chunk in sheet_chunks(file_path, sheet_name, chunk_size):
+        chunk['sourceFile'] = file
+        totals.append(transform(chunk))
+    totals_df = pd.concat(totals, axis=0, ignore_index=True)
+    return totals_df.groupby(['vmId', 'sourceFile']).sum().reset_index()
+
+
+def hashed_duplicates(vmdata_df, dedup_key, seen):
+    '''Flags rows whose key hashes to one already seen, or repeats an earlier row; returns the flags and the hashes of the rows kept.'''
+    hashes = pd.util.hash_pandas_object(vmdata_df[dedup_key], index=False).to_numpy()
+    duplicated = np.isin(hashes, seen) | pd.Series(hashes).duplicated().to_numpy()
+    return duplicated, hashes[~duplicated]
+
+
+def rvtools_chunks(**kwargs):
+    '''Yields the normalized RVTools inventory in chunks; only the vDisk and vPartition totals of the file being read are held in full.'''
+    input_path = kwargs['input_path']
+    file_name = kwargs['file_name']
+    chunk_size = kwargs['chunk_size']
+    dedup_key = kwargs.get('dedup')
+
+    seen = np.zeros(0, dtype=np.uint64)
+    for file in file_name:
+        log('info', f'Reading {input_path}{file}')
+        vdisk_df = sheet_totals(f'{input_path}{file}', 'vDisk', chunk_size, rvtools_vdisk)
+        vpart_df = sheet_totals(f'{input_path}{file}', 'vPartition', chunk_size, rvtools_vpartition)
+
+        for chunk in sheet_chunks(f'{input_path}{file}', 'vInfo', chunk_size):
+            chunk['sourceFile'] = file
+            chunk = rvtools_vinfo(chunk)
+
+            # the first file a VM appears in is kept, as in dedup_workloads
+            if dedup_key is not None:
+                duplicated, kept = hashed_duplicates(chunk, resolve_dedup_key(chunk, dedup_key), seen)
+                if duplicated.any():
+                    log('info', f'{int(duplicated.sum())} duplicate VM(s) removed from {file}.')
+                seen = np.union1d(seen, kept)
+                chunk = chunk[~duplicated]
+
+            chunk = pd.merge(chunk, vdisk_df, on = ["vmId", "sourceFile"], how = "left")
+            chunk = pd.merge(chunk, vpart_df, on = ["vmId", "sourceFile"], how = "left")
+            yield rvtools_storage(chunk)
+
+
+def lova_chunks(**kwargs):
+    '''Yields the normalized LiveOptics inventory in chunks; only the VM Performance rows of the file being read are held in full.'''
+    input_path = kwargs['input_path']
+    file_name = kwargs['file_name']
+    chunk_size = kwargs['chunk_size']
+    dedup_key = kwargs.get('dedup')
+
+    seen = np.zeros(0, dtype=np.uint64)
+    for file in file_name:
+        log('info', f'Reading {input_path}{file}')
+        diskperf_list = []
+        for chunk in sheet_chunks(f'{input_path}{file}', 'VM Performance', chunk_size):
+            chunk['sourceFile'] = file
+            diskperf_list.append(lova_performance(chunk))
+        diskperf_df = pd.concat(diskperf_list, axis=0, ignore_index=True)
+
+        for chunk in sheet_chunks(f'{input_path}{file}', 'VMs', chunk_size):
+            chunk['sourceFile'] = file
+            chunk = lova_vms(chunk)
+
+            if dedup_key is not None:
+                duplicated, kept = hashed_duplicates(chunk, resolve_dedup_key(chunk, dedup_key), seen)
+                if duplicated.any():
+                    log('info', f'{int(duplicated.sum())} duplicate VM(s) removed from {file}.')
+                seen = np.union1d(seen, kept)
+                chunk = chunk[~duplicated]
+
+            yield indexed_join(chunk, diskperf_df)
+
+
+def rvtools_inventory(**kwargs):
     input_path = kwargs['input_path']
     file_name = kwargs['file_name'] 
-    output_path = kwargs['output_path']
+    output_path = kwargs.get('output_path')
+    dedup_key = kwargs.get('dedup')
 
-    print()
-    print("Parsing RVTools file(s) locally.")
+    log('info', "\nParsing RVTools file(s) locally.")
 
     df_list = []
     for file in file_name:
-        print(f'Reading {input_path}{file}')
-        file_df = pd.read_excel(f'{input_path}{file}', sheet_name = 'vInfo')
+        log('info', f'Reading {input_path}{file}')
+        file_df = read_sheet(f'{input_path}{file}', 'vInfo')
+        file_df['sourceFile'] = file
         df_list.append(file_df)
     vmdata_df = pd.concat(df_list, axis=0, ignore_index=True)
 
+    vmdata_df = rvtools_vinfo(vmdata_df)
+
+    # collapse VMs seen in more than one export, if desired
+    if dedup_key is not None:
+        vmdata_df = dedup_workloads(vmdata_df=vmdata_df, dedup_key=dedup_key, output_path=output_path)
+
+    # pull in rows from vDisk for allocated storage
+    diskdf_list = []
+    for file in file_name:
+        disk_df = read_sheet(f'{input_path}{file}', 'vDisk')
+        disk_df['sourceFile'] = file
+        diskdf_list.append(disk_df)
+    vdisk_df = pd.concat(diskdf_list, axis=0, ignore_index=True)
+    
+    vdisk_df = rvtools_vdisk(vdisk_df)
+
+    # pull in rows from vPartition for consumed storage
+    partdf_list = []
+    for file in file_name:
+        part_df = read_sheet(f'{input_path}{file}', 'vPartition')
+        part_df['sourceFile'] = file
+        partdf_list.append(part_df)
+    vpart_df = pd.concat(partdf_list, axis=0, ignore_index=True)
+    
+    vpart_df = rvtools_vpartition(vpart_df)
+
+    vm_consolidated = pd.merge(vmdata_df, vdisk_df, on = ["vmId", "sourceFile"], how = "left")
+    vm_consolidated = pd.merge(vm_consolidated, vpart_df, on = ["vmId", "sourceFile"], how = "left")
+
+    vm_consolidated = rvtools_storage(vm_consolidated)
+
+    return vm_consolidated
+
+
+def rvtools_vinfo(vmdata_df):
     # specify columns to KEEP - all others will be dropped
-    keep_columns = ['VM ID','Cluster', 'Datacenter','Primary IP Address','OS according to the VMware Tools', 'DNS Name','Powerstate','CPUs','VM','Memory']
+    keep_columns = ['VM ID','Cluster', 'Datacenter','Primary IP Address','OS according to the VMware Tools', 'DNS Name','Powerstate','CPUs','VM','Memory', 'VM UUID', 'VI SDK Server', 'sourceFile']
     if 'Provisioned MiB' in vmdata_df:
         keep_columns.extend(['Provisioned MiB','In Use MiB'])
     else:
@@ -162,7 +714,9 @@ def rvtools_conversion(**kwargs):
         'Folder':'vmFolder',
         'Resource pool':'resourcePool',
         'Cluster':'cluster', 
-        'Datacenter':'virtualDatacenter'
+        'Datacenter':'virtualDatacenter',
+        'VM UUID':'vmUuid',
+        'VI SDK Server':'vCenter'
         }, inplace = True)
     
     if 'Provisioned MiB' in vmdata_df:
@@ -178,15 +732,11 @@ def rvtools_conversion(**kwargs):
 
     fillna_values = {"ip_addresses": "no ip", "os": "none specified"}
     vmdata_df.fillna(value=fillna_values, inplace = True)
+    return vmdata_df
 
-    # pull in rows from vDisk for allocated storage
-    diskdf_list = []
-    for file in file_name:
-        disk_df = pd.read_excel(f'{input_path}{file}', sheet_name = 'vDisk')
-        diskdf_list.append(disk_df)
-    vdisk_df = pd.concat(diskdf_list, axis=0, ignore_index=True)
-    
-    vdisk_columns = ['VM ID']
+
+def rvtools_vdisk(vdisk_df):
+    vdisk_columns = ['VM ID', 'sourceFile']
     # Different versions of RVTools use either "MB" or "MiB" for storage; check for presence and include appropriate columns
     if 'Capacity MiB' in vdisk_df:
         vdisk_columns.extend(['Capacity MiB'])
@@ -200,16 +750,13 @@ def rvtools_conversion(**kwargs):
         vdisk_df.rename(columns ={'Capacity MB':'vmdkTotal'}, inplace = True)
     vdisk_df.rename(columns ={'VM ID':'vmId'}, inplace = True)
 
-    vdisk_df = vdisk_df.groupby(['vmId'])['vmdkTotal'].sum().reset_index()
+    # disks are totalled per VM per file, so a VM present in several exports is not summed into one inflated vmId
+    vdisk_df = vdisk_df.groupby(['vmId', 'sourceFile'])['vmdkTotal'].sum().reset_index()
+    return vdisk_df
 
-    # pull in rows from vPartition for consumed storage
-    partdf_list = []
-    for file in file_name:
-        part_df = pd.read_excel(f'{input_path}{file}', sheet_name = 'vPartition')
-        partdf_list.append(part_df)
-    vpart_df = pd.concat(partdf_list, axis=0, ignore_index=True)
-    
-    part_list = ['VM ID']
+
+def rvtools_vpartition(vpart_df):
+    part_list = ['VM ID', 'sourceFile']
     if 'Consumed MiB' in vpart_df:
         part_list.extend(['Consumed MiB'])
     else:
@@ -222,11 +769,11 @@ def rvtools_conversion(**kwargs):
         vpart_df.rename(columns ={'Consumed MB':'vmdkUsed'}, inplace = True)
     vpart_df.rename(columns ={'VM ID':'vmId'}, inplace = True)
 
-    vpart_df = vpart_df.groupby(['vmId'])['vmdkUsed'].sum().reset_index()
+    vpart_df = vpart_df.groupby(['vmId', 'sourceFile'])['vmdkUsed'].sum().reset_index()
+    return vpart_df
 
-    vm_consolidated = pd.merge(vmdata_df, vdisk_df, on = "vmId", how = "left")
-    vm_consolidated = pd.merge(vm_consolidated, vpart_df, on = "vmId", how = "left")
 
+def rvtools_storage(vm_consolidated):
     # convert RAM and storage numbers into GB
     vm_consolidated['vinfo_provisioned'] = vm_consolidated['vinfo_provisioned']/1024
     vm_consolidated['vinfo_used'] = vm_consolidated['vinfo_used']/1024
@@ -241,9 +788,188 @@ def rvtools_conversion(**kwargs):
     # replace missing values from vDisk or vPartition with values from vInfo
     vm_consolidated.loc[vm_consolidated.vmdkTotal == 0, 'vmdkTotal'] = vm_consolidated.vinfo_provisioned
     vm_consolidated.loc[vm_consolidated.vmdkUsed == 0, 'vmdkUsed'] = vm_consolidated.vinfo_used
+    return vm_consolidated
 
-    vm_consolidated.to_csv(f'{output_path}1_vmdata_df_rvtools.csv')
-    csv_file = "1_vmdata_df_rvtools.csv"
+
+def dedup_workloads(**kwargs):
+    vmdata_df = kwargs['vmdata_df']
+    dedup_key = kwargs['dedup_key']
+    output_path = kwargs['output_path']
+
+    dedup_key = resolve_dedup_key(vmdata_df, dedup_key)
+
+    log('info', f'\nRemoving duplicate workloads using {dedup_key}')
+
+    # hash-based duplicate detection - the first export a VM appears in is kept
+    duplicated = vmdata_df.duplicated(subset = dedup_key, keep = 'first')
+    dup_df = vmdata_df[duplicated]
+
+    if len(dup_df) > 0:
+        log('info', f'{len(dup_df)} duplicate VM(s) collapsed. Duplicates removed per file:')
+        log('info', dup_df.groupby('sourceFile').size().to_string())
+        if output_path is not None:
+            dup_df.to_csv(f'{output_path}0_duplicate_vms.csv')
+            log('info', f'Removed rows saved to {output_path}0_duplicate_vms.csv')
+    else:
+        log('info', 'No duplicate VMs found.')
+
+    return vmdata_df[~duplicated]
+
+
+def resolve_dedup_key(vmdata_df, dedup_key):
+    # default key: vmId per vCenter where the export records it, otherwise the VM UUID, otherwise vmId plus vmName
+    if len(dedup_key) == 0:
+        if 'vCenter' in vmdata_df:
+            dedup_key = ['vmId', 'vCenter']
+        elif 'vmUuid' in vmdata_df:
+            dedup_key = ['vmUuid']
+        else:
+            dedup_key = ['vmId', 'vmName']
+
+    missing = [key for key in dedup_key if key not in vmdata_df]
+    if len(missing) > 0:
+        log('error', f'Cannot remove duplicates - the following key fields are not present in the file(s): {missing}')
+        sys.exit(1)
+    return dedup_key
+
+
+# the VM sizes sent in the sizerRequest, which must all be finite, non-negative numbers
+VALIDATED_METRICS = ['vCpu', 'vRam', 'vmdkTotal', 'vmdkUsed', 'readIOPS', 'writeIOPS', 'peakReadIOPS', 'peakWriteIOPS', 'readThroughput', 'writeThroughput', 'peakReadThroughput', 'peakWriteThroughput']
+
+
+class InventoryValidator:
+    '''Checks a normalized inventory, or each chunk of one, before a sizing request is built from it.
+
+    Every check is made on whole columns, and every problem found is kept, so all the bad rows can be reported at
+    once.  With quarantine, the VMs with problems are set aside and the rest returned; otherwise the rows are returned
+    unchanged and report() tells the caller the inventory may not be sized.  VMs appearing more than once are only a
+    problem when duplicates were to be removed (dedup_key is the -dd key); otherwise they are reported and sized.'''
+    def __init__(self, quarantine=False, cluster_profiles=False, dedup_key=None):
+        self.quarantine = quarantine
+        self.dedup_key = dedup_key
+        # VMs without a cluster are dropped by the groupby creating cluster profiles
+        self.cluster_profiles = cluster_profiles
+        self.required = ['vmId', 'vmName', 'vCpu', 'vRam', 'vmdkTotal', 'vmdkUsed'] + (['cluster'] if cluster_profiles is True else [])
+        self.seen = np.zeros(0, dtype=np.uint64)
+        self.issues = []
+        self.quarantined = []
+        self.vms = 0
+        self.bad_vms = 0
+        self.flagged_vms = 0
+
+    def check(self, vm_data_df):
+        missing = [column for column in self.required if column not in vm_data_df]
+        if len(missing) > 0:
+            log('error', f'The inventory cannot be sized - the following fields are missing: {missing}')
+            sys.exit(1)
+
+        problems = []
+        vm_ids = vm_data_df['vmId']
+        no_id = (vm_ids.isna() | vm_ids.astype(str).str.strip().eq('')).to_numpy()
+        problems.append((no_id, 'vmId', 'missing'))
+
+        # the same VM twice - identified as dedup_workloads identifies it - across chunks as well as within them
+        key = resolve_dedup_key(vm_data_df, [] if self.dedup_key is None else self.dedup_key)
+        duplicated, kept = hashed_duplicates(vm_data_df, key, self.seen)
+        self.seen = np.union1d(self.seen, kept)
+        # without -dd, a VM exported more than once is sized as it stands, so its duplicates are a warning only
+        warnings = [(duplicated & ~no_id, 'vmId', f'duplicate {"/".join(key)}')]
+        if self.dedup_key is not None:
+            problems += warnings
+            warnings = []
+
+        for column in [column for column in VALIDATED_METRICS if column in vm_data_df]:
+            absent = vm_data_df[column].isna().to_numpy()
+            values = pd.to_numeric(vm_data_df[column], errors = 'coerce').to_numpy(dtype = 'float64')
+            problems.append((absent, column, 'missing'))
+            problems.append((np.isnan(values) & ~absent, column, 'not a number'))
+            problems.append((np.isinf(values), column, 'not finite'))
+            problems.append((np.isfinite(values) & (values < 0), column, 'negative'))
+            if column == 'vCpu':
+                problems.append(((values >= 0) & (values < 1), column, 'less than 1'))
+
+        if self.cluster_profiles is True:
+            clusters = vm_data_df['cluster']
+            problems.append(((clusters.isna() | clusters.astype(str).str.strip().eq('')).to_numpy(), 'cluster', 'missing'))
+
+        bad = np.zeros(len(vm_data_df), dtype=bool)
+        flagged = np.zeros(len(vm_data_df), dtype=bool)
+        for mask, column, problem, warning in [issue + (False,) for issue in problems] + [issue + (True,) for issue in warnings]:
+            if not mask.any():
+                continue
+            flagged |= mask
+            if warning is False:
+                bad |= mask
+            rows = np.flatnonzero(mask)
+            issue = vm_data_df.iloc[rows].filter(items = ['vmId', 'vmName', 'sourceFile'], axis = 1)
+            issue.insert(0, 'row', rows + self.vms)
+            issue['field'] = column
+            issue['problem'] = problem
+            issue['value'] = vm_data_df[column].to_numpy()[rows]
+            self.issues.append(issue)
+
+        self.vms += len(vm_data_df)
+        self.bad_vms += int(bad.sum())
+        self.flagged_vms += int(flagged.sum())
+        if self.quarantine is True and bad.any():
+            self.quarantined.append(vm_data_df[bad])
+            return vm_data_df[~bad]
+        return vm_data_df
+
+    def issue_list(self):
+        '''Every problem found, one row each, in inventory order.'''
+        if len(self.issues) == 0:
+            return pd.DataFrame(columns = ['row', 'vmId', 'vmName', 'field', 'problem', 'value'])
+        return pd.concat(self.issues, axis=0, ignore_index=True).sort_values('row', kind = 'stable').reset_index(drop = True)
+
+    def report(self, output_path=None, preview_rows=20):
+        '''Prints a summary of the problems found, saving the full list (and any quarantined VMs); returns True if the inventory may be sized.'''
+        if self.flagged_vms == 0:
+            return True
+        issues = self.issue_list()
+        # problems set aside by quarantine, and duplicates left in, are a warning; otherwise they stop the sizing
+        level = 'warning' if self.quarantine is True or self.bad_vms == 0 else 'error'
+        log(level, f'\n{len(issues)} problem(s) found in {self.flagged_vms} of {self.vms} VM(s):')
+        log(level, issues.groupby(['field', 'problem'], sort = False).size().to_frame('vms').to_string())
+        log(level, f'\n{issues.head(preview_rows).to_string(index = False)}')
+        if output_path is not None:
+            issues.to_csv(f'{output_path}invalid_vms.csv', index = False)
+            log(level, f'\nEvery problem found is listed in {output_path}invalid_vms.csv')
+
+        if self.bad_vms == 0:
+            log(level, "VMs appearing more than once are sized as they stand - use -dd to remove them.")
+            return True
+        if self.quarantine is True:
+            if output_path is not None:
+                pd.concat(self.quarantined, axis=0).to_csv(f'{output_path}quarantined_vms.csv')
+            log(level, f'{self.bad_vms} VM(s) quarantined - sizing the remaining {self.vms - self.bad_vms} VM(s).')
+            if self.bad_vms == self.vms:
+                log('error', "No VMs remain to be sized.")
+                return False
+            return True
+        log(level, "No sizing request has been sent.  Please correct the inventory, remove duplicate VMs with -dd, or use -qr to set the VMs with problems aside.")
+        return False
+
+
+def validate_workloads(**kwargs):
+    '''Validates the converted inventory; returns the csv file to continue with, exiting if the inventory may not be sized.'''
+    output_path = kwargs['output_path']
+    csv_file = kwargs['csv_file']
+
+    log('info', "\nValidating the inventory.")
+    vm_data_df = read_inventory_cache(output_path=output_path, csv_file=csv_file)
+    if vm_data_df is None:
+        vm_data_df = pd.read_csv(f'{output_path}{csv_file}', index_col=0)
+
+    validator = InventoryValidator(quarantine = kwargs['quarantine'], cluster_profiles = kwargs['cluster_profiles'], dedup_key = kwargs['dedup'])
+    vm_data_df = validator.check(vm_data_df)
+    if validator.report(output_path) is False:
+        sys.exit(1)
+    get_sizing_metrics().count_vms('parse', validator.vms)
+    get_sizing_metrics().count_vms('validate', len(vm_data_df))
+    if validator.bad_vms > 0:
+        vm_data_df.to_csv(f'{output_path}1_vmdata_df_validated.csv')
+        csv_file = "1_vmdata_df_validated.csv"
     return csv_file
 
 
@@ -252,19 +978,23 @@ def ps_filter(**kwargs):
     csv_file = kwargs['csv_file']
     power_state = kwargs['power_state']
 
-    print()
-    print("Filtering workloads based on power state.")
+    log('info', "\nFiltering workloads based on power state.")
     vm_data_df = pd.read_csv(f'{output_path}{csv_file}',index_col=0)
+    vm_data_df_trimmed = power_state_filter(vm_data_df, power_state)
+
+    vm_data_df_trimmed.to_csv(f'{output_path}2_vmdata_df_power_state.csv')
+    csv_file = "2_vmdata_df_power_state.csv"
+    return csv_file
+
+
+def power_state_filter(vm_data_df, power_state):
     if power_state == "p":
         vm_data_df_trimmed = vm_data_df[vm_data_df.vmState == "poweredOn"]
     elif power_state == "ps":
         vm_data_df_trimmed = vm_data_df[vm_data_df.vmState != "poweredOff"]
     else:
-        pass
-
-    vm_data_df_trimmed.to_csv(f'{output_path}2_vmdata_df_power_state.csv')
-    csv_file = "2_vmdata_df_power_state.csv"
-    return csv_file
+        vm_data_df_trimmed = vm_data_df
+    return vm_data_df_trimmed
 
 
 def include_workloads(**kwargs):
@@ -273,19 +1003,24 @@ def include_workloads(**kwargs):
     infil = kwargs['include_filter']
     infilf = kwargs['include_filter_field']
 
-    print()
-    print(f'Including only those workloads where {infilf} includes {infil}')
+    log('info', f'\nIncluding only those workloads where {infilf} includes {infil}')
     vm_data_df = pd.read_csv(f'{output_path}{csv_file}',index_col=0)
+    vm_data_df_trimmed = include_filter(vm_data_df, infil, infilf)
+
+    vm_data_df_trimmed.to_csv(f'{output_path}3_vmdata_df_infil.csv')
+    csv_file = "3_vmdata_df_infil.csv"
+    return csv_file
 
+
+def include_filter(vm_data_df, infil, infilf, verbose=True):
     if infilf == "vmName":
-        print("using exact string match on vmName")
+        if verbose is True:
+            log('info', "using exact string match on vmName")
         vm_data_df_trimmed = vm_data_df[vm_data_df['vmName'].isin(infil)]
     else:
         pattern = '|'.join(infil)
         vm_data_df_trimmed = vm_data_df[vm_data_df[infilf].str.contains(pattern, case=False) == True]
-    vm_data_df_trimmed.to_csv(f'{output_path}3_vmdata_df_infil.csv')
-    csv_file = "3_vmdata_df_infil.csv"
-    return csv_file
+    return vm_data_df_trimmed
 
 
 def exclude_workloads(**kwargs):
@@ -294,109 +1029,153 @@ def exclude_workloads(**kwargs):
     exfil = kwargs['exclude_filter']
     exfilf = kwargs['exclude_filter_field']
 
-    print()
-    print(f'Excluding those workloads where {exfilf} includes {exfil}')
+    log('info', f'\nExcluding those workloads where {exfilf} includes {exfil}')
     vm_data_df = pd.read_csv(f'{output_path}{csv_file}',index_col=0)
+    vm_data_df_trimmed = exclude_filter(vm_data_df, exfil, exfilf)
+
+    vm_data_df_trimmed.to_csv(f'{output_path}4_vmdata_df_exfil.csv')
+    csv_file = "4_vmdata_df_exfil.csv"
+    return csv_file
+
 
+def exclude_filter(vm_data_df, exfil, exfilf, verbose=True):
     if exfilf == "vmName":
-        print("using exact string match on vmName")
+        if verbose is True:
+            log('info', "using exact string match on vmName")
         vm_data_df_trimmed = vm_data_df[~vm_data_df['vmName'].isin(exfil)]
     else:
         pattern = '|'.join(exfil)
         vm_data_df_trimmed = vm_data_df[vm_data_df[exfilf].str.contains(pattern, case=False) == False]
-    vm_data_df_trimmed.to_csv(f'{output_path}4_vmdata_df_exfil.csv')
-    csv_file = "4_vmdata_df_exfil.csv"
-    return csv_file
+    return vm_data_df_trimmed
 
 
 def build_workload_profiles(**kwargs):
     output_path = kwargs['output_path']
     csv_file = kwargs['csv_file']
     profile_config = kwargs['workload_profiles']
-    if kwargs['profile_list'] is not None:
-        profile_list = kwargs['profile_list']
+    profile_list = kwargs['profile_list']
 
-    print()
-    print(f'Separating workloads into profiles based on {profile_config}')
+    log('info', f'\nSeparating workloads into profiles based on {profile_config}')
     #create list for storing file names
     wp_file_list = []
 
     vm_data_df = pd.read_csv(f'{output_path}{csv_file}',index_col=0)
+    profiles = workload_profiles(vm_data_df, profile_config, profile_list, kwargs['include_remaining'])
+
+    # save resulting dataframes as csv files
+    for profile_file, profile_df in profiles.items():
+        profile_df.to_csv(f'{output_path}{profile_file}')
+        wp_file_list.append(profile_file)
+    return wp_file_list
+
+
+def workload_profiles(vm_data_df, profile_config, profile_list, include_remaining, verbose=True):
+    '''Splits the inventory into workload profiles; returns a dictionary of profile (file) name to dataframe.'''
+    profiles = {}
 
     match profile_config:
         case "all_clusters":
-            print("Creating workload profiles by cluster.")
-            workload_profiles = vm_data_df.groupby('cluster')
-            # save resulting dataframes as csv files 
-            for profile, profile_df in workload_profiles:
-                profile_df.to_csv(f'{output_path}5_cluster_{profile}.csv')
-                wp_file_list.append(f'5_cluster_{profile}.csv')
-            return wp_file_list
+            if verbose is True:
+                log('info', "Creating workload profiles by cluster.")
+            for profile, profile_df in vm_data_df.groupby('cluster'):
+                profiles[f'5_cluster_{profile}.csv'] = profile_df
     
         case "some_clusters":
-            print("Creating custom cluster workload profiles.")
-            workload_profiles = vm_data_df.groupby('cluster')
+            if verbose is True:
+                log('info', "Creating custom cluster workload profiles.")
 
-            # for list of clusters to keep, export to csv
-            for profile, profile_df in workload_profiles:
+            # for list of clusters to keep, create a profile
+            for profile, profile_df in vm_data_df.groupby('cluster'):
                 if profile in profile_list:
-                    profile_df.to_csv(f'{output_path}5_cluster_{profile}.csv')
-                    wp_file_list.append(f'5_cluster_{profile}.csv')
+                    profiles[f'5_cluster_{profile}.csv'] = profile_df
 
             # if desired in original DF, drop rows for exported clusters
-            if kwargs['include_remaining'] == True:
-                vm_data_df_trimmed = vm_data_df[vm_data_df.cluster.isin(profile_list) == False]
-                vm_data_df_trimmed.to_csv(f'{output_path}5_cluster_remainder.csv')
-                wp_file_list.append('5_cluster_remainder.csv')
-            return wp_file_list
+            if include_remaining == True:
+                profiles['5_cluster_remainder.csv'] = vm_data_df[vm_data_df.cluster.isin(profile_list) == False]
 
         case "os":
-            print("Creating workload profiles based on GUEST OPERATING SYSTEM using text match.")
+            if verbose is True:
+                log('info', "Creating workload profiles based on GUEST OPERATING SYSTEM using text match.")
             for match_string in profile_list:
-                profile_df = vm_data_df[vm_data_df['os'].str.contains(match_string)]
-                profile_df.to_csv(f'{output_path}5_guest_os_{match_string}.csv')
-                wp_file_list.append(f'5_guest_os_{match_string}.csv')
+                profiles[f'5_guest_os_{match_string}.csv'] = vm_data_df[vm_data_df['os'].str.contains(match_string)]
                 
-            # to keep remaining workloads, export all VM NOT matching to remainder CSV
-            if kwargs['include_remaining'] == True:
+            # to keep remaining workloads, keep all VM NOT matching as a remainder profile
+            if include_remaining == True:
                 pattern = '|'.join(profile_list)
-                vm_data_df_trimmed = vm_data_df[~vm_data_df['os'].str.contains(pattern, case=False)]
-                vm_data_df_trimmed.to_csv(f'{output_path}5_os_remainder.csv')
-                wp_file_list.append('5_os_remainder.csv')
-
-            return wp_file_list
+                profiles['5_os_remainder.csv'] = vm_data_df[~vm_data_df['os'].str.contains(pattern, case=False)]
 
         case "vmName":
-            print("Creating workload profiles based on VM NAME using text match.")
-
+            if verbose is True:
+                log('info', "Creating workload profiles based on VM NAME using text match.")
             for match_string in profile_list:
-                profile_df = vm_data_df[vm_data_df['vmName'].str.contains(match_string)]
-                profile_df.to_csv(f'{output_path}5_vmName_{match_string}.csv')
-                wp_file_list.append(f'5_vmName_{match_string}.csv')
+                profiles[f'5_vmName_{match_string}.csv'] = vm_data_df[vm_data_df['vmName'].str.contains(match_string)]
 
-            # to keep remaining workloads, export all VM NOT matching to remainder CSV
-            if kwargs['include_remaining'] == True:
+            # to keep remaining workloads, keep all VM NOT matching as a remainder profile
+            if include_remaining == True:
                 pattern = '|'.join(profile_list)
-                vm_data_df_trimmed = vm_data_df[~vm_data_df['vmName'].str.contains(pattern, case=False)]
-                vm_data_df_trimmed.to_csv(f'{output_path}5_vmName_remainder.csv')
-                wp_file_list.append('5_vmName_remainder.csv')
-            return wp_file_list
+                profiles['5_vmName_remainder.csv'] = vm_data_df[~vm_data_df['vmName'].str.contains(pattern, case=False)]
+
+    return profiles
 
 
 def build_recommendation_payload(**kwargs):
     output_path = kwargs['output_path']
     wp_file_list = kwargs['wp_file_list']
-    cloudType = kwargs['cloud_type']
+
+    # read the exported files (from above) used to populate the workload profiles
+    profiles = read_workload_profiles(output_path, wp_file_list)
+
+    sizerRequest = recommendation_payload(profiles = profiles, **kwargs)
+
+    with open(f'{output_path}custom_recommendation_request.txt', "w") as f:
+        print(json.dumps(sizerRequest, indent=2), file=f)
+ 
+    return json.dumps(sizerRequest)
+
+
+# the VM fields sent in each VMInfo of the sizerRequest
+PAYLOAD_COLUMNS = ['vmId', 'vmName', 'vCpu', 'vRam', 'vmdkTotal', 'vmdkUsed', 'readIOPS', 'writeIOPS', 'peakReadIOPS', 'peakWriteIOPS', 'readThroughput', 'writeThroughput', 'peakReadThroughput', 'peakWriteThroughput']
+
+
+def read_workload_profiles(output_path, wp_file_list):
+    '''Returns a dictionary of profile (file) name to dataframe for the workload profile csv files.'''
+    profiles = {}
+    for file in wp_file_list:
+        profiles[file] = pd.read_csv(f'{output_path}{file}')
+    return profiles
+
+
+def recommendation_payload(**kwargs):
+    '''Builds the sizerRequest dictionary from a dictionary of workload profile name to dataframe.'''
+    profiles = kwargs['profiles']
     storage_capacity = kwargs['storage_capacity']
-    storage_type = kwargs['storage_type']
-    storage_vendor = kwargs['storage_vendor']
-    profile_type = kwargs['profile_type']
+
+    log('info', '\nBuilding sizing request payload')
+    configurations = payload_configurations(**kwargs)
+    
+    # build json objects for recommendation payload
+    workloadProfiles = []
+
+    # build the sizerRequest payload, using the workload profile dataframes to populate the workload profiles
+    for file, vm_data_df in profiles.items():
+        profile = payload_profile(file, **kwargs)
+        profile['vmList'] = vm_info_list(vm_data_df, storage_capacity)
+        workloadProfiles.append(profile)
+
+    sizerRequest = {
+        "configurations": configurations,
+        "workloadProfiles": workloadProfiles
+        }
+    get_sizing_metrics().count_vms('payload', sum(len(profile['vmList']) for profile in workloadProfiles))
+    return sizerRequest
+
+
+def payload_configurations(**kwargs):
+    cloudType = kwargs['cloud_type']
     pct_cpu = kwargs['pct_cpu']
     pct_mem = kwargs['pct_mem']
     fttFtmType = kwargs['fttFtmType']
 
-    print()
-    print('Building sizing request payload')
     # set configurations for recommendation calculations
     configurations = {
         "cloudType": cloudType,
@@ -435,65 +1214,331 @@ def build_recommendation_payload(**kwargs):
             clusterType = kwargs['cluster_type']            
             configurations["sddcHostType"] = hostType
             configurations["clusterType"] = clusterType
-    
-    # build json objects for recommendation payload
-    workloadProfiles = []
+    return configurations
+
+
+def payload_profile(file, **kwargs):
+    # build the profile - the vmList is added by the caller
+    profile = {}
+    profile["profileName"] = file
+    profile['separateCluster'] = True
+    profile["isEnabled"] = True
+    profile["workloadProfileType"] = kwargs['profile_type']
+    profile["storagePreference"] = kwargs['storage_type']
+    log('info', f'Using preferred storage type of: {profile["storagePreference"]}')
+    profile["extStorageVendorType"] = kwargs['storage_vendor']
+    return profile
+
+
+def vm_info_list(vm_data_df, storage_capacity):
+    vmList = []
+
+    for ind in vm_data_df.index:
+        VMInfo = {}
+        VMInfo["vmComputeInfo"] = {}
+        VMInfo["vmMemoryInfo"] = {}
+        VMInfo["vmStorageInfo"] = {}   
+        VMInfo["vmId"] = str(vm_data_df['vmId'][ind])
+        VMInfo["vmName"] = str(vm_data_df['vmName'][ind])
+        VMInfo["vmComputeInfo"]["vCpu"] = int(vm_data_df['vCpu'][ind])
+        VMInfo["vmMemoryInfo"]["vRam"] = int(vm_data_df['vRam'][ind])
+        if 'readIOPS' in vm_data_df:
+            VMInfo["vmStorageInfo"]["readIOPS"] = int(vm_data_df['readIOPS'][ind])
+            VMInfo["vmStorageInfo"]["writeIOPS"] = int(vm_data_df['writeIOPS'][ind])
+            VMInfo["vmStorageInfo"]["peakReadIOPS"] = int(vm_data_df['peakReadIOPS'][ind])
+            VMInfo["vmStorageInfo"]["peakWriteIOPS"] = int(vm_data_df['peakWriteIOPS'][ind])
+            VMInfo["vmStorageInfo"]["readThroughput"] = int(vm_data_df['readThroughput'][ind])
+            VMInfo["vmStorageInfo"]["writeThroughput"] = int(vm_data_df['writeThroughput'][ind])
+            VMInfo["vmStorageInfo"]["peakReadThroughput"] = int(vm_data_df['peakReadThroughput'][ind])
+            VMInfo["vmStorageInfo"]["peakWriteThroughput"] = int(vm_data_df['peakWriteThroughput'][ind])
+        else:
+            pass
+        match storage_capacity:
+            case "PROVISIONED":
+                VMInfo["vmStorageInfo"]["vmdkTotal"] = int(vm_data_df['vmdkTotal'][ind])
+                VMInfo["vmStorageInfo"]["vmdkUsed"] = int(vm_data_df['vmdkTotal'][ind])
+            case "UTILIZED":
+                VMInfo["vmStorageInfo"]["vmdkTotal"] = int(vm_data_df['vmdkUsed'][ind])
+                VMInfo["vmStorageInfo"]["vmdkUsed"] = int(vm_data_df['vmdkUsed'][ind])
+        vmList.append(VMInfo)
 
-    # build the sizerRequest payload, using exported files (from above) to populate the workload profiles
-    for file in wp_file_list:
-        vm_data_df = pd.read_csv(f'{output_path}{file}')
-
-        # build the profiles
-        profile = {}
-        profile["profileName"] = file
-        profile['separateCluster'] = True
-        profile["isEnabled"] = True
-        profile["workloadProfileType"] = profile_type
-        profile["storagePreference"] = storage_type
-        print(f'Using preferred storage type of: {profile["storagePreference"]}')
-        profile["extStorageVendorType"] = storage_vendor
-
-        vmList = []
-
-        for ind in vm_data_df.index:
-            VMInfo = {}
-            VMInfo["vmComputeInfo"] = {}
-            VMInfo["vmMemoryInfo"] = {}
-            VMInfo["vmStorageInfo"] = {}   
-            VMInfo["vmId"] = str(vm_data_df['vmId'][ind])
-            VMInfo["vmName"] = str(vm_data_df['vmName'][ind])
-            VMInfo["vmComputeInfo"]["vCpu"] = int(vm_data_df['vCpu'][ind])
-            VMInfo["vmMemoryInfo"]["vRam"] = int(vm_data_df['vRam'][ind])
-            if 'readIOPS' in vm_data_df:
-                VMInfo["vmStorageInfo"]["readIOPS"] = int(vm_data_df['readIOPS'][ind])
-                VMInfo["vmStorageInfo"]["writeIOPS"] = int(vm_data_df['writeIOPS'][ind])
-                VMInfo["vmStorageInfo"]["peakReadIOPS"] = int(vm_data_df['peakReadIOPS'][ind])
-                VMInfo["vmStorageInfo"]["peakWriteIOPS"] = int(vm_data_df['peakWriteIOPS'][ind])
-                VMInfo["vmStorageInfo"]["readThroughput"] = int(vm_data_df['readThroughput'][ind])
-                VMInfo["vmStorageInfo"]["writeThroughput"] = int(vm_data_df['writeThroughput'][ind])
-                VMInfo["vmStorageInfo"]["peakReadThroughput"] = int(vm_data_df['peakReadThroughput'][ind])
-                VMInfo["vmStorageInfo"]["peakWriteThroughput"] = int(vm_data_df['peakWriteThroughput'][ind])
+    return vmList
+
+
+def store_recommendation_payload(**kwargs):
+    '''Filters and profiles the inventory store in chunks, and streams the sizerRequest to the request file.'''
+    store = kwargs['store']
+    chunk_size = kwargs['chunk_size']
+
+    log('info', f'\nFiltering and profiling {len(store)} VM(s) from the inventory store, {chunk_size} at a time.')
+
+    # the fields identifying a VM are read as well, for the duplicate check
+    columns = PAYLOAD_COLUMNS + ['vmState', 'cluster', 'os', 'vCenter', 'vmUuid', 'sourceFile', kwargs['include_filter_field'], kwargs['exclude_filter_field']]
+    chunks = store.read_chunks(chunk_size, columns)
+    return chunked_recommendation_payload(chunks = chunks, file_type = store.manifest['file_type'], staging_path = store.path, **kwargs)
+
+
+def stream_recommendation_payload(**kwargs):
+    '''Streams workbook rows in chunks through normalization, filtering and profiling straight into the sizerRequest file, without building the inventory.'''
+    file_type = kwargs['file_type']
+    output_path = kwargs['output_path']
+
+    log('info', f'\nStreaming {file_type} file(s), {kwargs["chunk_size"]} rows at a time.')
+
+    match file_type:
+        case 'live-optics':
+            chunks = lova_chunks(**kwargs)
+        case 'rv-tools':
+            chunks = rvtools_chunks(**kwargs)
+    return chunked_recommendation_payload(chunks = chunks, staging_path = output_path, **kwargs)
+
+
+def chunked_recommendation_payload(**kwargs):
+    '''Filters and profiles VMs one chunk at a time, and writes the sizerRequest to the request file piece by piece.
+
+    The request written is identical to the one the csv-based path submits, but neither the inventory nor the payload is ever held in memory as a whole.'''
+    chunks = kwargs['chunks']
+    file_type = kwargs['file_type']
+    staging_path = kwargs['staging_path']
+    chunk_size = kwargs['chunk_size']
+    output_path = kwargs['output_path']
+    power_state = kwargs['power_state']
+    infil = kwargs['include_filter']
+    infilf = kwargs['include_filter_field']
+    exfil = kwargs['exclude_filter']
+    exfilf = kwargs['exclude_filter_field']
+    profile_config = kwargs['workload_profiles']
+    profile_list = kwargs['profile_list']
+    storage_capacity = kwargs['storage_capacity']
+
+    # name the single profile after the last stage applied, as the csv-based path does
+    match file_type:
+        case 'live-optics':
+            profile_name = "1_vmdata_df_lova.csv"
+        case 'rv-tools':
+            profile_name = "1_vmdata_df_rvtools.csv"
+    if power_state is not None:
+        profile_name = "2_vmdata_df_power_state.csv"
+    if infil is not None and infilf is not None:
+        profile_name = "3_vmdata_df_infil.csv"
+    if exfil is not None and exfilf is not None:
+        profile_name = "4_vmdata_df_exfil.csv"
+
+    # each profile is staged in its own store, so profiles can be written one after the other
+    validator = InventoryValidator(quarantine = kwargs['quarantine'], cluster_profiles = profile_config in ['all_clusters', 'some_clusters'], dedup_key = kwargs['dedup'])
+    staging_path = tempfile.mkdtemp(dir=staging_path)
+    try:
+        staged = {}
+        for count, chunk in enumerate(chunks):
+            chunk = validator.check(chunk)
+            if power_state is not None:
+                chunk = power_state_filter(chunk, power_state)
+            if infil is not None and infilf is not None:
+                chunk = include_filter(chunk, infil, infilf, verbose = count == 0)
+            if exfil is not None and exfilf is not None:
+                chunk = exclude_filter(chunk, exfil, exfilf, verbose = count == 0)
+
+            if profile_config is not None:
+                profiles = workload_profiles(chunk, profile_config, profile_list, kwargs['include_remaining'], verbose = count == 0)
             else:
-                pass
-            match storage_capacity:
-                case "PROVISIONED":
-                    VMInfo["vmStorageInfo"]["vmdkTotal"] = int(vm_data_df['vmdkTotal'][ind])
-                    VMInfo["vmStorageInfo"]["vmdkUsed"] = int(vm_data_df['vmdkTotal'][ind])
-                case "UTILIZED":
-                    VMInfo["vmStorageInfo"]["vmdkTotal"] = int(vm_data_df['vmdkUsed'][ind])
-                    VMInfo["vmStorageInfo"]["vmdkUsed"] = int(vm_data_df['vmdkUsed'][ind])
-            vmList.append(VMInfo)
-
-        profile['vmList'] = vmList
-        workloadProfiles.append(profile)
+                profiles = {profile_name: chunk}
+
+            for profile, profile_df in profiles.items():
+                if profile not in staged:
+                    staged[profile] = InventoryStore(os.path.join(staging_path, str(len(staged))))
+                staged[profile].append(profile_df.filter(items = PAYLOAD_COLUMNS, axis = 1))
+
+        # every chunk is checked before anything is written, so a request is only built from a valid inventory
+        if validator.report(output_path) is False:
+            sys.exit(1)
+        get_sizing_metrics().count_vms('parse', validator.vms)
+        get_sizing_metrics().count_vms('validate', validator.vms - validator.bad_vms)
+        if validator.bad_vms > 0 and profile_name.startswith('1_'):
+            # named as the csv-based path names the quarantined inventory
+            if profile_name in staged:
+                staged["1_vmdata_df_validated.csv"] = staged.pop(profile_name)
+            profile_name = "1_vmdata_df_validated.csv"
+
+        # cluster profiles are ordered by cluster name, as groupby orders them, with any remainder last
+        profile_files = list(staged.keys())
+        if profile_config in ['all_clusters', 'some_clusters']:
+            clusters = sorted((profile for profile in profile_files if profile != '5_cluster_remainder.csv'), key = lambda profile: profile[len('5_cluster_'):-len('.csv')])
+            profile_files = clusters + [profile for profile in profile_files if profile == '5_cluster_remainder.csv']
+        if len(profile_files) == 0:
+            profile_files = [profile_name]
+            staged[profile_name] = InventoryStore(os.path.join(staging_path, str(len(staged))))
+
+        log('info', '\nBuilding sizing request payload')
+        request_file = f'{output_path}custom_recommendation_request.txt'
+        vms = 0
+        with open(request_file, "w") as f:
+            # written piece by piece in exactly the form json.dumps gives the complete sizerRequest
+            f.write('{"configurations": ' + json.dumps(payload_configurations(**kwargs)) + ', "workloadProfiles": [')
+            for count, profile in enumerate(profile_files):
+                if count > 0:
+                    f.write(', ')
+                f.write(json.dumps(payload_profile(profile, **kwargs))[:-1] + ', "vmList": [')
+                vm_count = 0
+                for chunk in staged[profile].read_chunks(chunk_size):
+                    for vm in vm_info_list(chunk, storage_capacity):
+                        if vm_count > 0:
+                            f.write(', ')
+                        f.write(json.dumps(vm))
+                        vm_count += 1
+                f.write(']}')
+                vms += vm_count
+            f.write(']}')
+    finally:
+        shutil.rmtree(staging_path)
+
+    get_sizing_metrics().count_vms('payload', vms)
+    log('info', f'Sizing request for {len(profile_files)} workload profile(s) written to {request_file}')
+    return request_file
+
+
+# map of command-line arguments to the fields they replace in the sizerRequest configurations
+PATCH_FIELDS = {
+    "cloud_type":"cloudType",
+    "host_type":"sddcHostType",
+    "cluster_type":"clusterType",
+    "data_protection":"fttFtmType",
+    "percent_cpu":"cpuUtilization",
+    "percent_memory":"memoryUtilization"
+    }
 
-    sizerRequest = {
-        "configurations": configurations,
-        "workloadProfiles": workloadProfiles
-        }
+# the fields only VMC on AWS requests carry, and the values a request switched to VMC on AWS is given unless they are supplied
+HOST_FIELDS = {
+    "host_type":("sddcHostType", "I4I"),
+    "cluster_type":("clusterType", "SAZ")
+    }
 
 
-    with open("output/custom_recommendation_request.txt", "w") as f:
-        print(json.dumps(sizerRequest, indent=2), file=f)
- 
-    return json.dumps(sizerRequest)
\ No newline at end of file
+def patch_recommendation_payload(**kwargs):
+    sizer_request = kwargs['sizer_request']
+    configurations = sizer_request['configurations']
+
+    # only fields explicitly supplied are patched - the vmList is left untouched
+    patched = False
+    for arg, field in PATCH_FIELDS.items():
+        if kwargs.get(arg) is None:
+            continue
+        if arg in HOST_FIELDS and configurations['cloudType'] != "VMC_ON_AWS":
+            log('warning', f'{field} does not apply to {configurations["cloudType"]} - ignoring {kwargs[arg]}')
+            continue
+        log('info', f'Setting {field} to {kwargs[arg]}')
+        configurations[field] = kwargs[arg]
+        patched = True
+
+    # the host fields follow the cloud type, as payload_configurations sets them
+    for arg, (field, default) in HOST_FIELDS.items():
+        if configurations['cloudType'] != "VMC_ON_AWS" and field in configurations:
+            log('info', f'Removing {field} - it does not apply to {configurations["cloudType"]}')
+            del configurations[field]
+        elif configurations['cloudType'] == "VMC_ON_AWS" and field not in configurations:
+            log('info', f'Setting {field} to {default}')
+            configurations[field] = default
+
+    return patched
+
+
+def variant_recommendation_payload(**kwargs):
+    '''Returns the configurations and the sizerRequest for one variant of the sizing settings; the workload profiles are passed already serialized, so they are shared by every variant.'''
+    configurations = dict(kwargs['configurations'])
+    profiles_json = kwargs['profiles_json']
+    variant = kwargs['variant']
+
+    # map of variant settings to the fields they replace in the sizerRequest configurations
+    config_fields = {
+        "percent_cpu":"cpuUtilization",
+        "percent_memory":"memoryUtilization",
+        "data_protection":"fttFtmType",
+        "computeOvercommitFactor":"computeOvercommitFactor",
+        "cpuHeadroom":"cpuHeadroom",
+        "hyperThreadingFactor":"hyperThreadingFactor",
+        "memoryOvercommitFactor":"memoryOvercommitFactor",
+        "storageThresholdFactor":"storageThresholdFactor",
+        "compressionRatio":"compressionRatio",
+        "dedupRatio":"dedupRatio"
+        }
+    if configurations['cloudType'] == "VMC_ON_AWS":
+        config_fields.update({"host_type":"sddcHostType", "cluster_type":"clusterType"})
+
+    for setting, field in config_fields.items():
+        if setting in variant:
+            configurations[field] = variant[setting]
+
+    # the same text json.dumps gives for the complete sizerRequest
+    sizer_request = '{"configurations": ' + json.dumps(configurations) + ', "workloadProfiles": ' + profiles_json + '}'
+    return configurations, sizer_request
+
+
+def shard_recommendation_payload(**kwargs):
+    sizer_request = json.loads(kwargs['sizer_request'])
+    max_vms = kwargs['shard_vms']
+    max_bytes = kwargs['shard_bytes']
+
+    log('info', '\nSplitting sizing request payload into shards')
+    configurations = sizer_request['configurations']
+
+    # split oversized profiles into parts no larger than the VM count / byte limits
+    profile_parts = []
+    for profile in sizer_request['workloadProfiles']:
+        parts = []
+        part = []
+        part_bytes = 0
+        for vm in profile['vmList']:
+            vm_bytes = len(json.dumps(vm))
+            full_count = max_vms is not None and len(part) >= max_vms
+            full_bytes = max_bytes is not None and len(part) > 0 and part_bytes + vm_bytes > max_bytes
+            if full_count or full_bytes:
+                parts.append((part, part_bytes))
+                part = []
+                part_bytes = 0
+            part.append(vm)
+            part_bytes += vm_bytes
+        parts.append((part, part_bytes))
+
+        for count, (part, part_bytes) in enumerate(parts, start=1):
+            shard_profile = {k: v for k, v in profile.items() if k != 'vmList'}
+            if len(parts) > 1:
+                shard_profile['profileName'] = f'{profile["profileName"]}_part{count}'
+            shard_profile['vmList'] = part
+            profile_parts.append((shard_profile, part_bytes))
+
+    # pack the profile parts into shards, keeping whole small profiles together where they fit
+    shards = []
+    shard_profiles = []
+    shard_vms = 0
+    shard_bytes = 0
+    for shard_profile, part_bytes in profile_parts:
+        part_vms = len(shard_profile['vmList'])
+        full_count = max_vms is not None and shard_vms + part_vms > max_vms
+        full_bytes = max_bytes is not None and shard_bytes + part_bytes > max_bytes
+        if len(shard_profiles) > 0 and (full_count or full_bytes):
+            shards.append({"configurations": configurations, "workloadProfiles": shard_profiles})
+            shard_profiles = []
+            shard_vms = 0
+            shard_bytes = 0
+        shard_profiles.append(shard_profile)
+        shard_vms += part_vms
+        shard_bytes += part_bytes
+    if len(shard_profiles) > 0:
+        shards.append({"configurations": configurations, "workloadProfiles": shard_profiles})
+
+    log('info', f'Request split into {len(shards)} shard(s).')
+    return [json.dumps(shard) for shard in shards]
+
+
+def split_recommendation_payload(**kwargs):
+    sizer_request = json.loads(kwargs['sizer_request'])
+
+    # one independent request per workload profile, keyed by profile name
+    profile_requests = {}
+    for profile in sizer_request['workloadProfiles']:
+        profile_request = {
+            "configurations": sizer_request['configurations'],
+            "workloadProfiles": [profile]
+            }
+        profile_requests[profile['profileName']] = json.dumps(profile_request)
+
+    return profile_requests
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - on-disk inventory store module
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+class InventoryStore:
+    '''An append-only, on-disk columnar store of normalized VM rows, read back through memory maps in bounded chunks.
+
+    Numeric columns are stored as raw float64 arrays.  String columns are stored as a null mask, an array of
+    offsets and the concatenated UTF-8 data, so no column ever has to be held in memory as a whole.'''
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.manifest_file = os.path.join(path, 'manifest.json')
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, "r") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"rows": 0, "columns": {}, "sources": {}}
+        self.truncate()
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    @property
+    def columns(self):
+        return list(self.manifest['columns'].keys())
+
+    @property
+    def sources(self):
+        '''Input files already appended, with the signature of the file when it was appended.'''
+        return self.manifest['sources']
+
+    def column_file(self, column, part):
+        return os.path.join(self.path, f'{column}.{part}')
+
+    def write_manifest(self):
+        with open(self.manifest_file, "w") as f:
+            json.dump(self.manifest, f)
+
+    def truncate(self):
+        '''Cuts the column files back to the rows in the manifest, dropping anything an interrupted append wrote past them.'''
+        rows = self.manifest['rows']
+        lengths = {}
+        for column, kind in self.manifest['columns'].items():
+            if kind == 'numeric':
+                lengths[self.column_file(column, 'bin')] = rows * 8
+            else:
+                lengths[self.column_file(column, 'nulls')] = rows
+                lengths[self.column_file(column, 'offsets')] = (rows + 1) * 8
+                lengths[self.column_file(column, 'data')] = int(np.fromfile(self.column_file(column, 'offsets'), dtype=np.int64, count=1, offset=rows * 8)[0])
+        # the hashed keys of the stored VMs, one per row, kept when duplicates are removed
+        lengths[self.column_file('dedup', 'keys')] = rows * 8
+        for file, length in lengths.items():
+            if os.path.exists(file) and os.path.getsize(file) > length:
+                os.truncate(file, length)
+
+    def add_column(self, column, kind):
+        '''Adds a column, back-filled with nulls for the rows already stored.'''
+        rows = self.manifest['rows']
+        if kind == 'numeric':
+            with open(self.column_file(column, 'bin'), "wb") as f:
+                np.full(rows, np.nan).tofile(f)
+        else:
+            with open(self.column_file(column, 'nulls'), "wb") as f:
+                np.ones(rows, dtype=np.uint8).tofile(f)
+            with open(self.column_file(column, 'offsets'), "wb") as f:
+                np.zeros(rows + 1, dtype=np.int64).tofile(f)
+            open(self.column_file(column, 'data'), "wb").close()
+        self.manifest['columns'][column] = kind
+
+    def append(self, vm_df, source=None, signature=None):
+        '''Appends the rows of a dataframe; columns not seen before are added, missing columns are stored as null.'''
+        for column in vm_df.columns:
+            if column not in self.manifest['columns']:
+                kind = 'numeric' if pd.api.types.is_numeric_dtype(vm_df[column]) and not pd.api.types.is_bool_dtype(vm_df[column]) else 'string'
+                self.add_column(column, kind)
+
+        # a column empty in the files appended so far is read as numeric - it becomes a string column once text is appended to it
+        for column in vm_df.columns:
+            if self.manifest['columns'][column] == 'numeric' and not pd.api.types.is_numeric_dtype(vm_df[column]):
+                if (pd.to_numeric(vm_df[column], errors='coerce').isna() & vm_df[column].notna()).any():
+                    self.promote_to_string(column)
+
+        rows = len(vm_df)
+        for column, kind in self.manifest['columns'].items():
+            if kind == 'numeric':
+                if column in vm_df:
+                    values = pd.to_numeric(vm_df[column], errors='coerce').to_numpy(dtype='float64')
+                else:
+                    values = np.full(rows, np.nan)
+                with open(self.column_file(column, 'bin'), "ab") as f:
+                    values.tofile(f)
+            else:
+                self.append_strings(column, vm_df[column] if column in vm_df else pd.Series([None] * rows))
+
+        self.manifest['rows'] += rows
+        if source is not None:
+            self.manifest['sources'][source] = signature
+        self.write_manifest()
+
+    def promote_to_string(self, column, chunk_size=1000000):
+        '''Rewrites a numeric column as a string column, a chunk at a time; whole numbers are written without a decimal point.'''
+        rows = self.manifest['rows']
+        values = self.memmap(column, 'bin', np.float64, rows)
+        with open(self.column_file(column, 'nulls'), "wb") as nulls_file, open(self.column_file(column, 'offsets'), "wb") as offsets_file, open(self.column_file(column, 'data'), "wb") as data_file:
+            np.zeros(1, dtype=np.int64).tofile(offsets_file)
+            last_offset = 0
+            for start in range(0, rows, chunk_size):
+                block = np.array(values[start:start + chunk_size])
+                nulls = np.isnan(block)
+                encoded = [b'' if null else (str(int(value)) if value.is_integer() else repr(float(value))).encode() for value, null in zip(block, nulls)]
+                lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+                nulls.astype(np.uint8).tofile(nulls_file)
+                (last_offset + np.cumsum(lengths)).tofile(offsets_file)
+                data_file.write(b''.join(encoded))
+                last_offset += int(lengths.sum())
+        del values
+        os.remove(self.column_file(column, 'bin'))
+        self.manifest['columns'][column] = 'string'
+        self.write_manifest()
+
+    def append_strings(self, column, values):
+        nulls = values.isna().to_numpy()
+        encoded = [b'' if null else str(value).encode() for value, null in zip(values.to_numpy(dtype=object), nulls)]
+        lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+        # the offset ending the last row in the manifest, whatever follows it in the file
+        last_offset = np.fromfile(self.column_file(column, 'offsets'), dtype=np.int64, count=1, offset=self.manifest['rows'] * 8)[0]
+        with open(self.column_file(column, 'nulls'), "ab") as f:
+            nulls.astype(np.uint8).tofile(f)
+        with open(self.column_file(column, 'offsets'), "ab") as f:
+            (last_offset + np.cumsum(lengths)).tofile(f)
+        with open(self.column_file(column, 'data'), "ab") as f:
+            f.write(b''.join(encoded))
+
+    def memmap(self, column, part, dtype, count=None):
+        if count == 0 or os.path.getsize(self.column_file(column, part)) == 0:
+            return np.zeros(0, dtype=dtype)
+        shape = None if count is None else (count,)
+        return np.memmap(self.column_file(column, part), dtype=dtype, mode='r', shape=shape)
+
+    def read_chunks(self, chunk_size, columns=None):
+        '''Yields the stored rows as dataframes of at most chunk_size rows, reading only the requested columns.'''
+        rows = self.manifest['rows']
+        columns = self.columns if columns is None else [column for column in columns if column in self.manifest['columns']]
+
+        maps = {}
+        for column in columns:
+            if self.manifest['columns'][column] == 'numeric':
+                maps[column] = self.memmap(column, 'bin', np.float64, rows)
+            else:
+                maps[column] = (self.memmap(column, 'nulls', np.uint8, rows), self.memmap(column, 'offsets', np.int64, rows + 1), self.memmap(column, 'data', np.uint8))
+
+        for start in range(0, rows, chunk_size):
+            stop = min(start + chunk_size, rows)
+            chunk = {}
+            for column in columns:
+                if self.manifest['columns'][column] == 'numeric':
+                    chunk[column] = np.array(maps[column][start:stop])
+                else:
+                    nulls, offsets, data = maps[column]
+                    raw = bytes(data[offsets[start]:offsets[stop]])
+                    bounds = offsets[start:stop + 1] - offsets[start]
+                    chunk[column] = [np.nan if nulls[row] else raw[bounds[row - start]:bounds[row - start + 1]].decode() for row in range(start, stop)]
+            yield pd.DataFrame(chunk, index=pd.RangeIndex(start, stop))
@@ -9,7 +9,12 @@
 import argparse
 from argparse import SUPPRESS
 import sys
-from sizer_fxns import describe_import, default_import_sizing, custom_import_sizing
+import os
+import time
+import tempfile
+from sizer_json import enable_authentication
+from sizer_metrics import get_sizing_metrics, log
+from sizer_fxns import describe_import, default_import_sizing, custom_import_sizing, estimate_sizing, sweep_sizing, replay_sizing, diff_import, service_mode
 
 def main():
     class MyFormatter(argparse.RawDescriptionHelpFormatter):
@@ -28,15 +33,47 @@ def main():
     ''')
 
     # create a subparser for the subsequent sections    
-    subparsers = ap.add_subparsers(help='sub-command help')
+    subparsers = ap.add_subparsers(help='sub-command help', dest='command')
 
 # ============================
 # Parent parser containing arguments for all import operations
 # ============================
     parent_import_parser = argparse.ArgumentParser(add_help=False)
-    parent_import_parser.add_argument('-fn', '--file_name', nargs='*', required=True, help="A space-separated list of file names containing the VM inventory to be imported; all files must be of the same type (LiveOptics or RVTools).  By default, this script looks for the file in the 'input' subdirectory.")
+    parent_import_parser.add_argument('-fn', '--file_name', nargs='*', required=True, help="A space-separated list of file names containing the VM inventory to be imported; all files must be of the same type (LiveOptics or RVTools).  A directory or .zip bundle of per-tab csv exports may be given in place of a workbook.  By default, this script looks for the file in the 'input' subdirectory.")
     parent_import_parser.add_argument('-ft', '--file_type', required=True, choices=['rv-tools', 'live-optics'], type=str.lower, help="Specify either 'live-optics' or 'rv-tools'")
 
+# ============================
+# Parent parser containing arguments for removing duplicate VMs - only for commands that build the inventory locally
+# ============================
+    parent_dedup_parser = argparse.ArgumentParser(add_help=False)
+    parent_dedup_parser.add_argument('-dd', '--dedup', nargs='*', help="Use to remove VMs that appear in more than one file. Optionally followed by the fields identifying a VM (e.g. 'vmName vmUuid'); by default vmId per vCenter is used where available.")
+
+# ============================
+# Parent parser containing arguments for the input and output directories
+# ============================
+
+    parent_path_parser = argparse.ArgumentParser(add_help=False)
+    parent_path_parser.add_argument('-in', '--input_dir', default='input', help="The directory holding the input files (default is 'input').")
+    parent_path_parser.add_argument('-out', '--output_dir', default='output', help="The directory output files are written to (default is 'output').")
+    parent_path_parser.add_argument('-ws', '--workspace', action='store_true', help="Use to write the output of this run to a directory of its own under <output_dir>/runs, so several sizings can run at once without sharing intermediate files.")
+
+# ============================
+# Parent parser containing arguments for logging and metrics
+# ============================
+
+    parent_log_parser = argparse.ArgumentParser(add_help=False)
+    parent_log_parser.add_argument('-ll', '--log_level', default='info', choices=['debug', 'info', 'warning', 'error'], type=str.lower, help="The least severe progress messages shown (default is info); use 'warning' or 'error' to show only problems and results.")
+    parent_log_parser.add_argument('-ml', '--metrics_log', help="A file to append JSON lines to - every message, plus the duration, VM count and outcome of each stage, each call to the sizer, and each cache lookup.")
+    parent_log_parser.add_argument('-pf', '--prometheus_file', help="A file to write the run's metrics to in the Prometheus text format, for the node_exporter textfile collector (e.g. /var/lib/node_exporter/sizer.prom).")
+
+# ============================
+# Parent parser containing arguments for authenticated calls to the sizer
+# ============================
+
+    parent_auth_parser = argparse.ArgumentParser(add_help=False)
+    parent_auth_parser.add_argument('-rt', '--refresh_token', default=os.environ.get('CSP_REFRESH_TOKEN'), help="A VMware Cloud Services refresh token used to authenticate calls to the sizer (default is the CSP_REFRESH_TOKEN environment variable, if set).")
+    parent_auth_parser.add_argument('-tc', '--token_cache', default=os.path.join(os.path.expanduser('~'), '.vmc-sizer', 'token_cache.json'), help="The file used to cache the access token between runs (default is ~/.vmc-sizer/token_cache.json).")
+
 # ============================
 # Parent parser containing arguments for all sizing operations
 # ============================
@@ -48,6 +85,24 @@ def main():
     parent_sizing_parser.add_argument('-vp', '--vm_placement', action= "store_true", help="Use to show vm placement. Use to include VM placement data.")
     parent_sizing_parser.add_argument('-logs', '--calculation_logs', action= "store_true", help="Use to show calculation logs. Default is False - results will not, by default, show calculation logs.")
     parent_sizing_parser.add_argument('-o', '--output_format', choices=['csv', 'pdf', 'ppt', 'xls'], help="Select output format Default is none.")
+    parent_sizing_parser.add_argument('-shard', '--shard_vms', type=int, help="Use to split very large inventories into several requests of at most this many VMs each; results are merged into one combined report.")
+    parent_sizing_parser.add_argument('-shard_bytes', '--shard_bytes', type=int, help="Use to split very large inventories into several requests of at most this many bytes of VM data each.")
+    parent_sizing_parser.add_argument('-w', '--workers', type=int, default=4, help="The number of requests to submit concurrently when sizing in several requests (default is 4).")
+
+# ============================
+# Parent parser containing arguments for filtering the inventory and creating workload profiles
+# ============================
+
+    parent_transform_parser = argparse.ArgumentParser(add_help=False)
+    parent_transform_parser.add_argument('-exfil', '--exclude_filter', nargs = '+', help = 'A space-separated list of text strings used to identify workloads to exclude.')
+    parent_transform_parser.add_argument('-eff', '--exclude_filter_field', choices = ['cluster','os','vmName'], help = 'The column/field used for exclusion filtering.')
+    parent_transform_parser.add_argument('-infil', '--include_filter', nargs = '+', help = 'A space-separated list of text strings used to identify workloads to keep.')
+    parent_transform_parser.add_argument('-iff', '--include_filter_field', choices = ['cluster','os','vmName'], help = "The column/field used for inclusion filtering.")
+    parent_transform_parser.add_argument('-ps', '--power_state',  choices = ['p', 'ps'], type=str.lower, help = "By default, all VM are included regardless of powere state. Use to specify whether to include only those (p)owered on, or powered on and suspended (ps).")
+    parent_transform_parser.add_argument('-wp', '--workload_profiles', choices=['all_clusters', 'some_clusters', 'os','vmName'], help = "Use to create workload profiles based on the selected grouping.")
+    parent_transform_parser.add_argument('-pl', '--profile_list', nargs = '+', help = 'A space-separated list of text strings used to filter workloads for the creation of workload profiles.')
+    parent_transform_parser.add_argument('-qr', '--quarantine', action= 'store_true', help= "The inventory is checked before a request is built, and by default the sizing stops if any VM has missing, non-numeric or negative sizes, a duplicate ID (when removing duplicates with -dd - otherwise duplicates are only reported), or (when profiling by cluster) no cluster.  Use to set those VMs aside (listed in output/quarantined_vms.csv) and size the rest.")
+    parent_transform_parser.add_argument('-ir', '--include_remaining', action= 'store_true', help= 'Use to indicate you wish to keep remaining workloads - default is to discard.')
 
 # ============================
 # Subparsers for individual commands
@@ -55,23 +110,23 @@ def main():
 
     # quick_sizing
 
-    describe_parser = subparsers.add_parser('describe', formatter_class=MyFormatter, parents=[parent_import_parser], help='Describe the contents of an imported file.')
+    describe_parser = subparsers.add_parser('describe', formatter_class=MyFormatter, parents=[parent_path_parser,parent_log_parser,parent_import_parser,parent_dedup_parser], help='Describe the contents of an imported file.')
+    describe_parser.add_argument('-pv', '--preview_rows', type=int, default=10, help="The number of VMs, clusters and operating systems to preview on screen (default is 10); the full summary is saved as JSON in the output directory (see -out and -ws).")
     describe_parser.set_defaults(func = describe_import)
 
-    default_sizing_parser = subparsers.add_parser('default', formatter_class=MyFormatter, parents=[parent_import_parser,parent_sizing_parser], help='Import a file and receive a sizing recommendation without transforming data.')
+    default_sizing_parser = subparsers.add_parser('default', formatter_class=MyFormatter, parents=[parent_path_parser,parent_log_parser,parent_import_parser,parent_sizing_parser,parent_auth_parser], help='Import a file and receive a sizing recommendation without transforming data.')
     default_sizing_parser.set_defaults(func = default_import_sizing)
 
-    custom_sizing_parser = subparsers.add_parser('custom', formatter_class=MyFormatter, parents=[parent_import_parser,parent_sizing_parser], help='Import a file and transform the data before receiving a sizing recommendation.')
+    custom_sizing_parser = subparsers.add_parser('custom', formatter_class=MyFormatter, parents=[parent_path_parser,parent_log_parser,parent_import_parser,parent_dedup_parser,parent_transform_parser,parent_sizing_parser,parent_auth_parser], help='Import a file and transform the data before receiving a sizing recommendation.')
     # custom_sizing_parser = subparsers.add_parser('custom', formatter_class=MyFormatter, help='Import a file and transform the data before receiving a sizing recommendation.')
-    custom_sizing_parser.add_argument('-exfil', '--exclude_filter', nargs = '+', help = 'A space-separated list of text strings used to identify workloads to exclude.')
-    custom_sizing_parser.add_argument('-eff', '--exclude_filter_field', choices = ['cluster','os','vmName'], help = 'The column/field used for exclusion filtering.')
-    custom_sizing_parser.add_argument('-infil', '--include_filter', nargs = '+', help = 'A space-separated list of text strings used to identify workloads to keep.')
-    custom_sizing_parser.add_argument('-iff', '--include_filter_field', choices = ['cluster','os','vmName'], help = "The column/field used for inclusion filtering.")
-    custom_sizing_parser.add_argument('-ps', '--power_state',  choices = ['p', 'ps'], type=str.lower, help = "By default, all VM are included regardless of powere state. Use to specify whether to include only those (p)owered on, or powered on and suspended (ps).")
-    custom_sizing_parser.add_argument('-wp', '--workload_profiles', choices=['all_clusters', 'some_clusters', 'os','vmName'], help = "Use to create workload profiles based on the selected grouping.")
-    custom_sizing_parser.add_argument('-pl', '--profile_list', nargs = '+', help = 'A space-separated list of text strings used to filter workloads for the creation of workload profiles.')
     custom_sizing_parser.add_argument('-pt', '--profile_type', nargs = '?', choices = ['GPW_GVM','DBW_ORA','DBW_SQL','VDW_FCL','VDW_ICL'], default = "GPW_GVM", type=str.upper, help = 'Type of workload profile (default = GPW_GVM).')
-    custom_sizing_parser.add_argument('-ir', '--include_remaining', action= 'store_true', help= 'Use to indicate you wish to keep remaining workloads - default is to discard.')   
+    custom_sizing_parser.add_argument('-pp', '--per_profile', action= 'store_true', help= 'Use to size each workload profile as an independent request (up to --workers at a time) and merge the results - a failing profile will not fail the whole sizing.')
+    custom_sizing_parser.add_argument('-so', '--separate_outliers', action= 'store_true', help= "VMs likely to exceed the sizer's outlier limits (75%% of a host's CPU or memory, 50%% of its storage) on the chosen host type are listed before the request is sent.  Use to move them into a workload profile of their own, sized on a separate cluster.")
+    custom_sizing_parser.add_argument('-store', '--store', help= 'A directory holding an on-disk inventory store.  Input files are appended to the store (files already in it are skipped), and filtering, profiling and the sizing request are processed in chunks, so memory use stays flat however many VMs the store holds.')
+    custom_sizing_parser.add_argument('-stream', '--stream', action= 'store_true', help= 'Use to stream the input files in chunks straight into the sizing request - the inventory is never built in memory, and no intermediate csv files are written.')
+    custom_sizing_parser.add_argument('-watch', '--watch', action= 'store_true', help= "Use to keep watching the input files after sizing - files whose content changes are parsed again (unchanged files are not), and a new recommendation is requested only if the sizing request has changed.")
+    custom_sizing_parser.add_argument('-wi', '--watch_interval', type=int, default=60, help= 'The number of seconds between checks of the input files when using --watch (default = 60).')
+    custom_sizing_parser.add_argument('-chunk', '--chunk_size', type=int, default=50000, help= 'The number of VMs processed at a time when using --store or --stream (default = 50000).')
     custom_sizing_parser.add_argument('-sc', '--storage_capacity', nargs = '?', choices=['PROVISIONED', 'UTILIZED'], default = "UTILIZED", type=str.upper, help="Use to specify whether PROVISIONED or UTILIZED storage is used (default is UTILIZED).")
     custom_sizing_parser.add_argument('-st', '--storage_type', nargs = '?', choices=['vSAN_EXT_STORAGE','vSAN_ONLY','EXT_STORAGE_ONLY'], default = "vSAN_ONLY", help="Use to specify vSAN only, external storage, or combination (default = vSAN_ONLY).")
     custom_sizing_parser.add_argument('-sv', '--storage_vendor', nargs = '?', choices=['FSX_N','VMC_FS','AUTO'], default = "AUTO", type=str.upper, help="Use to specify FSX for NetApp OnTap or VMW Cloud Flex Storage is preferred for external capacity (default=VMC_FS).")
@@ -81,6 +136,70 @@ def main():
 
     custom_sizing_parser.set_defaults(func = custom_import_sizing)
 
+    estimate_parser = subparsers.add_parser('estimate', formatter_class=MyFormatter, parents=[parent_path_parser,parent_log_parser,parent_import_parser,parent_dedup_parser,parent_transform_parser], help='Estimate lower-bound host counts locally, in milliseconds, for every combination of the settings given - nothing is sent to the sizer.')
+    estimate_parser.add_argument('-cloud', '--cloud_type', choices=['VMC_ON_AWS', 'GCVE'], default = "VMC_ON_AWS", type=str.upper, help="Which cloud platform are you sizing for?")
+    estimate_parser.add_argument('-ht', '--host_type', nargs = '+', choices=['I3', 'I3EN', 'I4I'], default = ["I4I"], type=str.upper, help="One or more host types to estimate (default is I4I).")
+    estimate_parser.add_argument('-cluster', '--cluster_type', nargs = '+', choices=['SAZ','MAZ'], default = ["SAZ"], type=str.upper, help="One or more of single AZ (SAZ) or stretched cluster (MAZ). Default is SAZ")
+    estimate_parser.add_argument('-sc', '--storage_capacity', nargs = '+', choices=['PROVISIONED', 'UTILIZED'], default = ["UTILIZED"], type=str.upper, help="One or more of PROVISIONED or UTILIZED storage (default is UTILIZED).")
+    estimate_parser.add_argument('-pct_cpu', '--percent_cpu', nargs = '+', default = ['.3'], help= "One or more percent cpu utilizations, expressed as decimals, or start:stop:step ranges (e.g. '.2:.6:.05').")
+    estimate_parser.add_argument('-pct_mem','--percent_memory', nargs = '+', default = ['1'], help= "One or more percent memory utilizations, expressed as decimals, or start:stop:step ranges.")
+    estimate_parser.add_argument('-dp', '--data_protection', nargs = '+', choices=["AUTO_AUTO","FTT1_RAID1","FTT1_RAID5","FTT2_RAID1","FTT2_RAID6"], type=str.upper, default=["AUTO_AUTO"], help = "One or more vSAN failures to tolerate (FTT) and fault tolerance methods (FTM).")
+    estimate_parser.add_argument('-pv', '--preview_rows', type=int, default=20, help="The number of estimates to show on screen, lowest host count first (default is 20); all estimates are saved to output/estimate.csv.")
+    estimate_parser.set_defaults(func = estimate_sizing)
+
+    sweep_parser = subparsers.add_parser('sweep', formatter_class=MyFormatter, parents=[parent_path_parser,parent_log_parser,parent_import_parser,parent_dedup_parser,parent_transform_parser,parent_auth_parser], help='Request a sizing recommendation for every combination of the settings given, and tabulate host counts against the settings.')
+    sweep_parser.add_argument('-cloud', '--cloud_type', choices=['VMC_ON_AWS', 'GCVE'], default = "VMC_ON_AWS", type=str.upper, help="Which cloud platform are you sizing for?")
+    sweep_parser.add_argument('-ht', '--host_type', nargs = '+', choices=['I3', 'I3EN', 'I4I'], default = ["I4I"], type=str.upper, help="One or more host types (default is I4I).")
+    sweep_parser.add_argument('-cluster', '--cluster_type', nargs = '+', choices=['SAZ','MAZ'], default = ["SAZ"], type=str.upper, help="One or more of single AZ (SAZ) or stretched cluster (MAZ). Default is SAZ")
+    sweep_parser.add_argument('-sc', '--storage_capacity', choices=['PROVISIONED', 'UTILIZED'], default = "UTILIZED", type=str.upper, help="Use to specify whether PROVISIONED or UTILIZED storage is used (default is UTILIZED).")
+    sweep_parser.add_argument('-st', '--storage_type', choices=['vSAN_EXT_STORAGE','vSAN_ONLY','EXT_STORAGE_ONLY'], default = "vSAN_ONLY", help="Use to specify vSAN only, external storage, or combination (default = vSAN_ONLY).")
+    sweep_parser.add_argument('-sv', '--storage_vendor', choices=['FSX_N','VMC_FS','AUTO'], default = "AUTO", type=str.upper, help="Use to specify FSX for NetApp OnTap or VMW Cloud Flex Storage is preferred for external capacity.")
+    sweep_parser.add_argument('-pt', '--profile_type', choices = ['GPW_GVM','DBW_ORA','DBW_SQL','VDW_FCL','VDW_ICL'], default = "GPW_GVM", type=str.upper, help = 'Type of workload profile (default = GPW_GVM).')
+    sweep_parser.add_argument('-pct_cpu', '--percent_cpu', nargs = '+', default = ['.3'], help= "One or more percent cpu utilizations, expressed as decimals, or start:stop:step ranges (e.g. '.2:.6:.1').")
+    sweep_parser.add_argument('-pct_mem','--percent_memory', nargs = '+', default = ['1'], help= "One or more percent memory utilizations, expressed as decimals, or start:stop:step ranges.")
+    sweep_parser.add_argument('-dp', '--data_protection', nargs = '+', choices=["AUTO_AUTO","FTT1_RAID1","FTT1_RAID5","FTT2_RAID1","FTT2_RAID6"], type=str.upper, default=["AUTO_AUTO"], help = "One or more vSAN failures to tolerate (FTT) and fault tolerance methods (FTM).")
+    sweep_parser.add_argument('-co', '--compute_overcommit', nargs = '+', help= "One or more vCPU to core overcommit factors, or start:stop:step ranges (default is 4).")
+    sweep_parser.add_argument('-mo', '--memory_overcommit', nargs = '+', help= "One or more memory overcommit factors, or start:stop:step ranges (default is 1.25).")
+    sweep_parser.add_argument('-hr', '--cpu_headroom', nargs = '+', help= "One or more CPU headroom fractions, or start:stop:step ranges (default is .15).")
+    sweep_parser.add_argument('-cr', '--compression_ratio', nargs = '+', help= "One or more compression ratios, or start:stop:step ranges (default is 1.25).")
+    sweep_parser.add_argument('-dr', '--dedup_ratio', nargs = '+', help= "One or more dedup ratios, or start:stop:step ranges (default is 1.5).")
+    sweep_parser.add_argument('-vp', '--vm_placement', action= "store_true", help="Use to include VM placement data.")
+    sweep_parser.add_argument('-w', '--workers', type=int, default=4, help="The number of recommendations to request concurrently (default is 4).")
+    sweep_parser.add_argument('-mv', '--max_variants', type=int, default=200, help="The largest number of combinations that will be sent to the sizer (default is 200).")
+    sweep_parser.add_argument('-nc', '--no_cache', action= "store_true", help="Use to request every recommendation again, rather than reusing responses saved by earlier sweeps in output/sweep_cache.")
+    sweep_parser.set_defaults(func = sweep_sizing)
+
+    replay_parser = subparsers.add_parser('replay', formatter_class=MyFormatter, parents=[parent_path_parser,parent_log_parser,parent_auth_parser], help='Resubmit one or more saved sizing requests without re-parsing the original inventory.')
+    replay_parser.add_argument('-rf', '--request_file', nargs='+', required=True, help="A space-separated list of saved request files (e.g. custom_recommendation_request.txt) or directories containing them.  Files not found as given are looked for in the 'output' subdirectory.")
+    replay_parser.add_argument('-w', '--workers', type=int, default=1, help="The number of requests to submit concurrently when replaying more than one file (default is 1).")
+    replay_parser.add_argument('-cloud', '--cloud_type', choices=['VMC_ON_AWS', 'GCVE'], type=str.upper, help="Use to replace the cloud type in the saved request.")
+    replay_parser.add_argument('-ht', '--host_type', choices=['I3', 'I3EN', 'I4I'], type=str.upper, help="Use to replace the host type in the saved request.")
+    replay_parser.add_argument('-cluster', '--cluster_type', choices=['SAZ','MAZ'], type=str.upper, help="Use to replace the cluster type (SAZ / MAZ) in the saved request.")
+    replay_parser.add_argument('-dp', '--data_protection', choices=["AUTO_AUTO","FTT1_RAID1","FTT1_RAID5","FTT2_RAID1","FTT2_RAID6"], type=str.upper, help = "Use to replace the vSAN failures to tolerate (FTT) and fault tolerance method (FTM) in the saved request.")
+    replay_parser.add_argument('-pct_cpu', '--percent_cpu', type=float, help= "Use to replace the percent cpu utilization in the saved request, expressed as a decimal.")
+    replay_parser.add_argument('-pct_mem','--percent_memory', type=float, help= "Use to replace the percent memory utilization in the saved request, expressed as a decimal.")
+    replay_parser.add_argument('-vp', '--vm_placement', action= "store_true", help="Use to show vm placement. Use to include VM placement data.")
+    replay_parser.add_argument('-logs', '--calculation_logs', action= "store_true", help="Use to show calculation logs. Default is False - results will not, by default, show calculation logs.")
+    replay_parser.add_argument('-o', '--output_format', choices=['csv', 'pdf', 'ppt', 'xls'], help="Select output format Default is none.")
+    replay_parser.set_defaults(func = replay_sizing)
+
+    diff_parser = subparsers.add_parser('diff', formatter_class=MyFormatter, parents=[parent_path_parser,parent_log_parser], help='Compare two inventories (VMs added, removed and resized), and / or two saved recommendations (hosts by cluster and host type).')
+    diff_parser.add_argument('-ft', '--file_type', choices=['rv-tools', 'live-optics'], type=str.lower, help="Specify either 'live-optics' or 'rv-tools' for the inventories being compared.")
+    diff_parser.add_argument('-old', '--old_files', nargs='+', help="A space-separated list of the file names holding the earlier inventory, in the 'input' subdirectory.")
+    diff_parser.add_argument('-new', '--new_files', nargs='+', help="A space-separated list of the file names holding the later inventory, in the 'input' subdirectory.")
+    diff_parser.add_argument('-dd', '--dedup', nargs='*', help="Use to remove VMs that appear in more than one file of the same inventory; optionally followed by the fields identifying a VM.")
+    diff_parser.add_argument('-dk', '--diff_key', nargs='+', help="The fields matching a VM between the inventories (default is vmId, per vCenter where the exports record it).")
+    diff_parser.add_argument('-rec', '--recommendation_files', nargs=2, metavar=('OLD', 'NEW'), help="Two saved recommendation responses to compare (e.g. recommendation_response.json, saved with every recommendation).  Files not found as given are looked for in the 'output' subdirectory.")
+    diff_parser.add_argument('-pv', '--preview_rows', type=int, default=10, help="The number of added, removed and resized VMs to show on screen (default is 10); all changes are saved to output/inventory_diff.csv.")
+    diff_parser.set_defaults(func = diff_import)
+
+    serve_parser = subparsers.add_parser('serve', formatter_class=MyFormatter, parents=[parent_path_parser,parent_log_parser,parent_auth_parser], help='Run a local HTTP/JSON sizing service (describe / default / custom) that keeps parsed files and responses in memory between requests.')
+    serve_parser.add_argument('-host', '--host', default='127.0.0.1', help="The address to listen on (default is 127.0.0.1).")
+    serve_parser.add_argument('-port', '--port', type=int, default=8080, help="The port to listen on (default is 8080).")
+    serve_parser.add_argument('-ic', '--inventory_cache', type=int, default=8, help="The number of parsed inventories to keep in memory (default is 8); the least recently used is evicted first.")
+    serve_parser.add_argument('-rc', '--response_cache', type=int, default=128, help="The number of Sizer responses to keep in memory (default is 128).")
+    serve_parser.set_defaults(func = service_mode)
+
 # ============================
 # Parse arguments and call function
 # ============================
@@ -95,11 +214,29 @@ def main():
         pass
 
     params = vars(args)
-    params.update({"input_path": 'input/'})
-    params.update({"output_path": 'output/'})
+
+    # progress messages below the log level are not shown; stages, sizer calls and cache lookups are recorded for the metrics files
+    get_sizing_metrics().configure(log_level=params['log_level'], log_file=params['metrics_log'], prometheus_file=params['prometheus_file'])
+
+    params.update({"input_path": os.path.join(params['input_dir'], '')})
+    params.update({"output_root": os.path.join(params['output_dir'], '')})
+    os.makedirs(params['output_root'], exist_ok=True)
+
+    # a directory of its own for this run's output, so concurrent runs never read or overwrite each other's intermediate files
+    if params['workspace'] is True:
+        os.makedirs(f'{params["output_root"]}runs', exist_ok=True)
+        params.update({"output_path": os.path.join(tempfile.mkdtemp(prefix=time.strftime("%Y%m%d-%H%M%S-"), dir=f'{params["output_root"]}runs'), '')})
+        log('info', f'Output of this run is written to {params["output_path"]}')
+    else:
+        params.update({"output_path": params['output_root']})
+
+    # attach a cached, automatically refreshed access token to all calls to the sizer if a refresh token was supplied
+    if params.get('refresh_token') is not None:
+        enable_authentication(refresh_token=params['refresh_token'], token_cache=params['token_cache'])
 
     # Call the appropriate function with the dictionary containing the arguments.
-    args.func(**params)
+    with get_sizing_metrics().run(params['command']):
+        args.func(**params)
     sys.exit(0)
 
 if __name__ == "__main__":
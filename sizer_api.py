@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - library API module
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+from sizer_json import parse_excel_api, get_recommendation_api
+from data_transform import lova_inventory, rvtools_inventory, inventory_summary, InventoryValidator, power_state_filter, include_filter, exclude_filter, workload_profiles, recommendation_payload
+from sizer_estimate import predict_outliers, route_outliers
+from sizer_output import recommendation_transformer
+from sizer_metrics import get_sizing_metrics, payload_bytes, log_to
+
+
+# defaults mirror those of the 'default' and 'custom' commands in sizer-cli.py
+SIZING_DEFAULTS = {
+    "input_path":"input/",
+    "cloud_type":"VMC_ON_AWS",
+    "host_type":"I4I",
+    "cluster_type":"SAZ",
+    "vm_placement":False,
+    "calculation_logs":False,
+    "workers":4,
+    "dedup":None
+    }
+
+CUSTOM_DEFAULTS = {
+    "quarantine":False,
+    "power_state":None,
+    "include_filter":None,
+    "include_filter_field":None,
+    "exclude_filter":None,
+    "exclude_filter_field":None,
+    "workload_profiles":None,
+    "profile_list":None,
+    "profile_type":"GPW_GVM",
+    "include_remaining":False,
+    "separate_outliers":False,
+    "storage_capacity":"UTILIZED",
+    "storage_type":"vSAN_ONLY",
+    "storage_vendor":"AUTO",
+    "percent_cpu":.3,
+    "percent_memory":1,
+    "data_protection":"AUTO_AUTO"
+    }
+
+STAGES = ['parse', 'summary', 'validate', 'filter', 'profile', 'outliers', 'payload', 'request', 'transform', 'render']
+
+
+class SizingError(RuntimeError):
+    '''Raised by the library API where the command line would print an error and exit; stage names the stage that failed.'''
+    def __init__(self, message, stage=None):
+        super().__init__(message)
+        self.stage = stage
+
+
+class SizingInputError(SizingError):
+    '''Raised where the command line would exit on invalid input - a stage could not run on the files or parameters it was given.'''
+
+
+class InventoryError(SizingInputError):
+    '''Raised when the inventory fails validation; issues lists every problem found, one row each.'''
+    def __init__(self, message, issues):
+        super().__init__(message, 'validate')
+        self.issues = issues
+
+
+class SizingHooks:
+    '''Callbacks run around each stage of a sizing.
+
+    A callback is called as callback(stage, event, context): event is 'before' when the stage starts, and 'after' or
+    'error' when it ends.  context is the same dictionary for all three calls - it holds the inputs of the stage, and
+    after the stage its 'result' (or its 'error'), so a callback can keep its own state in it between the calls.'''
+    def __init__(self):
+        self.callbacks = []
+
+    def register(self, callback, stages=None):
+        '''Registers a callback for the given stages, or for every stage.'''
+        self.callbacks.append((callback, None if stages is None else set(stages)))
+        return callback
+
+    def notify(self, stage, event, context):
+        for callback, stages in self.callbacks:
+            if stages is None or stage in stages:
+                callback(stage, event, context)
+
+    @contextmanager
+    def stage(self, name, **inputs):
+        context = dict(inputs)
+        self.notify(name, 'before', context)
+        try:
+            yield context
+        except SystemExit:
+            # the shared data functions exit on unrecoverable input errors
+            context['error'] = SizingInputError(f'The {name} stage could not be completed - please check the parameters.', name)
+            self.notify(name, 'error', context)
+            raise context['error'] from None
+        except Exception as e:
+            context['error'] = e
+            self.notify(name, 'error', context)
+            raise
+        self.notify(name, 'after', context)
+
+
+class StageTimer:
+    '''A ready-made hook recording the wall-clock duration of each stage, in seconds.'''
+    def __init__(self):
+        self.timings = {}
+
+    def __call__(self, stage, event, context):
+        if event == 'before':
+            context['started'] = time.perf_counter()
+        else:
+            self.timings[stage] = self.timings.get(stage, 0) + time.perf_counter() - context['started']
+
+
+class MetricsHook:
+    '''A ready-made hook recording the duration and outcome of each stage, and the VMs and request bytes it was given, in the shared sizer_metrics - labelled with command.'''
+    def __init__(self, command):
+        self.command = command
+
+    def __call__(self, stage, event, context):
+        if event == 'before':
+            context['metrics_started'] = time.perf_counter()
+        else:
+            outcome = 'ok' if event == 'after' else 'error'
+            get_sizing_metrics().record_stage(stage, outcome, time.perf_counter() - context['metrics_started'], command = self.command, vms = context.get('vms'), request_bytes = context.get('request_bytes'))
+
+
+def sizing_params(kwargs, defaults):
+    '''Merges the caller's parameters over the defaults, and checks the input files exist.'''
+    params = dict(defaults)
+    params.update(kwargs)
+    if params.get('file_type') not in ['rv-tools', 'live-optics']:
+        raise ValueError("file_type must be either 'rv-tools' or 'live-optics'")
+    if isinstance(params.get('file_name'), str):
+        params['file_name'] = [params['file_name']]
+    if not params.get('file_name'):
+        raise ValueError("file_name must be a list of one or more file names")
+    for file in params['file_name']:
+        if not os.path.exists(f'{params["input_path"]}{file}'):
+            raise ValueError(f'{file} could not be found in {params["input_path"]}')
+    return params
+
+
+@contextmanager
+def captured_output(quiet):
+    '''Collects the progress messages the shared functions log, rather than letting them reach the terminal.
+
+    Only the messages logged by this sizing - in the calling thread, and the workers it starts - are collected, so
+    sizings running at once in other threads each keep their own.'''
+    messages = io.StringIO()
+    if quiet is True:
+        with log_to(messages):
+            yield messages
+    else:
+        yield messages
+
+
+def parse_inventory(params, hooks):
+    with hooks.stage('parse', file_type = params['file_type'], file_name = params['file_name']) as stage:
+        match params['file_type']:
+            case 'live-optics':
+                vm_data_df = lova_inventory(input_path = params['input_path'], file_name = params['file_name'], dedup = params['dedup'])
+            case 'rv-tools':
+                vm_data_df = rvtools_inventory(input_path = params['input_path'], file_name = params['file_name'], dedup = params['dedup'])
+        stage['result'] = vm_data_df
+    return vm_data_df
+
+
+def custom_request(vm_data_df, params, hooks=None):
+    '''Validates, filters and profiles a parsed inventory and builds the sizerRequest; returns (profiles, sizer_request).
+
+    The filters return new frames, so the inventory passed in is never modified.'''
+    hooks = SizingHooks() if hooks is None else hooks
+
+    with hooks.stage('validate', vms = len(vm_data_df), quarantine = params['quarantine']) as stage:
+        validator = InventoryValidator(quarantine = params['quarantine'], cluster_profiles = params['workload_profiles'] in ['all_clusters', 'some_clusters'], dedup_key = params['dedup'])
+        vm_data_df = validator.check(vm_data_df)
+        stage['result'] = validator.issue_list()
+        if validator.report(params.get('output_path')) is False:
+            raise InventoryError(f'{validator.bad_vms} of {validator.vms} VM(s) failed validation.', stage['result'])
+
+    with hooks.stage('filter', vms = len(vm_data_df)) as stage:
+        if params['power_state'] is not None:
+            vm_data_df = power_state_filter(vm_data_df, params['power_state'])
+        if params['include_filter'] is not None:
+            if params['include_filter_field'] is None:
+                raise ValueError("include_filter_field is required with an include_filter")
+            vm_data_df = include_filter(vm_data_df, params['include_filter'], params['include_filter_field'])
+        if params['exclude_filter'] is not None:
+            if params['exclude_filter_field'] is None:
+                raise ValueError("exclude_filter_field is required with an exclude_filter")
+            vm_data_df = exclude_filter(vm_data_df, params['exclude_filter'], params['exclude_filter_field'])
+        stage['result'] = vm_data_df
+
+    with hooks.stage('profile', vms = len(vm_data_df), workload_profiles = params['workload_profiles']) as stage:
+        if params['workload_profiles'] is not None:
+            if params['workload_profiles'] != 'all_clusters' and params['profile_list'] is None:
+                raise ValueError("profile_list is required for the selected workload_profiles")
+            profiles = workload_profiles(vm_data_df, params['workload_profiles'], params['profile_list'], params['include_remaining'])
+        else:
+            profiles = {}
+        if len(profiles) == 0:
+            profiles = {"1_vmdata_df.csv": vm_data_df}
+        stage['result'] = profiles
+
+    # the result is the limits each VM probably exceeds, by host type
+    with hooks.stage('outliers', vms = len(vm_data_df), separate_outliers = params['separate_outliers']) as stage:
+        host_types = ['I3', 'I3EN', 'I4I'] if params['cloud_type'] == "VMC_ON_AWS" else ['VE1']
+        host_type = params['host_type'] if params['cloud_type'] == "VMC_ON_AWS" else 'VE1'
+        outliers = predict_outliers(vm_data_df, host_types, storage_capacity = params['storage_capacity'], data_protection = params['data_protection'], storage_type = params['storage_type'], cloud_type = params['cloud_type'])
+        if params['separate_outliers'] is True:
+            profiles = route_outliers(profiles, outliers[host_type] != '')
+        stage['result'] = outliers
+
+    with hooks.stage('payload', profiles = len(profiles)) as stage:
+        payload_params = {
+            "profiles":profiles,
+            "cloud_type":params['cloud_type'],
+            "host_type":params['host_type'],
+            "cluster_type":params['cluster_type'],
+            "storage_capacity":params['storage_capacity'],
+            "storage_type":params['storage_type'],
+            "storage_vendor":params['storage_vendor'],
+            "profile_type":params['profile_type'],
+            "pct_cpu":params['percent_cpu'],
+            "pct_mem":params['percent_memory'],
+            "fttFtmType":params['data_protection']
+            }
+        sizer_request = json.dumps(recommendation_payload(**payload_params))
+        stage['result'] = sizer_request
+    return profiles, sizer_request
+
+
+def sizing_result(sizer_request, params, hooks, render):
+    '''Requests the recommendation for a sizerRequest, transforms it and optionally renders it.'''
+    result = {"sizer_request": sizer_request}
+
+    with hooks.stage('request', request_bytes = payload_bytes(sizer_request), vm_placement = params['vm_placement']) as stage:
+        json_raw = get_recommendation_api(vp = params['vm_placement'], json_data = sizer_request)
+        if json_raw is None:
+            raise SizingError("The Sizer did not return a recommendation.", 'request')
+        stage['result'] = json_raw
+    result['recommendation'] = json_raw
+
+    with hooks.stage('transform') as stage:
+        # the calculation log and assumptions are taken out of a copy, so the raw recommendation is returned whole
+        json_data = dict(json_raw)
+        result['calculation_log'] = json_data.pop('calculationLog', None)
+        result['assumptions'] = json_data.pop('sizingAssumtions', None)
+        result['output'] = recommendation_transformer(json_data)
+        stage['result'] = result['output']
+
+    if render is not None:
+        with hooks.stage('render') as stage:
+            stage['result'] = render(recommendation = result['output'], calcs = result['calculation_log'], assumps = result['assumptions'], cl = params['calculation_logs'])
+        result['rendered'] = stage['result']
+    return result
+
+
+def describe(hooks=None, quiet=True, **kwargs):
+    '''Parses the inventory and returns it with its summary: {"inventory": dataframe, "summary": dict, "messages": str}.'''
+    hooks = SizingHooks() if hooks is None else hooks
+    params = sizing_params(kwargs, SIZING_DEFAULTS)
+
+    with captured_output(quiet) as messages:
+        vm_data_df = parse_inventory(params, hooks)
+        with hooks.stage('summary', vms = len(vm_data_df)) as stage:
+            stage['result'] = inventory_summary(vm_data_df)
+    return {"inventory": vm_data_df, "summary": stage['result'], "messages": messages.getvalue()}
+
+
+def default_sizing(hooks=None, render=None, quiet=True, **kwargs):
+    '''Sizes the inventory with the default parameters, the Sizer's adapter parsing the file.
+
+    Returns {"sizer_request", "recommendation", "calculation_log", "assumptions", "output", "messages"}, where output is
+    the recommendation as recommendation_transformer returns it; render, if given, is called as sizer_output.terminal_output
+    is and its return value added as "rendered".'''
+    hooks = SizingHooks() if hooks is None else hooks
+    params = sizing_params(kwargs, SIZING_DEFAULTS)
+
+    with captured_output(quiet) as messages:
+        with hooks.stage('parse', file_type = params['file_type'], file_name = params['file_name']) as stage:
+            vms_json = parse_excel_api(file_type = params['file_type'], input_path = params['input_path'], file_name = params['file_name'], workers = params['workers'])
+            if vms_json is None:
+                raise SizingError("The Sizer could not parse the file.", 'parse')
+            stage['result'] = vms_json
+        sizer_request = json.dumps(vms_json['response']['sizerRequest'])
+        result = sizing_result(sizer_request, params, hooks, render)
+    result['messages'] = messages.getvalue()
+    return result
+
+
+def custom_sizing(hooks=None, render=None, quiet=True, **kwargs):
+    '''Sizes the inventory with the parameters given, parsed, filtered and profiled locally and entirely in memory.
+
+    Takes the parameters of the 'custom' command, by the names they have in sizer-cli.py (file_type, file_name,
+    include_filter, workload_profiles, percent_cpu...), and returns what default_sizing does, plus "profiles" - the
+    workload profile dataframes the request was built from.'''
+    hooks = SizingHooks() if hooks is None else hooks
+    params = sizing_params(kwargs, dict(SIZING_DEFAULTS, **CUSTOM_DEFAULTS))
+
+    with captured_output(quiet) as messages:
+        vm_data_df = parse_inventory(params, hooks)
+        profiles, sizer_request = custom_request(vm_data_df, params, hooks)
+        result = sizing_result(sizer_request, params, hooks, render)
+    result['profiles'] = profiles
+    result['messages'] = messages.getvalue()
+    return result
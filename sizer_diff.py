@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - inventory and recommendation diff module
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import numpy as np
+import pandas as pd
+
+
+# the VM sizes compared between inventories
+DIFF_METRICS = ['vCpu', 'vRam', 'vmdkUsed', 'vmdkTotal']
+
+
+def diff_key(old_df, new_df, key=None):
+    '''Resolves the fields identifying a VM in both inventories - by default vmId, per vCenter where both exports record it.'''
+    if key is None or len(key) == 0:
+        key = ['vmId', 'vCenter'] if 'vCenter' in old_df and 'vCenter' in new_df else ['vmId']
+    missing = [field for field in key if field not in old_df or field not in new_df]
+    if len(missing) > 0:
+        raise ValueError(f'the following key fields are not present in both inventories: {missing}')
+    return key
+
+
+def keyed_inventory(vm_data_df, key):
+    '''Projects the inventory onto the fields compared, indexed by a 64-bit hash of the key; repeated keys after the first are dropped.'''
+    columns = key + [column for column in ['vmName', 'cluster'] if column not in key] + DIFF_METRICS
+    keyed = vm_data_df[[column for column in columns if column in vm_data_df]].copy()
+    keyed['keyHash'] = pd.util.hash_pandas_object(vm_data_df[key], index=False).to_numpy()
+    repeated = keyed['keyHash'].duplicated()
+    return keyed[~repeated.to_numpy()], int(repeated.sum())
+
+
+def inventory_diff(old_df, new_df, key=None):
+    '''Joins two inventories on the VM key, and classifies each VM as added, removed, resized or unchanged.
+
+    Returns {"changes", "clusters", "summary"}: one row per changed or moved VM with the old and new size and the
+    delta of each metric (added and removed VMs count in full), the VM count and deltas by cluster, and the totals.'''
+    key = diff_key(old_df, new_df, key)
+    old, old_repeated = keyed_inventory(old_df, key)
+    new, new_repeated = keyed_inventory(new_df, key)
+
+    # a hash join of the two inventories on the key
+    joined = pd.merge(old, new, on = 'keyHash', how = 'outer', suffixes = ('_old', '_new'), indicator = True, sort = False)
+    removed = (joined['_merge'] == 'left_only').to_numpy()
+    added = (joined['_merge'] == 'right_only').to_numpy()
+
+    diff = pd.DataFrame(index = joined.index)
+    for column in key + ['vmName']:
+        if f'{column}_new' in joined:
+            diff[column] = joined[f'{column}_new'].combine_first(joined[f'{column}_old'])
+    if 'cluster_old' in joined:
+        diff['cluster_old'] = joined['cluster_old']
+        diff['cluster_new'] = joined['cluster_new']
+
+    resized = np.zeros(len(joined), dtype=bool)
+    for metric in DIFF_METRICS:
+        old_values = joined[f'{metric}_old'].to_numpy(dtype='float64')
+        new_values = joined[f'{metric}_new'].to_numpy(dtype='float64')
+        diff[f'{metric}_old'] = old_values
+        diff[f'{metric}_new'] = new_values
+        diff[f'{metric}_delta'] = np.nan_to_num(new_values) - np.nan_to_num(old_values)
+        resized |= (old_values != new_values) & ~(np.isnan(old_values) & np.isnan(new_values))
+
+    diff['change'] = np.select([added, removed, resized], ['added', 'removed', 'resized'], 'unchanged')
+    if 'cluster_old' in diff:
+        # a VM with no cluster in either inventory has not moved
+        moved = (diff['cluster_old'] != diff['cluster_new']) & ~(diff['cluster_old'].isna() & diff['cluster_new'].isna())
+        diff['moved'] = ~added & ~removed & moved.to_numpy()
+    else:
+        diff['moved'] = False
+    changes = diff[(diff['change'] != 'unchanged') | diff['moved']].reset_index(drop = True)
+
+    # per-cluster totals of each inventory, so VMs moved between clusters count against both
+    if 'cluster' in old_df and 'cluster' in new_df:
+        clusters = pd.concat({"old": old_df.groupby('cluster', dropna = False)[DIFF_METRICS].sum(), "new": new_df.groupby('cluster', dropna = False)[DIFF_METRICS].sum()}, axis = 1).fillna(0)
+        for metric in DIFF_METRICS:
+            clusters[('delta', metric)] = clusters[('new', metric)] - clusters[('old', metric)]
+        clusters = clusters['delta'].add_suffix('_delta')
+        clusters.insert(0, 'vms_old', old_df.groupby('cluster', dropna = False).size().reindex(clusters.index, fill_value = 0))
+        clusters.insert(1, 'vms_new', new_df.groupby('cluster', dropna = False).size().reindex(clusters.index, fill_value = 0))
+    else:
+        clusters = None
+
+    summary = {change: int((diff['change'] == change).sum()) for change in ['added', 'removed', 'resized', 'unchanged']}
+    summary['moved'] = int(diff['moved'].sum())
+    summary['key'] = key
+    summary['repeated_keys'] = {"old": old_repeated, "new": new_repeated}
+    summary['totals'] = {metric: {"old": float(old_df[metric].sum()), "new": float(new_df[metric].sum()), "delta": float(new_df[metric].sum() - old_df[metric].sum())} for metric in DIFF_METRICS}
+    return {"changes": changes, "clusters": clusters, "summary": summary}
+
+
+def recommendation_hosts(json_data):
+    '''Host and VM counts per cluster and host type, and the host breakup, of a recommendation response.'''
+    if 'sddcList' not in json_data:
+        raise ValueError("the file is not a recommendation response")
+    if json_data['sddcList'][0]['clusterList']['sazClusters'] is None:
+        cluster_type = 'mazClusters'
+    else:
+        cluster_type = 'sazClusters'
+
+    rows = []
+    for count, cluster in enumerate(json_data['sddcList'][0]['clusterList'][cluster_type]['clusterInfoList']):
+        for host in cluster['hostList']:
+            rows.append({"cluster": f'cluster_{count}', "hostType": host.get('hostType') or 'n/a', "hosts": 1, "vms": len(host.get('vmList') or [])})
+    hosts = pd.DataFrame(rows, columns = ['cluster', 'hostType', 'hosts', 'vms']).groupby(['cluster', 'hostType']).sum()
+
+    breakup = pd.json_normalize(json_data['sddcList'][0]['clusterList'][cluster_type]['hostBreakupList'])
+    if 'hostType' in breakup:
+        breakup = breakup.groupby('hostType').sum(numeric_only = True)
+    else:
+        breakup = breakup.sum(numeric_only = True).to_frame('total').T
+    return hosts, breakup
+
+
+def recommendation_diff(old_json, new_json):
+    '''Compares two recommendation responses by cluster and host type, and by host breakup; returns {"clusters", "breakup", "summary"}.'''
+    old_hosts, old_breakup = recommendation_hosts(old_json)
+    new_hosts, new_breakup = recommendation_hosts(new_json)
+
+    clusters = old_hosts.join(new_hosts, how = 'outer', lsuffix = '_old', rsuffix = '_new').fillna(0).astype(int)
+    for column in ['hosts', 'vms']:
+        clusters[f'{column}_delta'] = clusters[f'{column}_new'] - clusters[f'{column}_old']
+    clusters = clusters[['hosts_old', 'hosts_new', 'hosts_delta', 'vms_old', 'vms_new', 'vms_delta']].reset_index()
+
+    # one row per host type and breakup field
+    breakup = pd.concat({"old": old_breakup.stack(), "new": new_breakup.stack()}, axis = 1).fillna(0)
+    breakup['delta'] = breakup['new'] - breakup['old']
+
+    summary = {
+        "clusters": {"old": int(old_hosts.index.get_level_values('cluster').nunique()), "new": int(new_hosts.index.get_level_values('cluster').nunique())},
+        "hosts": {"old": int(old_hosts['hosts'].sum()), "new": int(new_hosts['hosts'].sum())}
+        }
+    for count in summary.values():
+        count['delta'] = count['new'] - count['old']
+    return {"clusters": clusters, "breakup": breakup, "summary": summary}
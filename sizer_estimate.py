@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - local estimate module
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import itertools
+import numpy as np
+import pandas as pd
+from data_transform import payload_configurations
+
+
+# per host: physical cores, memory (GiB) and raw vSAN capacity (TiB); GCVE is sized on ve1-standard-72 hosts
+HOST_CAPACITIES = {
+    "I3": {"cores": 36, "memory": 512, "storage": 10.37},
+    "I3EN": {"cores": 48, "memory": 768, "storage": 45.84},
+    "I4I": {"cores": 64, "memory": 1024, "storage": 20.46},
+    "VE1": {"cores": 36, "memory": 768, "storage": 17.46}
+    }
+
+# raw capacity consumed per GiB written, and the smallest cluster supporting each vSAN policy
+DATA_PROTECTION = {
+    "FTT1_RAID1": {"overhead": 2, "min_hosts": 3},
+    "FTT1_RAID5": {"overhead": 4/3, "min_hosts": 4},
+    "FTT2_RAID1": {"overhead": 3, "min_hosts": 5},
+    "FTT2_RAID6": {"overhead": 1.5, "min_hosts": 6},
+    # the sizer chooses the policy - the most efficient one gives the lower bound
+    "AUTO_AUTO": {"overhead": 4/3, "min_hosts": 2}
+    }
+
+# the configurations fields the estimate depends on
+ESTIMATE_FIELDS = ['computeOvercommitFactor', 'cpuHeadroom', 'hyperThreadingFactor', 'memoryOvercommitFactor', 'storageThresholdFactor', 'compressionRatio', 'dedupRatio']
+
+
+def profile_totals(profiles):
+    '''Totals the VMs of each workload profile, as the values are sent in the sizerRequest (whole numbers).'''
+    totals = []
+    for profile, vm_data_df in profiles.items():
+        totals.append({
+            "profile": profile,
+            "vms": len(vm_data_df),
+            "vCpu": np.trunc(vm_data_df['vCpu'].to_numpy(dtype='float64')).sum(),
+            "vRam": np.trunc(vm_data_df['vRam'].to_numpy(dtype='float64')).sum(),
+            "vmdkUsed": np.trunc(vm_data_df['vmdkUsed'].to_numpy(dtype='float64')).sum(),
+            "vmdkTotal": np.trunc(vm_data_df['vmdkTotal'].to_numpy(dtype='float64')).sum()
+            })
+    return pd.DataFrame(totals)
+
+
+def sweep_values(values):
+    '''Expands a list of numbers and start:stop:step ranges (stop included) into a list of floats.'''
+    expanded = []
+    for value in values:
+        if ':' in str(value):
+            start, stop, step = (float(part) for part in value.split(':'))
+            if step <= 0 or stop < start:
+                raise ValueError(f'{value} is not a valid range')
+            count = int(round((stop - start) / step)) + 1
+            expanded.extend(np.round(start + step * np.arange(count), 10).tolist())
+        else:
+            expanded.append(float(value))
+    return expanded
+
+
+def estimate_variants(**kwargs):
+    '''Builds one row of sizing settings per combination of the values given; settings not varied take the values build_recommendation_payload sends.'''
+    cloud_type = kwargs['cloud_type']
+    host_types = kwargs['host_type'] if cloud_type == "VMC_ON_AWS" else ["VE1"]
+
+    sweep = {
+        "host_type": host_types,
+        "cluster_type": kwargs['cluster_type'],
+        "percent_cpu": sweep_values(kwargs['percent_cpu']),
+        "percent_memory": sweep_values(kwargs['percent_memory']),
+        "data_protection": kwargs['data_protection'],
+        "storage_capacity": kwargs['storage_capacity']
+        }
+    configurations = payload_configurations(cloud_type = cloud_type, host_type = host_types[0], cluster_type = kwargs['cluster_type'][0], pct_cpu = None, pct_mem = None, fttFtmType = None)
+    for field in ESTIMATE_FIELDS:
+        if kwargs.get(field) is not None:
+            sweep[field] = sweep_values(kwargs[field])
+        else:
+            sweep[field] = [configurations[field]]
+
+    return pd.DataFrame(list(itertools.product(*sweep.values())), columns = list(sweep.keys()))
+
+
+def estimate_hosts(profiles, variants):
+    '''Computes a lower bound for the host count of each variant, for all variants at once.
+
+    Each workload profile is sized as its own cluster, as the sizerRequest asks; a profile needs at least enough hosts
+    for its CPU, memory and storage, and for the smallest cluster the vSAN policy allows.'''
+    capacities = pd.DataFrame(HOST_CAPACITIES).T
+    protection = pd.DataFrame(DATA_PROTECTION).T
+
+    # profiles down the rows, variants across the columns
+    vms = profiles['vms'].to_numpy(dtype='float64')[:, None]
+    vcpu = profiles['vCpu'].to_numpy(dtype='float64')[:, None]
+    vram = profiles['vRam'].to_numpy(dtype='float64')[:, None]
+    utilized = profiles['vmdkUsed'].to_numpy(dtype='float64')[:, None]
+    provisioned = profiles['vmdkTotal'].to_numpy(dtype='float64')[:, None]
+
+    def setting(column):
+        return variants[column].to_numpy(dtype='float64')[None, :]
+
+    cores = variants['host_type'].map(capacities['cores']).to_numpy(dtype='float64')[None, :]
+    memory = variants['host_type'].map(capacities['memory']).to_numpy(dtype='float64')[None, :]
+    storage = variants['host_type'].map(capacities['storage']).to_numpy(dtype='float64')[None, :]
+    overhead = variants['data_protection'].map(protection['overhead']).to_numpy(dtype='float64')[None, :]
+    min_hosts = variants['data_protection'].map(protection['min_hosts']).to_numpy(dtype='float64')[None, :]
+
+    # CPU - utilized vCPU against the usable hyperthreaded cores, and the vCPU to core overcommit ratio
+    cpu_capacity = cores * setting('hyperThreadingFactor') * (1 - setting('cpuHeadroom'))
+    cpu_hosts = np.maximum(np.ceil(vcpu * setting('percent_cpu') / cpu_capacity), np.ceil(vcpu / (cores * setting('computeOvercommitFactor'))))
+
+    # memory - utilized vRAM, allowing for overcommit
+    memory_hosts = np.ceil(vram * setting('percent_memory') / setting('memoryOvercommitFactor') / memory)
+
+    # storage - data reduced by compression and dedup, grown by the vSAN policy, filled only to the threshold
+    data = np.where(variants['storage_capacity'].to_numpy()[None, :] == "PROVISIONED", provisioned, utilized)
+    raw = data / (setting('compressionRatio') * setting('dedupRatio')) * overhead / setting('storageThresholdFactor') / 1024
+    storage_hosts = np.ceil(raw / storage)
+
+    hosts = np.maximum.reduce([cpu_hosts, memory_hosts, storage_hosts, np.broadcast_to(min_hosts, cpu_hosts.shape)])
+
+    # a stretched cluster keeps a full copy of the workload in each availability zone
+    stretched = variants['cluster_type'].to_numpy()[None, :] == "MAZ"
+    hosts = np.where(stretched, 2 * np.maximum(hosts, 2), hosts)
+
+    # profiles without VMs need no cluster
+    hosts = np.where(vms > 0, hosts, 0)
+
+    estimate = variants.copy()
+    estimate['cpu_hosts'] = np.where(vms > 0, cpu_hosts, 0).sum(axis=0).astype(int)
+    estimate['memory_hosts'] = np.where(vms > 0, memory_hosts, 0).sum(axis=0).astype(int)
+    estimate['storage_hosts'] = np.where(vms > 0, storage_hosts, 0).sum(axis=0).astype(int)
+    estimate['hosts'] = hosts.sum(axis=0).astype(int)
+    estimate['clusters'] = int((profiles['vms'] > 0).sum())
+    return estimate
+
+
+# the limits exceeded by a VM, named for each combination of the cpu (1), memory (2) and storage (4) flags
+OUTLIER_REASONS = [', '.join(name for bit, name in enumerate(['cpu', 'memory', 'storage']) if code >> bit & 1) for code in range(8)]
+
+
+def predict_outliers(vm_data_df, host_types, **kwargs):
+    '''Flags the VMs the sizer will probably report as outliers on each host type, for all VMs and host types at once.
+
+    A VM is an outlier when it needs more of a single host than the vmOutlierLimits sent in the configurations allow:
+    its vCPU against the host's hyperthreaded cores, its vRAM against the host's memory, and its storage, reduced and
+    protected as estimate_hosts reduces and protects it, against the host's usable vSAN capacity (not checked when
+    storage is external only).  Returns a dataframe with the inventory's index and one column per host type, naming
+    the limits each VM exceeds - '' where it exceeds none.'''
+    storage_capacity = kwargs.get('storage_capacity', "UTILIZED")
+    data_protection = kwargs.get('data_protection', "AUTO_AUTO")
+    storage_type = kwargs.get('storage_type', "vSAN_ONLY")
+    configurations = payload_configurations(cloud_type = kwargs.get('cloud_type', "VMC_ON_AWS"), host_type = host_types[0], cluster_type = "SAZ", pct_cpu = None, pct_mem = None, fttFtmType = None)
+    limits = configurations['vmOutlierLimits']
+    capacities = pd.DataFrame(HOST_CAPACITIES).T.loc[host_types]
+
+    # VMs down the rows, host types across the columns; values as the sizerRequest sends them (whole numbers)
+    vcpu = np.trunc(vm_data_df['vCpu'].to_numpy(dtype='float64'))[:, None]
+    vram = np.trunc(vm_data_df['vRam'].to_numpy(dtype='float64'))[:, None]
+    data = np.trunc(vm_data_df['vmdkTotal' if storage_capacity == "PROVISIONED" else 'vmdkUsed'].to_numpy(dtype='float64'))[:, None]
+    cores = capacities['cores'].to_numpy(dtype='float64')[None, :]
+    memory = capacities['memory'].to_numpy(dtype='float64')[None, :]
+    storage = capacities['storage'].to_numpy(dtype='float64')[None, :]
+
+    cpu = vcpu > limits['cpuLimit'] * cores * configurations['hyperThreadingFactor']
+    memory = vram > limits['memoryLimit'] * memory
+    raw = data / (configurations['compressionRatio'] * configurations['dedupRatio']) * DATA_PROTECTION[data_protection]['overhead'] / 1024
+    if storage_type == "EXT_STORAGE_ONLY":
+        storage = np.zeros(cpu.shape, dtype=bool)
+    else:
+        storage = raw > limits['storageLimit'] * storage * configurations['storageThresholdFactor']
+
+    codes = cpu.astype(int) + 2 * memory + 4 * storage
+    return pd.DataFrame(np.array(OUTLIER_REASONS, dtype=object)[codes], index = vm_data_df.index, columns = host_types)
+
+
+def route_outliers(profiles, outliers):
+    '''Moves the VMs flagged in outliers (a boolean series on the inventory's index) out of their workload profiles into a profile of their own, sized on separate clusters.'''
+    routed = {}
+    outlier_list = []
+    for profile, profile_df in profiles.items():
+        flagged = outliers.reindex(profile_df.index, fill_value = False).to_numpy(dtype=bool)
+        outlier_list.append(profile_df[flagged])
+        # a profile made up of outliers alone is dropped
+        if len(profile_df) == 0 or not flagged.all():
+            routed[profile] = profile_df[~flagged]
+    outlier_df = pd.concat(outlier_list, axis=0)
+    if len(outlier_df) > 0:
+        # a VM in more than one profile is only sized once as an outlier
+        routed['5_outliers.csv'] = outlier_df[~outlier_df.index.duplicated()]
+    return routed
+
+
+def estimate_outliers(vm_data_df, variants, **kwargs):
+    '''Counts the probable outliers for the host type, storage capacity and data protection of each variant.'''
+    counts = np.zeros(len(variants), dtype=int)
+    host_types = list(variants['host_type'].unique())
+    for (storage_capacity, data_protection), rows in variants.groupby(['storage_capacity', 'data_protection']).groups.items():
+        flagged = (predict_outliers(vm_data_df, host_types, storage_capacity = storage_capacity, data_protection = data_protection, **kwargs) != '').sum()
+        counts[variants.index.get_indexer(rows)] = variants.loc[rows, 'host_type'].map(flagged).to_numpy(dtype=int)
+    return counts
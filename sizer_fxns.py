@@ -7,21 +7,34 @@
 ################################################################################
 
 import sys
+import os
+import re
 import json
-from sizer_json import parse_excel_api, get_pdf_api, get_recommendation_api
-from data_transform import data_describe, lova_conversion, rvtools_conversion, ps_filter, exclude_workloads, include_workloads, build_workload_profiles, build_recommendation_payload
-from sizer_output import recommendation_transformer, csv_output, excel_output, pdf_output, powerpoint_output, terminal_output 
+import time
+import hashlib
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from sizer_json import get_sizer_limiter, parse_excel_api, get_pdf_api, get_recommendation_api, get_recommendation_cached_api, get_recommendation_batch_api
+from data_transform import data_describe, lova_inventory, rvtools_inventory, lova_conversion, rvtools_conversion, validate_workloads, ps_filter, exclude_workloads, include_workloads, build_workload_profiles, build_recommendation_payload, read_workload_profiles, recommendation_payload, variant_recommendation_payload, store_conversion, store_recommendation_payload, stream_recommendation_payload, PATCH_FIELDS, patch_recommendation_payload, shard_recommendation_payload, split_recommendation_payload
+from sizer_service import run_service
+from sizer_metrics import get_sizing_metrics, log, payload_bytes
+from sizer_api import InventoryError, custom_request
+from sizer_watch import InventoryWatcher
+from sizer_diff import inventory_diff, recommendation_diff
+from sizer_estimate import profile_totals, estimate_variants, estimate_hosts, estimate_outliers, predict_outliers, route_outliers
+from sizer_output import recommendation_transformer, recommendation_merger, csv_output, excel_output, pdf_output, powerpoint_output, terminal_output, merged_terminal_output, estimate_terminal_output, sweep_terminal_output, outlier_terminal_output, limiter_terminal_output, inventory_diff_terminal_output, recommendation_diff_terminal_output
 
 
 def describe_import(**kwargs):
     '''Triggered when user selects "view_only"'''
-    print("Getting overview of environment. Only file type, input path and input file name will be used.")
+    log('info', "Getting overview of environment. Only file type, input path and input file name will be used.")
     input_path = kwargs['input_path']
     ft = kwargs['file_type']
     fn = kwargs['file_name']
     output_path = kwargs['output_path']
 
-    view_params = {"input_path":input_path,"file_name":fn, "output_path":output_path}
+    view_params = {"input_path":input_path,"file_name":fn, "output_path":output_path, "dedup":kwargs['dedup']}
     
     match ft:
         case 'live-optics':
@@ -30,21 +43,21 @@ def describe_import(**kwargs):
             csv_file = rvtools_conversion(**view_params)
 
     if csv_file is not None:
-        data_describe(output_path,csv_file)
+        data_describe(output_path,csv_file,kwargs['preview_rows'])
     else:
-        print()
-        print("Something went wrong.  Please check your syntax and try again.")
+        log('error', "\nSomething went wrong.  Please check your syntax and try again.")
         sys.exit(1)
-    sys.exit(0)
 
 
 def default_import_sizing(**kwargs):
     '''Triggered when user selects "default sizing" using an import file"'''
-    print("Using default parameters for sizing calculations.")
+    log('info', "Using default parameters for sizing calculations.")
+    metrics = get_sizing_metrics()
     input_path = kwargs['input_path']
+    output_path = kwargs['output_path']
     ft = kwargs['file_type']
     fn = kwargs['file_name']
-    options = ['vm_placement', 'calculation_logs', 'output_format']
+    options = ['vm_placement', 'calculation_logs', 'output_format', 'shard_vms', 'shard_bytes', 'workers', 'output_path']
 
     rec_params = {}
     for i in options:
@@ -54,22 +67,35 @@ def default_import_sizing(**kwargs):
             option = None
         rec_params[i] = option
 
-    default_params = {"file_type":ft, "input_path":input_path, "file_name":fn}
-    vms_json = parse_excel_api(**default_params)
-    if vms_json is not None:
+    # the Sizer's parser only reads Excel workbooks
+    for file in fn:
+        if os.path.isdir(f'{input_path}{file}') or file.lower().endswith(('.zip', '.csv', '.gz')):
+            log('error', f'{file} is not an Excel workbook - csv exports may only be used with the describe, custom, estimate and sweep commands.')
+            sys.exit(1)
+
+    default_params = {"file_type":ft, "input_path":input_path, "file_name":fn, "workers":rec_params['workers']}
+    with metrics.stage('parse', files = len(fn)):
+        vms_json = parse_excel_api(**default_params)
+        if vms_json is None:
+            log('error', "\nSomething went wrong.  Please check your syntax and try again.")
+            sys.exit(1)
+
+    with metrics.stage('payload') as stage:
         sizer_request = json.dumps(vms_json['response']['sizerRequest'], indent=2)
-        with open("output/default_recommendation_request.txt", "w") as f:
+        with open(f'{output_path}default_recommendation_request.txt', "w") as f:
             print(sizer_request, file=f)
-        rec_params['sizer_request'] = sizer_request
-        get_recommendation(**rec_params)
+        stage['vms'] = sum(len(profile.get('vmList') or []) for profile in vms_json['response']['sizerRequest']['workloadProfiles'])
+        stage['request_bytes'] = payload_bytes(sizer_request)
 
+    rec_params['sizer_request'] = sizer_request
+    if rec_params['shard_vms'] is not None or rec_params['shard_bytes'] is not None:
+        get_sharded_recommendation(**rec_params)
     else:
-        print()
-        print("Something went wrong.  Please check your syntax and try again.")
-        sys.exit(1)
+        get_recommendation(**rec_params)
 
 
 def custom_import_sizing(**kwargs):
+    metrics = get_sizing_metrics()
     ft = kwargs['file_type']
     fn = kwargs['file_name']
     input_path = kwargs['input_path']
@@ -104,7 +130,7 @@ def custom_import_sizing(**kwargs):
         }
 
     # build the parameter dictionary for getting the recommendation
-    options = ['vm_placement', 'calculation_logs', 'output_format']
+    options = ['vm_placement', 'calculation_logs', 'output_format', 'shard_vms', 'shard_bytes', 'workers', 'output_path']
     rec_params = {}
     for i in options:
         if i in kwargs:
@@ -113,10 +139,88 @@ def custom_import_sizing(**kwargs):
             option = None
         rec_params[i] = option
 
-    # instantiate a list to be used in the payload parameter dictionary
+    # re-size whenever the input files change
+    if kwargs['watch'] is True:
+        if kwargs['store'] is not None or kwargs['stream'] is True:
+            log('error', "--watch cannot be combined with --store or --stream.")
+            sys.exit(1)
+        watch_sizing(**kwargs)
+        return
+
+    # very large inventories - filter, profile and build the request in chunks, from the on-disk inventory store or streamed from the files
+    if kwargs['store'] is not None or kwargs['stream'] is True:
+        if kwargs['store'] is not None and kwargs['stream'] is True:
+            log('error', "Please use either --store or --stream, not both.")
+            sys.exit(1)
+        if kwargs['per_profile'] is True or rec_params['shard_vms'] is not None or rec_params['shard_bytes'] is not None:
+            log('error', "Per-profile and sharded sizing are not available with --store or --stream.")
+            sys.exit(1)
+        if kwargs['separate_outliers'] is True:
+            log('error', "Outliers cannot be separated with --store or --stream.")
+            sys.exit(1)
+        if kwargs['workload_profiles'] in ["some_clusters", "os", "vmName"] and kwargs['profile_list'] is None:
+            log('error', "You must supply a list of one or more valid cluster names / guest operating systems / VM names.  Use './sizer-cli.py describe' for a summary of the environment, or review your file.")
+            sys.exit(1)
+
+        payload_params.update({"chunk_size":kwargs['chunk_size'], "quarantine":kwargs['quarantine'], "power_state":kwargs['power_state'], "include_filter":kwargs['include_filter'], "include_filter_field":kwargs['include_filter_field'], "exclude_filter":kwargs['exclude_filter'], "exclude_filter_field":kwargs['exclude_filter_field'], "workload_profiles":kwargs['workload_profiles'], "profile_list":kwargs['profile_list'], "include_remaining":kwargs['include_remaining'], "dedup":kwargs['dedup']})
+        if kwargs['stream'] is True:
+            payload_params.update({"file_type":ft, "input_path":input_path, "file_name":fn})
+            with metrics.stage('payload', files = len(fn)) as stage:
+                request_file = stream_recommendation_payload(**payload_params)
+                stage['request_bytes'] = os.path.getsize(request_file)
+        else:
+            store_params = {"file_type":ft, "input_path":input_path, "file_name":fn, "store":kwargs['store'], "dedup":kwargs['dedup']}
+            with metrics.stage('parse', files = len(fn)):
+                payload_params['store'] = store_conversion(**store_params)
+            with metrics.stage('payload') as stage:
+                request_file = store_recommendation_payload(**payload_params)
+                stage['request_bytes'] = os.path.getsize(request_file)
+
+        # the request is streamed from disk rather than loaded into memory
+        with open(request_file, "rb") as f:
+            rec_params['sizer_request'] = f
+            get_recommendation(**rec_params)
+        return
+
+    # convert the input files, and apply any filters and workload profiles
+    with metrics.stage('transform', files = len(fn)):
+        wp_file_list = transform_inventory(**kwargs)
+
+    # predict the VMs the sizer will report as outliers, and size them separately if desired
+    with metrics.stage('outliers', separate_outliers = kwargs['separate_outliers']):
+        wp_file_list = outlier_workloads(wp_file_list = wp_file_list, **kwargs)
+
+    # add the list of files including the workloads to the payload parameter dictionary
+    payload_params['wp_file_list'] = wp_file_list
+
+    # build the recommendation payload
+    with metrics.stage('payload', profiles = len(wp_file_list)) as stage:
+        sizer_request = build_recommendation_payload(**payload_params)
+        stage['request_bytes'] = payload_bytes(sizer_request)
+
+    # include the recommendation payload in the sizing request for the sizer
+    rec_params['sizer_request'] = sizer_request
+
+    # get the recommendation - per workload profile, or split into several smaller requests if desired
+    if kwargs['per_profile'] is True:
+        get_profile_recommendations(**rec_params)
+    elif rec_params['shard_vms'] is not None or rec_params['shard_bytes'] is not None:
+        get_sharded_recommendation(**rec_params)
+    else:
+        get_recommendation(**rec_params)
+
+
+def transform_inventory(**kwargs):
+    '''Converts the input files and applies the filters and workload profiles requested; returns the list of csv files holding the workloads.'''
+    ft = kwargs['file_type']
+    fn = kwargs['file_name']
+    input_path = kwargs['input_path']
+    output_path = kwargs['output_path']
+
+    # instantiate a list for the workload profile files
     wp_file_list = []
 
-    ingest_params = {"file_type":ft, "input_path":input_path, "file_name":fn, "output_path":output_path}
+    ingest_params = {"file_type":ft, "input_path":input_path, "file_name":fn, "output_path":output_path, "dedup":kwargs['dedup']}
     match ft:
         case 'live-optics':
             csv_file = lova_conversion(**ingest_params)
@@ -126,6 +230,10 @@ def custom_import_sizing(**kwargs):
     #transform parsed data according to arguments
     if csv_file is not None:
 
+        # check the inventory before anything is built from it
+        validate_params = {"output_path":output_path, "csv_file":csv_file, "quarantine":kwargs['quarantine'], "dedup":kwargs['dedup'], "cluster_profiles":kwargs['workload_profiles'] in ['all_clusters', 'some_clusters']}
+        csv_file = validate_workloads(**validate_params)
+
         if kwargs['power_state'] is not None:
             power_params = {"power_state":kwargs['power_state'], "output_path":output_path, "csv_file":csv_file}
             csv_file = ps_filter(**power_params)
@@ -134,7 +242,7 @@ def custom_import_sizing(**kwargs):
 
         if kwargs['include_filter'] is not None:
             if kwargs['include_filter_field'] is None:
-                print("You must specify BOTH a text string to use as a filter, AND field to filter by (vm_name, guest_os, cluster) when using an include filter.")
+                log('warning', "You must specify BOTH a text string to use as a filter, AND field to filter by (vm_name, guest_os, cluster) when using an include filter.")
             else:
                 inc_filter_params = {"include_filter":kwargs['include_filter'], "include_filter_field":kwargs['include_filter_field'], "output_path":output_path, "csv_file":csv_file}
                 csv_file = include_workloads(**inc_filter_params)
@@ -143,7 +251,7 @@ def custom_import_sizing(**kwargs):
         
         if kwargs['exclude_filter'] is not None:
             if kwargs['exclude_filter_field'] is None:
-                print("You must specify BOTH a text string to use as a filter, AND field to filter by (vm_name, guest_os, cluster) when using an exclude filter.")
+                log('warning', "You must specify BOTH a text string to use as a filter, AND field to filter by (vm_name, guest_os, cluster) when using an exclude filter.")
             else:
                 ex_filter_params = {"exclude_filter":kwargs['exclude_filter'], "exclude_filter_field":kwargs['exclude_filter_field'], "output_path":output_path, "csv_file":csv_file}
                 csv_file = exclude_workloads(**ex_filter_params)
@@ -158,7 +266,7 @@ def custom_import_sizing(**kwargs):
 
                 case "some_clusters" | "os" | "vmName":
                     if kwargs['profile_list'] is None:
-                        print("You must supply a list of one or more valid cluster names / guest operating systems / VM names.  Use './sizer-cli.py describe' for a summary of the environment, or review your file.")
+                        log('error', "You must supply a list of one or more valid cluster names / guest operating systems / VM names.  Use './sizer-cli.py describe' for a summary of the environment, or review your file.")
                         sys.exit(1)
                     else:
                         profile_params = {"csv_file":csv_file, "workload_profiles":kwargs['workload_profiles'], "profile_list":kwargs['profile_list'], "include_remaining":kwargs['include_remaining'], "output_path":output_path}
@@ -172,27 +280,480 @@ def custom_import_sizing(**kwargs):
         else:
             pass
 
-        # add the list of files including the workloads to the payload parameter dictionary
-        payload_params['wp_file_list'] = wp_file_list
+        return wp_file_list
 
-        # build the recommendation payload
-        sizer_request = build_recommendation_payload(**payload_params)
+    else:
+        log('error', "Something went wrong.  Please check your syntax and try again.")
+        sys.exit(1)
 
-        # include the recommendation payload in the sizing request for the sizer
-        rec_params['sizer_request'] = sizer_request
 
-        # get the recommendation
-        get_recommendation(**rec_params)
-    
+def read_profiles(output_path, wp_file_list):
+    '''Reads the workload profile csv files back, keeping the row labels given at conversion.  Returns {file: dataframe}.'''
+    return {file: pd.read_csv(f'{output_path}{file}', index_col=0) for file in wp_file_list}
+
+
+def profile_inventory(profiles):
+    '''Joins the workload profiles read by read_profiles into one inventory, each VM once.'''
+    vm_data_df = pd.concat(list(profiles.values()), axis=0)
+    return vm_data_df[~vm_data_df.index.duplicated()]
+
+
+def outlier_workloads(**kwargs):
+    '''Reports the probable outliers on each host type; with separate_outliers, moves those for the chosen host type into a workload profile of their own.  Returns the list of workload profile files.'''
+    output_path = kwargs['output_path']
+    wp_file_list = kwargs['wp_file_list']
+    cloud_type = kwargs['cloud_type']
+
+    host_types = ['I3', 'I3EN', 'I4I'] if cloud_type == "VMC_ON_AWS" else ['VE1']
+    host_type = kwargs['host_type'] if cloud_type == "VMC_ON_AWS" else 'VE1'
+    profiles = read_profiles(output_path, wp_file_list)
+    vm_data_df = profile_inventory(profiles)
+    outliers = predict_outliers(vm_data_df, host_types, storage_capacity = kwargs['storage_capacity'], data_protection = kwargs['data_protection'], storage_type = kwargs['storage_type'], cloud_type = cloud_type)
+    outlier_terminal_output(outliers = outliers, vm_data_df = vm_data_df, host_type = host_type, preview_rows = 10)
+
+    flagged = outliers[host_type] != ''
+    if not flagged.any():
+        # a list left by an earlier run no longer applies
+        if os.path.exists(f'{output_path}outliers.csv'):
+            os.remove(f'{output_path}outliers.csv')
+        return wp_file_list
+    outliers[flagged].to_csv(f'{output_path}outliers.csv')
+    if kwargs['separate_outliers'] is not True:
+        log('info', f'\nThe outliers predicted are listed in {output_path}outliers.csv - use -so to size them in a workload profile of their own.')
+        return wp_file_list
+
+    routed = route_outliers(profiles, flagged)
+    for profile_file, profile_df in routed.items():
+        profile_df.to_csv(f'{output_path}{profile_file}')
+    log('info', f'\n{int(flagged.sum())} probable outlier(s) moved to the workload profile 5_outliers.csv.')
+    return list(routed.keys())
+
+
+def watch_sizing(**kwargs):
+    '''Sizes the inventory, then watches the input files - changed files are parsed again, and a new recommendation is requested only if the sizing request has changed.'''
+    input_path = kwargs['input_path']
+    output_path = kwargs['output_path']
+    fn = kwargs['file_name']
+    interval = kwargs['watch_interval']
+
+    options = ['vm_placement', 'calculation_logs', 'output_format', 'shard_vms', 'shard_bytes', 'workers', 'output_path']
+    rec_params = {option: kwargs.get(option) for option in options}
+
+    watcher = InventoryWatcher(**kwargs)
+    sized_digest = None
+    log('info', f'Watching {", ".join(fn)} in {input_path} every {interval} seconds - press Ctrl+C to stop.')
+    try:
+        while True:
+            try:
+                parsed = watcher.refresh()
+            except (Exception, SystemExit):
+                log('warning', f'The input file(s) could not be parsed - trying again in {interval} seconds.')
+                parsed = []
+
+            if len(parsed) > 0 and watcher.ready():
+                log('info', f'\n{time.strftime("%Y-%m-%d %H:%M:%S")} - parsed {", ".join(parsed)}.')
+                # nothing in one sizing - the settings, the inventory or the Sizer - stops the watch
+                try:
+                    vm_data_df = watcher.inventory(kwargs['dedup'], output_path)
+                    profiles, sizer_request = custom_request(vm_data_df, kwargs)
+                    digest = hashlib.sha256(sizer_request.encode()).hexdigest()
+                    if digest == sized_digest:
+                        log('info', "The sizing request has not changed - the last recommendation still stands.")
+                    else:
+                        with open(f'{output_path}custom_recommendation_request.txt', "w") as f:
+                            print(json.dumps(json.loads(sizer_request), indent=2), file=f)
+                        rec_params['sizer_request'] = sizer_request
+                        if kwargs['per_profile'] is True:
+                            get_profile_recommendations(**rec_params)
+                        elif rec_params['shard_vms'] is not None or rec_params['shard_bytes'] is not None:
+                            get_sharded_recommendation(**rec_params)
+                        else:
+                            get_recommendation(**rec_params)
+                        sized_digest = digest
+                except InventoryError:
+                    log('warning', "The inventory will be checked again when the input files change.")
+                except (Exception, SystemExit) as e:
+                    # the functions that exit have already logged why
+                    if not isinstance(e, SystemExit):
+                        log('error', f'{type(e).__name__}: {e}')
+                    log('warning', "The sizing failed - it will be tried again when the input files change.")
+
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        log('info', "\nStopped watching the input files.")
+
+
+def estimate_sizing(**kwargs):
+    '''Triggered when user selects "estimate" - computes local lower-bound host counts for every combination of the settings given, without calling the sizer'''
+    output_path = kwargs['output_path']
+
+    # convert the input files, and apply any filters and workload profiles
+    wp_file_list = transform_inventory(**kwargs)
+    totals = profile_totals(read_workload_profiles(output_path, wp_file_list))
+
+    try:
+        variants = estimate_variants(**kwargs)
+    except ValueError as e:
+        log('error', f'Unable to build the settings to estimate: {e}')
+        sys.exit(1)
+
+    start = time.perf_counter()
+    estimate = estimate_hosts(totals, variants)
+    estimate['outliers'] = estimate_outliers(profile_inventory(read_profiles(output_path, wp_file_list)), variants, cloud_type = kwargs['cloud_type'])
+    elapsed = time.perf_counter() - start
+
+    estimate.to_csv(f'{output_path}estimate.csv', index=False)
+    estimate_terminal_output(estimate=estimate, preview_rows=kwargs['preview_rows'], elapsed=elapsed)
+    log('info', f'All estimates saved to {output_path}estimate.csv')
+
+
+def sweep_sizing(**kwargs):
+    '''Triggered when user selects "sweep" - requests a recommendation for every combination of the settings given, sharing one vmList across all of them'''
+    output_path = kwargs['output_path']
+    vp = kwargs['vm_placement']
+    workers = kwargs['workers']
+
+    # convert the input files, and apply any filters and workload profiles
+    wp_file_list = transform_inventory(**kwargs)
+    profiles = read_workload_profiles(output_path, wp_file_list)
+
+    variant_params = {
+        "cloud_type":kwargs['cloud_type'],
+        "host_type":kwargs['host_type'],
+        "cluster_type":kwargs['cluster_type'],
+        "percent_cpu":kwargs['percent_cpu'],
+        "percent_memory":kwargs['percent_memory'],
+        "data_protection":kwargs['data_protection'],
+        "storage_capacity":[kwargs['storage_capacity']],
+        "computeOvercommitFactor":kwargs['compute_overcommit'],
+        "memoryOvercommitFactor":kwargs['memory_overcommit'],
+        "cpuHeadroom":kwargs['cpu_headroom'],
+        "compressionRatio":kwargs['compression_ratio'],
+        "dedupRatio":kwargs['dedup_ratio']
+        }
+    try:
+        variants = estimate_variants(**variant_params)
+    except ValueError as e:
+        log('error', f'Unable to build the settings to sweep: {e}')
+        sys.exit(1)
+    if len(variants) > kwargs['max_variants']:
+        log('error', f'{len(variants)} combinations of settings were requested - more than the limit of {kwargs["max_variants"]}.')
+        log('error', "Use './sizer-cli.py estimate' to narrow the range locally, or raise --max_variants.")
+        sys.exit(1)
+
+    # the local lower bound is reported alongside each recommendation
+    estimate = estimate_hosts(profile_totals(profiles), variants)
+
+    # the vmList is built and serialized once; only the configurations differ between variants
+    payload_params = {
+        "profiles":profiles,
+        "cloud_type":kwargs['cloud_type'],
+        "host_type":kwargs['host_type'][0],
+        "cluster_type":kwargs['cluster_type'][0],
+        "storage_capacity":kwargs['storage_capacity'],
+        "storage_type":kwargs['storage_type'],
+        "storage_vendor":kwargs['storage_vendor'],
+        "profile_type":kwargs['profile_type'],
+        "pct_cpu":variants['percent_cpu'][0],
+        "pct_mem":variants['percent_memory'][0],
+        "fttFtmType":kwargs['data_protection'][0]
+        }
+    sizer_request = recommendation_payload(**payload_params)
+    profiles_json = json.dumps(sizer_request['workloadProfiles'])
+    profiles_digest = hashlib.sha256(profiles_json.encode()).hexdigest()
+    del profiles, sizer_request['workloadProfiles']
+
+    if kwargs['no_cache'] is True:
+        cache_path = None
     else:
-        print("Something went wrong.  Please check your syntax and try again.")
+        # shared by every run, so sweeps in separate workspaces still reuse each other's responses
+        cache_path = f'{kwargs["output_root"]}sweep_cache/'
+
+    def size_variant(variant):
+        configurations, json_data = variant_recommendation_payload(configurations = sizer_request['configurations'], profiles_json = profiles_json, variant = variant)
+        cache_file = None
+        if cache_path is not None:
+            key = hashlib.sha256(f'{vp}|{profiles_digest}|{json.dumps(configurations, sort_keys=True)}'.encode()).hexdigest()
+            cache_file = f'{cache_path}{key}.json'
+        start = time.perf_counter()
+        json_raw, cached = get_recommendation_cached_api(json_data = json_data, vp = vp, cache_file = cache_file)
+        return {"latency (s)": round(time.perf_counter() - start, 2), "cached": cached, "recommendation": json_raw}
+
+    log('info', f'\nSizing {len(variants)} combination(s) of settings, {workers} at a time.')
+    records = variants.to_dict('records')
+    with ThreadPoolExecutor(max_workers = workers) as executor:
+        results = list(executor.map(size_variant, records))
+
+    responses = []
+    for count, (variant, result) in enumerate(zip(records, results), start=1):
+        responses.append(dict(request = f'variant_{count}', **variant, estimate = int(estimate['hosts'][count - 1]), **result))
+        save_recommendation_response(output_path, result['recommendation'], f'variant_{count}')
+    sweep = pd.DataFrame(recommendation_merger(responses)['summary'])
+
+    sweep.to_csv(f'{output_path}sweep.csv', index=False)
+    sweep_terminal_output(sweep=sweep, variants=variants)
+    limiter_terminal_output(metrics=get_sizer_limiter().metrics())
+    log('info', f'All results saved to {output_path}sweep.csv')
+
+    if (sweep['status'] != "ok").all():
+        log('error', "Something went wrong.  Please check your syntax and try again.")
+        sys.exit(1)
+
+
+def replay_sizing(**kwargs):
+    '''Triggered when user selects "replay" - resubmits saved sizerRequest files without re-parsing the inventory'''
+    output_root = kwargs['output_root']
+    workers = kwargs['workers']
+    options = ['vm_placement', 'calculation_logs', 'output_format', 'output_path']
+
+    rec_params = {}
+    for i in options:
+        if i in kwargs:
+            option = kwargs[i]
+        else:
+            option = None
+        rec_params[i] = option
+
+    # resolve the list of request files - directories are expanded to the saved *_request.txt files they contain
+    request_files = []
+    for name in kwargs['request_file']:
+        if not os.path.exists(name) and os.path.exists(f'{output_root}{name}'):
+            name = f'{output_root}{name}'
+        if os.path.isdir(name):
+            request_files.extend(sorted(os.path.join(name, f) for f in os.listdir(name) if f.endswith('_request.txt')))
+        elif os.path.isfile(name):
+            request_files.append(name)
+        else:
+            log('error', f'{name} could not be found.')
+
+    if len(request_files) == 0:
+        log('error', "\nNo saved sizing requests found.  Please check your syntax and try again.")
+        sys.exit(1)
+
+    # requests with configurations to patch are loaded and patched in place; the others are streamed from disk unchanged
+    patched = any(kwargs.get(arg) is not None for arg in PATCH_FIELDS)
+    with ExitStack() as files:
+        sizer_requests = []
+        for file in request_files:
+            log('info', f'Reading {file}')
+            if patched is True:
+                with open(file, "r") as f:
+                    sizer_request = json.load(f)
+                patch_recommendation_payload(sizer_request=sizer_request, **kwargs)
+                sizer_requests.append(json.dumps(sizer_request))
+            else:
+                sizer_requests.append(files.enter_context(open(file, "rb")))
+
+        # submit the requests - concurrently if more than one worker is requested
+        results = get_recommendation_batch_api(json_data_list=sizer_requests, vp=rec_params['vm_placement'], workers=workers)
+        responses = [result['response'] for result in results]
+
+        # render the recommendations in the order the files were given
+        failed = 0
+        for file, sizer_request, json_raw in zip(request_files, sizer_requests, responses):
+            print()
+            print(f'Recommendation for {file}:')
+            if json_raw is None:
+                log('error', "Something went wrong with this request.")
+                failed += 1
+                continue
+            # each response is named after its request file when more than one is replayed
+            save_recommendation_response(rec_params['output_path'], json_raw, None if len(request_files) == 1 else re.sub(r'_request$', '', os.path.splitext(os.path.basename(file))[0]))
+            rec_params['sizer_request'] = sizer_request
+            rec_params['json_raw'] = json_raw
+            recommendation_output(**rec_params)
+
+    if failed > 0:
+        log('error', f'\n{failed} of {len(request_files)} saved requests failed.')
+        sys.exit(1)
+
+
+def diff_import(**kwargs):
+    '''Triggered when user selects "diff" - compares two inventories VM by VM, and / or two saved recommendation responses cluster by cluster'''
+    input_path = kwargs['input_path']
+    output_path = kwargs['output_path']
+    output_root = kwargs['output_root']
+    old_files = kwargs['old_files']
+    new_files = kwargs['new_files']
+    recommendation_files = kwargs['recommendation_files']
+
+    if old_files is None and new_files is None and recommendation_files is None:
+        log('error', "Please supply two inventories to compare (--old_files and --new_files), two recommendations to compare (--recommendation_files), or both.")
         sys.exit(1)
 
+    if old_files is not None or new_files is not None:
+        if old_files is None or new_files is None or kwargs['file_type'] is None:
+            log('error', "Comparing inventories requires --file_type, --old_files and --new_files.")
+            sys.exit(1)
+
+        inventories = []
+        for file_name in [old_files, new_files]:
+            match kwargs['file_type']:
+                case 'live-optics':
+                    inventories.append(lova_inventory(input_path = input_path, file_name = file_name, dedup = kwargs['dedup']))
+                case 'rv-tools':
+                    inventories.append(rvtools_inventory(input_path = input_path, file_name = file_name, dedup = kwargs['dedup']))
+
+        start = time.perf_counter()
+        try:
+            diff = inventory_diff(inventories[0], inventories[1], kwargs['diff_key'])
+        except ValueError as e:
+            log('error', f'Unable to compare the inventories: {e}')
+            sys.exit(1)
+        elapsed = time.perf_counter() - start
+
+        diff['changes'].to_csv(f'{output_path}inventory_diff.csv', index=False)
+        inventory_diff_terminal_output(diff=diff, preview_rows=kwargs['preview_rows'], elapsed=elapsed)
+        log('info', f'\nAll changed VMs saved to {output_path}inventory_diff.csv')
+
+    if recommendation_files is not None:
+        responses = []
+        for name in recommendation_files:
+            if not os.path.exists(name) and os.path.exists(f'{output_root}{name}'):
+                name = f'{output_root}{name}'
+            try:
+                with open(name, "r") as f:
+                    responses.append(json.load(f))
+            except (OSError, ValueError):
+                log('error', f'{name} could not be read as a saved recommendation.')
+                sys.exit(1)
+
+        try:
+            diff = recommendation_diff(responses[0], responses[1])
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            log('error', f'Unable to compare the recommendations: {e}')
+            sys.exit(1)
+
+        diff['clusters'].to_csv(f'{output_path}recommendation_diff.csv', index=False)
+        recommendation_diff_terminal_output(diff=diff)
+        log('info', f'\nCluster comparison saved to {output_path}recommendation_diff.csv')
+
+
+def service_mode(**kwargs):
+    '''Triggered when user selects "serve" - runs a local HTTP/JSON sizing service that keeps caches warm between requests'''
+    log('info', "Starting sizing service. Press Ctrl+C to stop.")
+    service_params = {
+        "host":kwargs['host'],
+        "port":kwargs['port'],
+        "input_path":kwargs['input_path'],
+        "inventory_cache":kwargs['inventory_cache'],
+        "response_cache":kwargs['response_cache']
+        }
+    run_service(**service_params)
+
 
 def get_recommendation(**kwargs):
     # take parsed / transformed data and get recommendation.
     sizer_request = kwargs['sizer_request']
+    vp = kwargs['vm_placement']
+
+    rec_params = {}
+    rec_params['vp'] = vp
+    rec_params["json_data"] = sizer_request
+
+    metrics = get_sizing_metrics()
+    with metrics.stage('request', request_bytes = payload_bytes(sizer_request)):
+        json_raw = get_recommendation_api(**rec_params)
+        if json_raw is None:
+            log('error', "Something went wrong.  Please check your syntax and try again.")
+            sys.exit(1)
+
+    save_recommendation_response(kwargs['output_path'], json_raw)
+
+    kwargs['json_raw'] = json_raw
+    with metrics.stage('render', output_format = kwargs['output_format']):
+        recommendation_output(**kwargs)
+
+
+def save_recommendation_response(output_path, json_raw, name=None):
+    '''Keeps the complete response, so later recommendations can be compared against it with 'diff' - as recommendation_response.json, or {name}_response.json for each of the requests of a run that makes several.'''
+    if json_raw is None:
+        return
+    file_name = 'recommendation_response.json' if name is None else f'{re.sub(r"[^A-Za-z0-9_.-]", "_", name)}_response.json'
+    with open(f'{output_path}{file_name}', "w") as f:
+        json.dump(json_raw, f)
+
+
+def get_sharded_recommendation(**kwargs):
+    # split the request into shards, size each independently and merge the results
+    sizer_request = kwargs['sizer_request']
+    vp = kwargs['vm_placement']
+    workers = kwargs['workers']
+
+    metrics = get_sizing_metrics()
+    shard_params = {"sizer_request":sizer_request, "shard_vms":kwargs['shard_vms'], "shard_bytes":kwargs['shard_bytes']}
+    with metrics.stage('shard', request_bytes = payload_bytes(sizer_request)) as stage:
+        shards = shard_recommendation_payload(**shard_params)
+        stage['requests'] = len(shards)
+
+    with metrics.stage('request', requests = len(shards)) as stage:
+        results = get_recommendation_batch_api(json_data_list=shards, vp=vp, workers=workers)
+        stage['failed'] = sum(result['response'] is None for result in results)
+    responses = [result['response'] for result in results]
+
+    shard_results = []
+    for count, (shard, result) in enumerate(zip(shards, results), start=1):
+        shard_json = json.loads(shard)
+        shard_results.append({
+            "request": f'shard_{count}',
+            "profiles": ', '.join(profile['profileName'] for profile in shard_json['workloadProfiles']),
+            "vms": sum(len(profile['vmList']) for profile in shard_json['workloadProfiles']),
+            "latency (s)": result['latency'],
+            "recommendation": result['response']
+            })
+        save_recommendation_response(kwargs['output_path'], result['response'], f'shard_{count}')
+
+    with metrics.stage('render'):
+        merged = recommendation_merger(shard_results)
+        merged_terminal_output(merged=merged)
+        limiter_terminal_output(metrics=get_sizer_limiter().metrics())
+    log('info', "\nNote: profiles split across shards are placed on separate clusters, so combined host counts are an upper bound.")
+
+    if all(json_raw is None for json_raw in responses):
+        log('error', "Something went wrong.  Please check your syntax and try again.")
+        sys.exit(1)
+
+
+def get_profile_recommendations(**kwargs):
+    # size each workload profile as an independent request and merge the results
+    sizer_request = kwargs['sizer_request']
+    vp = kwargs['vm_placement']
+    workers = kwargs['workers']
+
+    metrics = get_sizing_metrics()
+    with metrics.stage('shard', request_bytes = payload_bytes(sizer_request)) as stage:
+        profile_requests = split_recommendation_payload(sizer_request=sizer_request)
+        stage['requests'] = len(profile_requests)
+    log('info', f'Sizing {len(profile_requests)} workload profile(s) independently, {workers} at a time.')
+
+    with metrics.stage('request', requests = len(profile_requests)) as stage:
+        results = get_recommendation_batch_api(json_data_list=list(profile_requests.values()), vp=vp, workers=workers)
+        stage['failed'] = sum(result['response'] is None for result in results)
+
+    profile_results = []
+    for (profile_name, profile_request), result in zip(profile_requests.items(), results):
+        profile_results.append({
+            "request": profile_name,
+            "vms": len(json.loads(profile_request)['workloadProfiles'][0]['vmList']),
+            "latency (s)": result['latency'],
+            "recommendation": result['response']
+            })
+        save_recommendation_response(kwargs['output_path'], result['response'], re.sub(r'\.csv$', '', profile_name))
+
+    with metrics.stage('render'):
+        merged = recommendation_merger(profile_results)
+        merged_terminal_output(merged=merged)
+        limiter_terminal_output(metrics=get_sizer_limiter().metrics())
+
+    if all(result['response'] is None for result in results):
+        log('error', "Something went wrong.  Please check your syntax and try again.")
+        sys.exit(1)
+
 
+def recommendation_output(**kwargs):
+    # take the raw recommendation returned by the sizer and render it
+    json_raw = kwargs['json_raw']
+    sizer_request = kwargs['sizer_request']
     vp = kwargs['vm_placement']
     cl = kwargs['calculation_logs']
     output_format = kwargs['output_format']
@@ -201,12 +762,9 @@ def get_recommendation(**kwargs):
     rec_params['vp'] = vp
     rec_params["json_data"] = sizer_request
 
-    json_raw = get_recommendation_api(**rec_params)
-    if json_raw is None:
-        print("Something went wrong.  Please check your syntax and try again.")
-        sys.exit(1)
-    else:
-        pass
+    # a request streamed from file is rewound for the PDF request
+    if hasattr(sizer_request, 'seek'):
+        sizer_request.seek(0)
 
     # strip calculations out of the json, store for later use
     calcs = json_raw["calculationLog"]
@@ -218,27 +776,23 @@ def get_recommendation(**kwargs):
 
     # take the rest of the json output and transform it
     output_json = recommendation_transformer(json_raw)
-    output_params = {"recommendation":output_json, "calcs":calcs,"assumps":assumps,"cl":cl}
+    output_params = {"recommendation":output_json, "calcs":calcs,"assumps":assumps,"cl":cl,"output_path":kwargs['output_path']}
     match output_format:
         case "csv":
-            print("Exporting recommendation to CSV.")
-            print()
-            print("enabled in a future release.")
+            log('info', "Exporting recommendation to CSV.\n")
+            log('warning', "enabled in a future release.")
 
         case "pdf":
-            print("Exporting recommendation to PDF.")
-            print()
+            log('info', "Exporting recommendation to PDF.\n")
             pdf_content = get_pdf_api(**rec_params)
-            pdf_output(pdf_content)
+            pdf_output(pdf_content, kwargs['output_path'])
             
         case "ppt":
-            print("Exporting recommendation to PowerPoint.")
-            print()
-            print("enabled in a future release.")
+            log('info', "Exporting recommendation to PowerPoint.\n")
+            log('warning', "enabled in a future release.")
 
         case "xls":
-            print("Exporting recommendation to Excel.")
-            print()
-            print("enabled in a future release.")
+            log('info', "Exporting recommendation to Excel.\n")
+            log('warning', "enabled in a future release.")
 
     terminal_output(**output_params)
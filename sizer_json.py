@@ -7,105 +7,474 @@
 ################################################################################
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
 import sys
+import os
+import io
 import json
+import time
+import hashlib
+import random
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from sizer_metrics import get_sizing_metrics, log, payload_bytes, in_context
+
+sizer_session = None
+sizer_limiter = None
+sizer_session_lock = threading.Lock()
+
+
+def get_sizer_session():
+    """ Returns the shared session used for all Sizer API calls, so connections are pooled and reused across requests and threads """
+    global sizer_session
+    with sizer_session_lock:
+        if sizer_session is None:
+            sizer_session = requests.Session()
+            sizer_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+        return sizer_session
+
+
+class AdaptiveRateLimiter:
+    """ Paces the calls made to the Sizer, so fanned-out requests run as fast as the service tolerates.
+    A token bucket spaces out request starts, and the number of requests in flight is limited; both follow an AIMD rule,
+    halving when the Sizer answers 429 / 503 or the latency jumps well above its moving average, and otherwise growing -
+    the limit by one per round of successful calls, the bucket's rate by one request a second per successful call.  A Retry-After asked for by the Sizer pauses every caller, not only the one throttled.
+    Shared by all threads; async callers wait for a slot in a worker thread, as AccessTokenManager.token_async does. """
+    def __init__(self, rate=10, max_rate=100, burst=10, initial_limit=4, max_limit=32, latency_factor=2, max_retries=3):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.tokens = burst
+        self.refilled = time.monotonic()
+        self.limit = initial_limit
+        self.max_limit = max_limit
+        self.latency_factor = latency_factor
+        self.max_retries = max_retries
+        self.latency = None
+        self.in_flight = 0
+        self.queued = 0
+        self.paused_until = 0
+        self.decreased_at = 0
+        self.counts = {"requests": 0, "throttled": 0, "retries": 0, "decreases": 0}
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """ Waits until a request may start; returns its start time, to be passed to release() """
+        with self.condition:
+            self.queued += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+                    self.refilled = now
+                    if now < self.paused_until:
+                        self.condition.wait(self.paused_until - now)
+                    elif self.in_flight >= int(self.limit):
+                        self.condition.wait()
+                    elif self.tokens < 1:
+                        self.condition.wait((1 - self.tokens) / self.rate)
+                    else:
+                        break
+                self.tokens -= 1
+                self.in_flight += 1
+                self.counts['requests'] += 1
+                return now
+            finally:
+                self.queued -= 1
+
+    async def acquire_async(self):
+        """ Waits until a request may start, without blocking the event loop """
+        return await asyncio.to_thread(self.acquire)
+
+    def release(self, started, status_code, retry_after=None):
+        """ Ends a request started by acquire(), adjusting the limit to its outcome; status_code is None if no response was received """
+        now = time.monotonic()
+        latency = now - started
+        with self.condition:
+            self.in_flight -= 1
+            congested = False
+            if status_code in [429, 503]:
+                congested = True
+                self.counts['throttled'] += 1
+                if retry_after is not None:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            elif status_code is not None and status_code < 300:
+                congested = self.latency is not None and latency > self.latency_factor * self.latency
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+            if congested:
+                # one decrease per round trip - requests started before the last decrease were sent under the old limit
+                if started >= self.decreased_at:
+                    self.limit = max(1, self.limit / 2)
+                    self.rate = max(0.1, self.rate / 2)
+                    self.decreased_at = now
+                    self.counts['decreases'] += 1
+            elif status_code is not None and status_code < 300:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.rate = min(self.max_rate, self.rate + 1)
+            self.condition.notify_all()
+
+    def retried(self):
+        with self.condition:
+            self.counts['retries'] += 1
+
+    def metrics(self):
+        """ A snapshot of the requests in flight and queued, the current limit, and the totals so far """
+        with self.condition:
+            return dict(self.counts,
+                in_flight = self.in_flight,
+                queued = self.queued,
+                limit = int(self.limit),
+                rate = round(self.rate, 1),
+                latency = None if self.latency is None else round(self.latency, 2),
+                paused = round(max(0, self.paused_until - time.monotonic()), 1))
+
+
+def get_sizer_limiter():
+    """ Returns the rate limiter shared by all Sizer API calls """
+    global sizer_limiter
+    with sizer_session_lock:
+        if sizer_limiter is None:
+            sizer_limiter = AdaptiveRateLimiter()
+        return sizer_limiter
+
+
+def retry_after_seconds(response):
+    """ The delay asked for in a Retry-After header - a number of seconds, or an HTTP date - or None """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def sizer_post(uri, **kwargs):
+    """ POSTs to the Sizer on the shared session, paced by the shared rate limiter; throttled calls (429 / 503) are retried, after the Retry-After delay if one is given.
+    endpoint names the call in the metrics recorded for it.  Returns None if no access token could be obtained for the call """
+    limiter = get_sizer_limiter()
+    metrics = get_sizing_metrics()
+    session = get_sizer_session()
+    endpoint = kwargs.pop('endpoint', 'sizer')
+    data = kwargs.get('data')
+    request_bytes = payload_bytes(data)
+    reauthenticated = False
+    attempt = 0
+    while True:
+        started = limiter.acquire()
+        response = None
+        try:
+            response = session.post(uri, **kwargs)
+        except AccessTokenError as e:
+            # the reasons the CSP refused the refresh token have already been logged
+            log('error', str(e), endpoint = endpoint)
+            return None
+        finally:
+            retry_after = None if response is None else retry_after_seconds(response)
+            limiter.release(started, None if response is None else response.status_code, retry_after)
+            status = 'error' if response is None else response.status_code
+            metrics.sizer_call(endpoint, status, time.monotonic() - started, request_bytes, 0 if response is None else len(response.content))
+            limits = limiter.metrics()
+            metrics.set('sizer_limiter_concurrency', limits['limit'])
+            metrics.set('sizer_limiter_rate', limits['rate'])
+
+        if response.status_code == 401 and reauthenticated is False and isinstance(session.auth, AccessTokenManager):
+            # the access token was revoked or expired early - a new one is fetched, and the call made once more
+            log('warning', "The access token was not accepted - refreshing it and retrying.", endpoint = endpoint)
+            session.auth.invalidate(response.request.headers.get('csp-auth-token'))
+            reauthenticated = True
+            rewind_payload(data)
+            continue
+
+        if response.status_code not in [429, 503] or attempt == limiter.max_retries:
+            return response
+
+        limiter.retried()
+        metrics.inc('sizer_http_retries_total', endpoint = endpoint)
+        if retry_after is None:
+            retry_after = min(30, 2 ** attempt) * random.uniform(0.5, 1)
+            log('warning', f'The Sizer is busy (status code {response.status_code}) - retrying in {retry_after:.0f} second(s).', endpoint = endpoint)
+            time.sleep(retry_after)
+        else:
+            # the limiter holds every caller until the Retry-After has passed
+            log('warning', f'The Sizer is busy (status code {response.status_code}) - retrying in {retry_after:.0f} second(s), as it asked.', endpoint = endpoint)
+        attempt += 1
+        rewind_payload(data)
+
+
+def rewind_payload(data):
+    """ A body read from a file is sent again from its start """
+    if hasattr(data, 'rewind'):
+        data.rewind()
+    elif hasattr(data, 'seek'):
+        data.seek(0)
+
 
 def sizer_error_handling(fxn_response):
     """ Error handling for HTML / REST API requests """
     code = fxn_response.status_code
-    print (f'API call failed with status code {code}.')
+    log('error', f'API call failed with status code {code}.')
     if code == 301:
-        print(f'Error {code}: "Moved Permanently"')
-        print("Request must be reissued to a different controller node.")
-        print("The controller node has been replaced by a new node that should be used for this and all future requests.")
+        log('error', f'Error {code}: "Moved Permanently"')
+        log('error', "Request must be reissued to a different controller node.")
+        log('error', "The controller node has been replaced by a new node that should be used for this and all future requests.")
     elif code ==307:
-        print(f'Error {code}: "Temporary Redirect"')
-        print("Request should be reissued to a different controller node.")
-        print("The controller node is requesting the client make further requests against the controller node specified in the Location header. Clients should continue to use the new server until directed otherwise by the new controller node.")
+        log('error', f'Error {code}: "Temporary Redirect"')
+        log('error', "Request should be reissued to a different controller node.")
+        log('error', "The controller node is requesting the client make further requests against the controller node specified in the Location header. Clients should continue to use the new server until directed otherwise by the new controller node.")
     elif code ==400:
-        print(f'Error {code}: "Bad Request"')
-        print("Request was improperly formatted or contained an invalid parameter.")
+        log('error', f'Error {code}: "Bad Request"')
+        log('error', "Request was improperly formatted or contained an invalid parameter.")
     elif code ==401:
-        print(f'Error {code}: "Unauthorized"')
-        print("The client has not authenticated.")
-        print("It's likely your refresh token is out of date or otherwise incorrect.")
+        log('error', f'Error {code}: "Unauthorized"')
+        log('error', "The client has not authenticated.")
+        log('error', "It's likely your refresh token is out of date or otherwise incorrect.")
     elif code ==403:
-        print(f'Error {code}: "Forbidden"')
-        print("The client does not have sufficient privileges to execute the request.")
-        print("The API is likely in read-only mode, or a request was made to modify a read-only property.")
-        print("It's likely your refresh token does not provide sufficient access.")
+        log('error', f'Error {code}: "Forbidden"')
+        log('error', "The client does not have sufficient privileges to execute the request.")
+        log('error', "The API is likely in read-only mode, or a request was made to modify a read-only property.")
+        log('error', "It's likely your refresh token does not provide sufficient access.")
     elif code ==409:
-        print(f'Error {code}: "Temporary Redirect"')
-        print("The request can not be performed because it conflicts with configuration on a different entity, or because another client modified the same entity.")
-        print("If the conflict arose because of a conflict with a different entity, modify the conflicting configuration. If the problem is due to a concurrent update, re-fetch the resource, apply the desired update, and reissue the request.")
+        log('error', f'Error {code}: "Temporary Redirect"')
+        log('error', "The request can not be performed because it conflicts with configuration on a different entity, or because another client modified the same entity.")
+        log('error', "If the conflict arose because of a conflict with a different entity, modify the conflicting configuration. If the problem is due to a concurrent update, re-fetch the resource, apply the desired update, and reissue the request.")
     elif code ==412:
-        print(f'Error {code}: "Precondition Failed"')
-        print("The request can not be performed because a precondition check failed. Usually, this means that the client sent a PUT or PATCH request with an out-of-date _revision property, probably because some other client has modified the entity since it was retrieved. The client should re-fetch the entry, apply any desired changes, and re-submit the operation.")
+        log('error', f'Error {code}: "Precondition Failed"')
+        log('error', "The request can not be performed because a precondition check failed. Usually, this means that the client sent a PUT or PATCH request with an out-of-date _revision property, probably because some other client has modified the entity since it was retrieved. The client should re-fetch the entry, apply any desired changes, and re-submit the operation.")
+    elif code ==429:
+        log('error', f'Error {code}: "Too Many Requests"')
+        log('error', "The Sizer is receiving more requests than it can handle - try again later, or with fewer workers.")
     elif code ==500:
-        print(f'Error {code}: "Internal Server Error"')
-        print('''
+        log('error', f'Error {code}: "Internal Server Error"')
+        log('error', '''
         An internal error occurred while executing the request. If the problem persists, perform diagnostic system tests, or contact your support representative.
         This could be due to the use of a modified RVTools or LiveOptics file... 
         be sure to submit an ** unmodified ** file for parsing and recommendations.
         ''')
     elif code ==503:
-        print(f'Error {code}: "Service Unavailable"')
-        print("The request can not be performed because the associated resource could not be reached or is temporarily busy. Please confirm the ORG ID and SDDC ID entries in your config.ini are correct.")
+        log('error', f'Error {code}: "Service Unavailable"')
+        log('error', "The request can not be performed because the associated resource could not be reached or is temporarily busy. Please confirm the ORG ID and SDDC ID entries in your config.ini are correct.")
     else:
-        print(f'Error: {code}: Unknown error')
+        log('error', f'Error: {code}: Unknown error')
     try:
         json_response = fxn_response.json()
         if 'error_message' in json_response:
-            print(json_response['error_message'])
-        print("See https://www.iana.org/assignments/http-status-codes/http-status-codes.xhtml for more information on HTML error codes.")
-        print(fxn_response)
+            log('error', json_response['error_message'])
+        log('error', "See https://www.iana.org/assignments/http-status-codes/http-status-codes.xhtml for more information on HTML error codes.")
+        log('error', str(fxn_response))
     except:
-        print("No additional information in the error response.")
+        log('error', "No additional information in the error response.")
     return None
 
 
 def get_access_token_api(rt):
     """ Gets the Access Token using the Refresh Token """
+    json_response = get_access_token_response_api(rt)
+    if json_response is not None:
+        return json_response['access_token']
+
+
+def get_access_token_response_api(rt):
+    """ Exchanges the Refresh Token at the CSP endpoint; returns the full response, including the token lifetime """
     params = {'api_token': rt}
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    # deliberately not sent on the shared Sizer session, which would attach the (expired) access token being refreshed
     response = requests.post('https://console.cloud.vmware.com/csp/gateway/am/api/auth/api-tokens/authorize',
                              params=params, headers=headers)
     if response.status_code == 200:
-        json_response = response.json()
-        access_token = json_response['access_token']
-        # print(json.dumps(json_response, indent = 4))
-        return access_token
+        return response.json()
     else:
         sizer_error_handling(response)
 
 
-def parse_excel_api(**kwargs):
-    # sessiontoken = kwargs['access_token']
-    fn = kwargs['file_name'][0]
-    input_path = kwargs['input_path']
-    adapter = kwargs['file_type']
-    uri = f'https://vmc.vmware.com/api/vmc-sizer/v5/sizing/adapter/{adapter}'
+class AccessTokenError(RuntimeError):
+    """ Raised when no access token can be obtained from the refresh token """
+
+
+class AccessTokenManager(AuthBase):
+    """ Caches the CSP access token in memory and on disk, and refreshes it shortly before it expires.
+    Attached to a session as its auth handler, the csp-auth-token header is added to every request. """
+    def __init__(self, refresh_token, cache_file=None, refresh_margin=300):
+        self.refresh_token = refresh_token
+        self.token_id = hashlib.sha256(refresh_token.encode()).hexdigest()
+        self.cache_file = cache_file
+        self.refresh_margin = refresh_margin
+        self.access_token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+        self.refresh_count = 0
+        self.read_cache_file()
+
+    def read_cache_file(self):
+        if self.cache_file is None or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        # only reuse a cached token issued for the same refresh token
+        if cached.get('token_id') == self.token_id:
+            self.access_token = cached['access_token']
+            self.expires_at = cached['expires_at']
+
+    def write_cache_file(self):
+        if self.cache_file is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+        # the cache holds a credential - readable by the owner only; written to a temporary file first, so a concurrent
+        # reader never sees a partial token, and the file replaced keeps no permissions of its own
+        temp_file = f'{self.cache_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            os.chmod(temp_file, 0o600)
+            json.dump({"token_id": self.token_id, "access_token": self.access_token, "expires_at": self.expires_at}, f)
+        os.replace(temp_file, self.cache_file)
+
+    def token(self):
+        """ Returns a valid access token; concurrent callers share a single refresh """
+        with self.lock:
+            if self.access_token is None or time.time() >= self.expires_at - self.refresh_margin:
+                json_response = get_access_token_response_api(self.refresh_token)
+                if json_response is None:
+                    raise AccessTokenError("Unable to obtain an access token - check the refresh token.")
+                self.access_token = json_response['access_token']
+                self.expires_at = time.time() + json_response.get('expires_in', 1800)
+                self.refresh_count += 1
+                self.write_cache_file()
+            return self.access_token
+
+    async def token_async(self):
+        """ Returns a valid access token without blocking the event loop """
+        return await asyncio.to_thread(self.token)
 
-    files=[
-        ('file',(fn,open(f'{input_path}{fn}','rb'),'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'))
-        ]
+    def invalidate(self, access_token=None):
+        """ Discards the access token the Sizer rejected, so the next call fetches a new one; a token already replaced by another caller is kept """
+        with self.lock:
+            if access_token is None or access_token == self.access_token:
+                self.access_token = None
+                self.expires_at = 0
 
-    print()
-    print("Submitting Excel file for parsing.")
+    def __call__(self, r):
+        r.headers['csp-auth-token'] = self.token()
+        return r
 
-    response = requests.post(uri, files=files)
+
+def enable_authentication(**kwargs):
+    """ Attaches a cached, automatically refreshed access token to every call made on the shared Sizer session """
+    refresh_token = kwargs['refresh_token']
+    cache_file = kwargs.get('token_cache')
+
+    token_manager = AccessTokenManager(refresh_token, cache_file)
+    get_sizer_session().auth = token_manager
+    return token_manager
+
+
+class MultipartFileUpload:
+    """ A multipart/form-data body holding one file, read from disk block by block as it is sent, so the file is never held in memory """
+    def __init__(self, field, file_path, content_type):
+        boundary = os.urandom(16).hex()
+        preamble = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{os.path.basename(file_path)}"\r\n'
+                    f'Content-Type: {content_type}\r\n\r\n').encode()
+        epilogue = f'\r\n--{boundary}--\r\n'.encode()
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        self.length = len(preamble) + os.path.getsize(file_path) + len(epilogue)
+        self.preamble = preamble
+        self.epilogue = epilogue
+        self.file = open(file_path, 'rb')
+        self.rewind()
+
+    def rewind(self):
+        self.file.seek(0)
+        self.parts = [io.BytesIO(self.preamble), self.file, io.BytesIO(self.epilogue)]
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        data = b''
+        while self.parts and (size < 0 or len(data) < size):
+            block = self.parts[0].read(-1 if size < 0 else size - len(data))
+            if not block:
+                self.parts.pop(0)
+            data += block
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.file.close()
+
+
+def parse_excel_file_api(file_path, adapter):
+    """ Uploads one Excel file to the Sizer adapter for parsing, streamed from disk over the shared session """
+    uri = f'https://vmc.vmware.com/api/vmc-sizer/v5/sizing/adapter/{adapter}'
+    with MultipartFileUpload('file', file_path, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet') as upload:
+        response = sizer_post(uri, endpoint = 'adapter', data = upload, headers = {'Content-Type': upload.content_type})
+    if response is None:
+        return None
     if response.status_code == 200:
         return response.json()
     else:
         sizer_error_handling(response)
 
 
+def merge_adapter_responses(responses, file_names):
+    """ Combines the sizerRequest parsed from each file into one request; profile names repeated across files are qualified with the file name """
+    merged = dict(responses[0])
+    merged['response'] = dict(responses[0]['response'])
+    sizer_request = dict(responses[0]['response']['sizerRequest'])
+    sizer_request['workloadProfiles'] = []
+    profile_names = set()
+    for json_response, fn in zip(responses, file_names):
+        for profile in json_response['response']['sizerRequest']['workloadProfiles']:
+            if profile.get('profileName') in profile_names:
+                profile = dict(profile, profileName = f'{profile["profileName"]} ({fn})')
+            profile_names.add(profile.get('profileName'))
+            sizer_request['workloadProfiles'].append(profile)
+    merged['response']['sizerRequest'] = sizer_request
+    return merged
+
+
+def parse_excel_api(**kwargs):
+    """ Uploads every file for parsing, up to `workers` at a time, and merges the workload profiles parsed from them into a single response """
+    file_name = kwargs['file_name']
+    input_path = kwargs['input_path']
+    adapter = kwargs['file_type']
+    workers = kwargs.get('workers') or 1
+
+    log('info', f'\nSubmitting {len(file_name)} Excel file(s) for parsing.')
+
+    def parse_file(fn):
+        return parse_excel_file_api(f'{input_path}{fn}', adapter)
+
+    if workers > 1 and len(file_name) > 1:
+        with ThreadPoolExecutor(max_workers = min(workers, len(file_name))) as executor:
+            responses = list(executor.map(in_context(parse_file), file_name))
+    else:
+        responses = [parse_file(fn) for fn in file_name]
+
+    failed = [fn for fn, json_response in zip(file_name, responses) if json_response is None]
+    if len(failed) > 0:
+        log('error', f'The following file(s) could not be parsed: {failed}')
+        return None
+    return merge_adapter_responses(responses, file_name)
+
+
 def get_pdf_api(**kwargs):
-    # sessiontoken = kwargs['access_token']
     json_data = kwargs['json_data']
 
-    print()
-    print("Requesting PDF")
+    log('info', "\nRequesting PDF")
     if kwargs['vp'] is not None:
         vp = kwargs['vp']
     else:
@@ -116,10 +485,10 @@ def get_pdf_api(**kwargs):
     else:
         uri = 'https://vmc.vmware.com/api/vmc-sizer/v5/recommendation?vmPlacement=false'
 
-    # my_header = {'Content-Type': 'application/json', 'csp-auth-token': sessiontoken}
-
     my_header = {'Content-Type': 'application/json', 'Accept':'application/pdf'}
-    response = requests.post(uri, headers = my_header, data = json_data)
+    response = sizer_post(uri, endpoint = 'pdf', headers = my_header, data = json_data)
+    if response is None:
+        return None
     if response.status_code == 200:
         return response.content
     else:
@@ -127,17 +496,58 @@ def get_pdf_api(**kwargs):
 
 
 def get_recommendation_api(**kwargs):
-    # sessiontoken = kwargs['access_token']
     json_data = kwargs['json_data']
     vp = kwargs['vp']
 
-    print()
-    print("Requesting recommendation")
+    log('info', "\nRequesting recommendation")
 
     uri = f'https://vmc.vmware.com/api/vmc-sizer/v5/recommendation?vmPlacement={vp}'
     my_header = {'Content-Type': 'application/json'}
-    response = requests.post(uri, headers = my_header, data = json_data)
+    response = sizer_post(uri, endpoint = 'recommendation', headers = my_header, data = json_data)
+    if response is None:
+        return None
     if response.status_code == 200:
         return response.json()
     else:
         sizer_error_handling(response)
+
+
+def get_recommendation_cached_api(**kwargs):
+    """ Returns the recommendation saved in cache_file if there is one; otherwise requests it, and saves it for the next identical request """
+    json_data = kwargs['json_data']
+    vp = kwargs['vp']
+    cache_file = kwargs['cache_file']
+
+    if cache_file is not None and os.path.exists(cache_file):
+        get_sizing_metrics().cache_lookup('sweep_response', True)
+        with open(cache_file, "r") as f:
+            return json.load(f), True
+    if cache_file is not None:
+        get_sizing_metrics().cache_lookup('sweep_response', False)
+
+    json_response = get_recommendation_api(vp = vp, json_data = json_data)
+    if json_response is not None and cache_file is not None:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        # written to a temporary file first, so a concurrent reader never sees a partial response
+        with open(f'{cache_file}.{threading.get_ident()}.tmp', "w") as f:
+            json.dump(json_response, f)
+        os.replace(f'{cache_file}.{threading.get_ident()}.tmp', cache_file)
+    return json_response, False
+
+
+def get_recommendation_batch_api(**kwargs):
+    """ Submits a list of sizing requests, concurrently when more than one worker is requested; returns the response and latency of each request, in request order """
+    json_data_list = kwargs['json_data_list']
+    vp = kwargs['vp']
+    workers = kwargs['workers']
+
+    def timed_request(json_data):
+        start = time.perf_counter()
+        response = get_recommendation_api(vp = vp, json_data = json_data)
+        return {"response": response, "latency": round(time.perf_counter() - start, 2)}
+
+    if workers > 1 and len(json_data_list) > 1:
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            return list(executor.map(in_context(timed_request), json_data_list))
+    else:
+        return [timed_request(json_data) for json_data in json_data_list]
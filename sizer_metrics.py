@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - metrics and logging module
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+# the upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+# the type and description of every metric exported
+METRICS = {
+    "sizer_runs_total": ("counter", "Sizing runs, by command and outcome."),
+    "sizer_run_duration_seconds": ("histogram", "Duration of the sizing runs, by command and outcome."),
+    "sizer_stage_duration_seconds": ("histogram", "Duration of each stage of a sizing, by command, stage and outcome."),
+    "sizer_inventory_vms": ("gauge", "VMs counted at each stage of the latest sizing, by command and stage."),
+    "sizer_request_bytes": ("gauge", "Size of the latest sizing request, in bytes, by command."),
+    "sizer_http_request_duration_seconds": ("histogram", "Latency of the calls to the Sizer API, by endpoint and status code."),
+    "sizer_http_request_bytes_total": ("counter", "Bytes sent to the Sizer API, by endpoint."),
+    "sizer_http_response_bytes_total": ("counter", "Bytes received from the Sizer API, by endpoint."),
+    "sizer_http_retries_total": ("counter", "Calls to the Sizer API retried after being throttled, by endpoint."),
+    "sizer_limiter_concurrency": ("gauge", "Requests the rate limiter lets in flight at once."),
+    "sizer_limiter_rate": ("gauge", "Requests a second the rate limiter lets start."),
+    "sizer_cache_lookups_total": ("counter", "Cache lookups, by cache and result (hit or miss).")
+    }
+
+sizing_metrics = None
+sizing_metrics_lock = threading.Lock()
+
+# where the messages logged in the current context are shown - the terminal when None (see log_to)
+log_sink = contextvars.ContextVar('log_sink', default = None)
+
+
+class SizingMetrics:
+    """ Counters, gauges and histograms of the sizing runs, exported in the Prometheus text format, and a log of leveled
+    messages and structured events (stages, Sizer calls, cache lookups, runs) written as JSON lines.  Shared by all threads. """
+    def __init__(self):
+        self.values = {}
+        self.log_level = LOG_LEVELS['info']
+        self.log_file = None
+        self.prometheus_file = None
+        self.command = None
+        self.lock = threading.Lock()
+
+    def configure(self, log_level='info', log_file=None, prometheus_file=None):
+        """ Sets the lowest level of message shown, the JSON lines file events are appended to, and the Prometheus textfile written at the end of each run """
+        self.log_level = LOG_LEVELS[log_level]
+        self.log_file = log_file
+        self.prometheus_file = prometheus_file
+
+    def key(self, name, labels):
+        # labels without a value (e.g. the command, outside a run) are left out
+        return (name, tuple(sorted((label, str(value)) for label, value in labels.items() if value is not None)))
+
+    def inc(self, name, value=1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.values[self.key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        """ Adds a value to a histogram - the count of each bucket it falls in, the sum and the count """
+        key = self.key(name, labels)
+        with self.lock:
+            histogram = self.values.setdefault(key, [[0] * len(LATENCY_BUCKETS), 0, 0])
+            for count, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[0][count] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def log(self, level, message, **fields):
+        """ Writes every message to the JSON lines log, and prints it if its level is at or above the level configured - warnings and errors to stderr """
+        self.event('log', level = level, message = message.strip(), **fields)
+        if LOG_LEVELS[level] >= self.log_level:
+            sink = log_sink.get()
+            if sink is not None:
+                print(message, file = sink)
+            else:
+                print(message, file = sys.stderr if LOG_LEVELS[level] >= LOG_LEVELS['warning'] else sys.stdout)
+
+    def event(self, event, **fields):
+        """ Appends a structured event to the JSON lines log, if there is one; the file is opened for each event, so concurrent runs may share it """
+        if self.log_file is None:
+            return
+        record = {"time": datetime.now(timezone.utc).isoformat(timespec = 'milliseconds'), "event": event, "command": self.command}
+        record.update(fields)
+        line = json.dumps(record, default = str)
+        with self.lock:
+            with open(self.log_file, "a") as f:
+                f.write(f'{line}\n')
+
+    def record_stage(self, stage, outcome, seconds, command=None, **fields):
+        """ Records the duration and outcome of a stage, and the VMs and request bytes counted in it """
+        command = command or self.command
+        self.observe('sizer_stage_duration_seconds', seconds, command = command, stage = stage, outcome = outcome)
+        if fields.get('vms') is not None:
+            self.set('sizer_inventory_vms', fields['vms'], command = command, stage = stage)
+        if fields.get('request_bytes') is not None:
+            self.set('sizer_request_bytes', fields['request_bytes'], command = command)
+        self.event('stage', command = command, stage = stage, outcome = outcome, seconds = round(seconds, 4), **fields)
+
+    @contextmanager
+    def stage(self, stage, **fields):
+        """ Times a stage of the current run; the fields given, and any added to the dictionary yielded, are recorded with it """
+        context = dict(fields)
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield context
+            outcome = 'ok'
+        finally:
+            self.record_stage(stage, outcome, time.perf_counter() - started, **context)
+
+    @contextmanager
+    def run(self, command):
+        """ Times a run of a command, and writes the Prometheus textfile when it ends; a run ending in sys.exit(0) succeeded """
+        self.command = command
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            yield
+            outcome = 'ok'
+        except SystemExit as e:
+            if e.code in [0, None]:
+                outcome = 'ok'
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            self.inc('sizer_runs_total', command = command, outcome = outcome)
+            self.observe('sizer_run_duration_seconds', seconds, command = command, outcome = outcome)
+            self.event('run', outcome = outcome, seconds = round(seconds, 4), pid = os.getpid())
+            if self.prometheus_file is not None:
+                self.write_prometheus(self.prometheus_file)
+
+    def count_vms(self, stage, vms):
+        self.set('sizer_inventory_vms', vms, command = self.command, stage = stage)
+
+    def cache_lookup(self, cache, hit):
+        result = 'hit' if hit else 'miss'
+        self.inc('sizer_cache_lookups_total', cache = cache, result = result)
+        self.event('cache', cache = cache, result = result)
+
+    def sizer_call(self, endpoint, status, seconds, request_bytes, response_bytes):
+        """ Records one call to the Sizer API; status is the status code, or 'error' if no response was received """
+        self.observe('sizer_http_request_duration_seconds', seconds, endpoint = endpoint, status = str(status))
+        self.inc('sizer_http_request_bytes_total', request_bytes, endpoint = endpoint)
+        self.inc('sizer_http_response_bytes_total', response_bytes, endpoint = endpoint)
+        self.event('sizer_call', endpoint = endpoint, status = status, seconds = round(seconds, 4), request_bytes = request_bytes, response_bytes = response_bytes)
+
+    def prometheus_text(self):
+        """ The metrics in the Prometheus text exposition format """
+        with self.lock:
+            values = sorted(self.values.items(), key = lambda item: item[0])
+            values = [(key, [list(value[0]), value[1], value[2]] if isinstance(value, list) else value) for key, value in values]
+
+        def label_text(labels):
+            if len(labels) == 0:
+                return ''
+            escaped = [(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in labels]
+            return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+        lines = []
+        described = set()
+        for (name, labels), value in values:
+            metric_type, metric_help = METRICS[name]
+            if name not in described:
+                lines.append(f'# HELP {name} {metric_help}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                described.add(name)
+            if metric_type == 'histogram':
+                buckets, total, count = value
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{label_text(labels + (("le", bound),))} {bucket_count}')
+                lines.append(f'{name}_bucket{label_text(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{label_text(labels)} {total}')
+                lines.append(f'{name}_count{label_text(labels)} {count}')
+            else:
+                lines.append(f'{name}{label_text(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, file_path):
+        """ Writes the metrics for the node_exporter textfile collector - to a temporary file first, so it never reads a partial file """
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok = True)
+        with open(f'{file_path}.{os.getpid()}.tmp', "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(f'{file_path}.{os.getpid()}.tmp', file_path)
+
+
+def get_sizing_metrics():
+    """ Returns the metrics and log shared by the whole process """
+    global sizing_metrics
+    with sizing_metrics_lock:
+        if sizing_metrics is None:
+            sizing_metrics = SizingMetrics()
+        return sizing_metrics
+
+
+def log(level, message, **fields):
+    """ Shows a message at the given level (debug, info, warning or error) - see SizingMetrics.log """
+    get_sizing_metrics().log(level, message, **fields)
+
+
+@contextmanager
+def log_to(sink):
+    """ Shows the messages logged in this context - this thread, and the workers it starts with in_context - in sink rather than on the terminal """
+    token = log_sink.set(sink)
+    try:
+        yield sink
+    finally:
+        log_sink.reset(token)
+
+
+def in_context(function):
+    """ Wraps a function to run in a copy of the caller's context, so a worker thread logs where its caller does """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(function, *args, **kwargs)
+
+
+def payload_bytes(data):
+    """ The size of a request body, in bytes - a string, bytes, an open file or a MultipartFileUpload """
+    if data is None:
+        return 0
+    if isinstance(data, str):
+        return len(data.encode())
+    if hasattr(data, 'fileno'):
+        return os.fstat(data.fileno()).st_size
+    return len(data)
@@ -11,6 +11,7 @@ import pandas as pd
 from pandas import json_normalize
 from prettytable import PrettyTable
 import time
+from sizer_metrics import log
 
 def generate_table(results):
     """Generates a 'prettytable' using a JSON payload; automatically uses the dictionary keys in the payload as column headers."""
@@ -87,6 +88,188 @@ def recommendation_transformer(json_data):
     return output_array
 
 
+def recommendation_merger(responses):
+    '''Combines the recommendations returned for several independently-sized requests into a single summary.'''
+    summary = []
+    breakup = []
+    vm_exceptions = []
+    limited_compat = []
+
+    for response in responses:
+        json_data = response['recommendation']
+        row = {k: v for k, v in response.items() if k != 'recommendation'}
+        if json_data is None:
+            row.update({"status": "failed", "clusters": 0, "hosts": 0})
+            summary.append(row)
+            continue
+
+        if json_data['sddcList'][0]['clusterList']['sazClusters'] is None:
+            cluster_type = 'mazClusters'
+        else:
+            cluster_type = 'sazClusters'
+
+        clusters = json_data['sddcList'][0]['clusterList'][cluster_type]['clusterInfoList']
+        row.update({"status": "ok", "clusters": len(clusters), "hosts": sum(len(cluster['hostList']) for cluster in clusters)})
+        summary.append(row)
+
+        for host_breakup in json_data['sddcList'][0]['clusterList'][cluster_type]['hostBreakupList']:
+            breakup.append(dict(host_breakup, request = response['request']))
+
+        # collect exceptions, tagging each with the request it came from
+        if 'vmExceptions' in json_data['sddcList'][0]:
+            for exception in json_data['sddcList'][0]['vmExceptions']['vmExceptionInfo'] or []:
+                vm_exceptions.append(dict(exception, request = response['request']))
+            for exception in json_data['sddcList'][0]['vmExceptions']['limitedHostCompatibility'] or []:
+                limited_compat.append(dict(exception, request = response['request']))
+
+    # total the numeric host breakup fields across all requests, by host type where available
+    if len(breakup) > 0:
+        breakup_df = pd.json_normalize(breakup)
+        if 'hostType' in breakup_df:
+            totals_df = breakup_df.groupby('hostType').sum(numeric_only=True)
+        else:
+            totals_df = breakup_df.sum(numeric_only=True).to_frame('total')
+    else:
+        totals_df = None
+
+    merged = {}
+    merged['summary'] = summary
+    merged['totals'] = totals_df
+    merged['vm_exceptions'] = vm_exceptions
+    merged['limited_compat'] = limited_compat
+    return merged
+
+
+def merged_terminal_output(**kwargs):
+    summary = kwargs['merged']['summary']
+    totals = kwargs['merged']['totals']
+    vm_exceptions = kwargs['merged']['vm_exceptions']
+    limited_compat = kwargs['merged']['limited_compat']
+
+    print()
+    print("Combined recommendation:")
+    print(generate_table(summary))
+    print(f'\nTotal clusters: {sum(row["clusters"] for row in summary)}')
+    print(f'Total hosts: {sum(row["hosts"] for row in summary)}')
+
+    if totals is not None:
+        print('\nHost breakup totals:\n')
+        print(totals)
+
+    if len(vm_exceptions) > 0:
+        print('\nVM exceptions:\n')
+        print(generate_table(vm_exceptions).get_string(fields=['request', 'vmName', 'exceptionReason', 'unsupportedResourceTypes', 'preferredHostType', 'chosenHostType']))
+    else:
+        print("\nThere are no VM exceptions.")
+
+    if len(limited_compat) > 0:
+        print('\nHost incompatibilities:\n')
+        print(generate_table(limited_compat).get_string(fields=['request', 'vmName', 'exceptionReason', 'unsupportedResourceTypes', 'preferredHostType', 'chosenHostType']))
+    else:
+        print("\nThere are no host incompatibilities.")
+
+    failed = [row['request'] for row in summary if row['status'] != "ok"]
+    if len(failed) > 0:
+        print(f'\nThe following requests failed and are not included in the totals: {failed}')
+
+
+def estimate_terminal_output(**kwargs):
+    estimate = kwargs['estimate']
+    preview_rows = kwargs['preview_rows']
+    elapsed = kwargs['elapsed']
+
+    print()
+    print(f'{len(estimate)} combination(s) of settings estimated in {elapsed * 1000:.1f} ms.')
+    print(f'Estimated hosts range from {estimate["hosts"].min()} to {estimate["hosts"].max()} across {estimate["clusters"].iloc[0]} cluster(s).')
+    print(f'\nLowest {min(preview_rows, len(estimate))} estimate(s):\n')
+    columns = ['host_type', 'cluster_type', 'percent_cpu', 'percent_memory', 'data_protection', 'storage_capacity', 'cpu_hosts', 'memory_hosts', 'storage_hosts', 'hosts', 'outliers']
+    print(estimate.sort_values('hosts', kind='stable').head(preview_rows)[columns].to_string(index=False))
+    print()
+    print("These are lower bounds computed locally - submit the settings of interest to the sizer for a recommendation.")
+
+
+def outlier_terminal_output(**kwargs):
+    outliers = kwargs['outliers']
+    vm_data_df = kwargs['vm_data_df']
+    host_type = kwargs['host_type']
+    preview_rows = kwargs['preview_rows']
+
+    counts = (outliers != '').sum()
+    if counts.sum() == 0:
+        return
+    log('info', "\nProbable outlier VMs by host type: " + ', '.join(f'{host}: {count}' for host, count in counts.items()))
+    flagged = outliers[host_type] != ''
+    if flagged.any():
+        preview = vm_data_df.loc[flagged[flagged].index].filter(items = ['vmName', 'cluster', 'vCpu', 'vRam', 'vmdkUsed', 'vmdkTotal'], axis = 1)
+        preview['exceeds'] = outliers.loc[preview.index, host_type]
+        log('info', f'\n{int(flagged.sum())} VM(s) will probably be reported as outliers on {host_type} hosts:\n')
+        log('info', preview.head(preview_rows).to_string(index=False))
+
+
+def sweep_terminal_output(**kwargs):
+    sweep = kwargs['sweep']
+    variants = kwargs['variants']
+
+    # only the settings that were varied are shown
+    varied = [column for column in variants.columns if variants[column].nunique() > 1]
+    columns = varied + ['status', 'clusters', 'hosts', 'estimate', 'latency (s)', 'cached']
+
+    print()
+    print("Host counts by settings:\n")
+    print(sweep[columns].to_string(index=False))
+    print(f'\n{int(sweep["cached"].sum())} of {len(sweep)} result(s) were reused from earlier sweeps; estimate is the local lower bound.')
+
+
+def limiter_terminal_output(**kwargs):
+    metrics = kwargs['metrics']
+
+    # only worth a mention if the Sizer pushed back
+    if metrics['throttled'] > 0 or metrics['decreases'] > 0:
+        print(f'\nThe Sizer throttled {metrics["throttled"]} of {metrics["requests"]} request(s) ({metrics["retries"]} retried); concurrency was reduced {metrics["decreases"]} time(s), to {metrics["limit"]} request(s) at a time.')
+
+
+def inventory_diff_terminal_output(**kwargs):
+    changes = kwargs['diff']['changes']
+    clusters = kwargs['diff']['clusters']
+    summary = kwargs['diff']['summary']
+    preview_rows = kwargs['preview_rows']
+    elapsed = kwargs['elapsed']
+
+    print()
+    print(f'Inventories compared on {summary["key"]} in {elapsed:.2f} s: {summary["added"]} VM(s) added, {summary["removed"]} removed, {summary["resized"]} resized and {summary["unchanged"]} unchanged; {summary["moved"]} moved to another cluster.')
+    for side, count in summary['repeated_keys'].items():
+        if count > 0:
+            print(f'{count} VM(s) in the {side} inventory repeat an earlier key and were not compared - consider --dedup or --diff_key.')
+
+    print('\nTotals:\n')
+    print(pd.DataFrame(summary['totals']).T[['old', 'new', 'delta']])
+
+    if clusters is not None and len(clusters) > 0:
+        print('\nChanges by cluster:\n')
+        print(clusters.to_string())
+
+    columns = [column for column in ['vmName', 'cluster_old', 'cluster_new'] if column in changes]
+    for change in ['added', 'removed', 'resized', 'moved']:
+        changed = changes[changes['moved']] if change == 'moved' else changes[changes['change'] == change]
+        if len(changed) > 0:
+            print(f'\n{change.capitalize()} VMs (first {min(preview_rows, len(changed))} of {len(changed)}):\n')
+            print(changed.head(preview_rows)[columns + ['vCpu_delta', 'vRam_delta', 'vmdkUsed_delta', 'vmdkTotal_delta']].to_string(index=False))
+
+
+def recommendation_diff_terminal_output(**kwargs):
+    clusters = kwargs['diff']['clusters']
+    breakup = kwargs['diff']['breakup']
+    summary = kwargs['diff']['summary']
+
+    print()
+    print("Recommendations compared:\n")
+    print(pd.DataFrame(summary).T[['old', 'new', 'delta']])
+    print('\nHosts and VMs by cluster and host type:\n')
+    print(clusters.to_string(index=False))
+    print('\nHost breakup:\n')
+    print(breakup)
+
+
 def csv_output(**kwargs):
     print()
     print("enabled in a future release.")
@@ -97,10 +280,10 @@ def excel_output(**kwargs):
     print("enabled in a future release.")
 
 
-def pdf_output(pdf_content):
+def pdf_output(pdf_content, output_path='output/'):
     timestr = time.strftime("%Y%m%d-%H%M%S")
     file_name = f'VMC_Sizer_report_{timestr}.pdf'
-    with open(f'output/{file_name}', 'wb') as f:
+    with open(f'{output_path}{file_name}', 'wb') as f:
         f.write(pdf_content)
     return file_name
 
@@ -161,5 +344,7 @@ def terminal_output(**kwargs):
     if logs is True:
         print(calcs)
     
-    print("\nAll output files are saved in the '/output' directory.")
+    # the library API renders without writing any files
+    if kwargs.get('output_path') is not None:
+        print(f"\nAll output files are saved in the '{kwargs['output_path']}' directory.")
 
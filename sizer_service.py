@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - sizing service module
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import json
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from sizer_json import get_sizer_limiter, parse_excel_api, get_recommendation_api
+from data_transform import inventory_signature, lova_inventory, rvtools_inventory, inventory_summary
+from sizer_api import SIZING_DEFAULTS, CUSTOM_DEFAULTS, InventoryError, SizingInputError, SizingHooks, MetricsHook, custom_request
+from sizer_metrics import get_sizing_metrics, log
+
+
+class LRUCache:
+    '''A thread-safe, size-bounded cache; the least recently used entry is evicted first.'''
+    def __init__(self, max_size, name):
+        self.max_size = max_size
+        self.name = name
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        # callers hold self.lock
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def count_lookup(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        get_sizing_metrics().cache_lookup(self.name, hit)
+
+    def get_or_create(self, key, factory):
+        '''Returns (value, hit) for key, calling factory to create the value on a miss; concurrent misses for the same key create it only once,
+        and a value created by another caller while this one waited counts as a hit.'''
+        with self.lock:
+            value = self.lookup(key)
+            if value is None:
+                # the per-key lock is kept while any caller holds or waits for it
+                key_lock = self.key_locks.setdefault(key, [threading.Lock(), 0])
+                key_lock[1] += 1
+        if value is not None:
+            self.count_lookup(True)
+            return value, True
+
+        hit = False
+        try:
+            with key_lock[0]:
+                with self.lock:
+                    value = self.lookup(key)
+                hit = value is not None
+                if value is None:
+                    value = factory()
+                    if value is not None:
+                        with self.lock:
+                            self.entries[key] = value
+                            while len(self.entries) > self.max_size:
+                                self.entries.popitem(last = False)
+        finally:
+            with self.lock:
+                key_lock[1] -= 1
+                if key_lock[1] == 0:
+                    del self.key_locks[key]
+            self.count_lookup(hit)
+        return value, hit
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+class SizingService:
+    '''Keeps parsed inventories, adapter responses and recommendations in memory across requests.'''
+    def __init__(self, **kwargs):
+        self.input_path = kwargs['input_path']
+        self.inventories = LRUCache(kwargs['inventory_cache'], 'service_inventory')
+        self.responses = LRUCache(kwargs['response_cache'], 'service_response')
+        self.hooks = SizingHooks()
+        self.hooks.register(MetricsHook('serve'))
+
+    def request_params(self, params, defaults):
+        request_params = dict(defaults)
+        request_params.update(params)
+        if request_params.get('file_type') not in ['rv-tools', 'live-optics']:
+            raise ValueError("file_type must be either 'rv-tools' or 'live-optics'")
+        file_name = request_params.get('file_name')
+        if not isinstance(file_name, list) or len(file_name) == 0:
+            raise ValueError("file_name must be a list of one or more file names")
+        for file in file_name:
+            # only files in the service's input directory may be read
+            if file != os.path.basename(file) or not os.path.exists(f'{self.input_path}{file}'):
+                raise ValueError(f'{file} could not be found in {self.input_path}')
+        request_params['input_path'] = self.input_path
+        return request_params
+
+    def inventory(self, params):
+        '''Returns the parsed inventory for the requested files, parsing only if it is not already held in memory.'''
+        signature = inventory_signature(**params)
+        key = (params['file_type'], signature)
+        match params['file_type']:
+            case 'live-optics':
+                factory = lambda: lova_inventory(input_path = params['input_path'], file_name = params['file_name'], dedup = params['dedup'])
+            case 'rv-tools':
+                factory = lambda: rvtools_inventory(input_path = params['input_path'], file_name = params['file_name'], dedup = params['dedup'])
+        inventory, hit = self.inventories.get_or_create(key, factory)
+        return inventory
+
+    def recommendation(self, sizer_request, vp):
+        '''Returns the recommendation for a sizerRequest, reusing an identical earlier response if one is cached.'''
+        key = hashlib.sha256(f'{vp}|{sizer_request}'.encode()).hexdigest()
+        json_raw, cached = self.responses.get_or_create(key, lambda: get_recommendation_api(vp = vp, json_data = sizer_request))
+        if json_raw is None:
+            raise RuntimeError("The Sizer did not return a recommendation.")
+        return {"cached": cached, "recommendation": json_raw}
+
+    def describe(self, params):
+        params = self.request_params(params, SIZING_DEFAULTS)
+        return inventory_summary(self.inventory(params))
+
+    def default(self, params):
+        params = self.request_params(params, SIZING_DEFAULTS)
+        key = ('adapter', params['file_type'], inventory_signature(**params))
+        vms_json, hit = self.responses.get_or_create(key, lambda: parse_excel_api(**params))
+        if vms_json is None:
+            raise RuntimeError("The Sizer could not parse the file.")
+        sizer_request = json.dumps(vms_json['response']['sizerRequest'])
+        return self.recommendation(sizer_request, params['vm_placement'])
+
+    def custom(self, params):
+        defaults = dict(SIZING_DEFAULTS, **CUSTOM_DEFAULTS)
+        params = self.request_params(params, defaults)
+
+        # filters return new frames, so the cached inventory is never modified
+        profiles, sizer_request = custom_request(self.inventory(params), params, self.hooks)
+        return self.recommendation(sizer_request, params['vm_placement'])
+
+    def status(self):
+        return {"inventories": self.inventories.stats(), "responses": self.responses.stats(), "sizer": get_sizer_limiter().metrics()}
+
+
+class SizingRequestHandler(BaseHTTPRequestHandler):
+    '''Routes JSON requests to the sizing service; each request is handled on its own thread.'''
+    def send_json(self, code, body):
+        content = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == '/status':
+            self.send_json(200, self.server.service.status())
+        elif self.path == '/metrics':
+            content = get_sizing_metrics().prometheus_text().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        else:
+            self.send_json(404, {"error": f'{self.path} not found'})
+
+    def do_POST(self):
+        service = self.server.service
+        routes = {"/describe": service.describe, "/default": service.default, "/custom": service.custom}
+        if self.path not in routes:
+            self.send_json(404, {"error": f'{self.path} not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params = json.loads(self.rfile.read(length) or b'{}')
+            self.send_json(200, routes[self.path](params))
+        except InventoryError as e:
+            self.send_json(400, {"error": str(e), "issues": json.loads(e.issues.to_json(orient = 'records'))})
+        except (ValueError, KeyError, SizingInputError) as e:
+            self.send_json(400, {"error": str(e)})
+        except RuntimeError as e:
+            self.send_json(502, {"error": str(e)})
+        except SystemExit:
+            # the shared data functions exit on unrecoverable input errors
+            self.send_json(400, {"error": "The request could not be processed - please check the parameters."})
+        except Exception as e:
+            self.send_json(500, {"error": f'{type(e).__name__}: {e}'})
+
+
+def run_service(**kwargs):
+    host = kwargs['host']
+    port = kwargs['port']
+
+    server = ThreadingHTTPServer((host, port), SizingRequestHandler)
+    server.service = SizingService(**kwargs)
+
+    log('info', f'Sizing service listening on http://{host}:{port} - POST /describe, /default or /custom; GET /status or /metrics.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log('info', "Shutting down sizing service.")
+    finally:
+        server.server_close()
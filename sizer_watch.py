@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - input watch module
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import os
+import hashlib
+import pandas as pd
+from data_transform import lova_inventory, rvtools_inventory, dedup_workloads, input_files
+
+
+class InventoryWatcher:
+    '''Keeps the normalized inventory of each input file in memory, re-parsing only the files whose content has changed.
+
+    Files are joined to their detail sheets one file at a time, so the combined inventory is the per-file inventories
+    concatenated in file order - the same frame rvtools_inventory / lova_inventory build from all the files at once.'''
+    def __init__(self, **kwargs):
+        self.input_path = kwargs['input_path']
+        self.file_name = kwargs['file_name']
+        self.file_type = kwargs['file_type']
+        self.files = {}
+        self.last_seen = {}
+
+    def file_stat(self, file):
+        # a directory of csv exports is stat-ed file by file
+        stats = []
+        try:
+            for path in input_files(f'{self.input_path}{file}'):
+                stat = os.stat(path)
+                stats.append((path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            return None
+        return tuple(stats)
+
+    def file_digest(self, file):
+        digest = hashlib.sha256()
+        for path in input_files(f'{self.input_path}{file}'):
+            digest.update(os.path.basename(path).encode())
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def changed_files(self):
+        '''Returns the files to re-parse: files not parsed yet, and files whose content hash differs from the one parsed.
+
+        A file replaced since the last check is only hashed once its size and modification time have stopped changing,
+        so a workbook still being copied into the input directory is not read half-written.'''
+        changed = []
+        for file in self.file_name:
+            stat = self.file_stat(file)
+            seen = self.last_seen.get(file)
+            self.last_seen[file] = stat
+            cached = self.files.get(file)
+            if stat is None or (cached is not None and cached['stat'] == stat):
+                continue
+            if cached is not None and stat != seen:
+                continue
+            digest = self.file_digest(file)
+            if cached is not None and cached['digest'] == digest:
+                # touched or copied again with the same content
+                cached['stat'] = stat
+                continue
+            changed.append((file, stat, digest))
+        return changed
+
+    def refresh(self):
+        '''Re-parses the changed files; returns the names of the files parsed.'''
+        parsed = []
+        for file, stat, digest in self.changed_files():
+            match self.file_type:
+                case 'live-optics':
+                    inventory = lova_inventory(input_path = self.input_path, file_name = [file])
+                case 'rv-tools':
+                    inventory = rvtools_inventory(input_path = self.input_path, file_name = [file])
+            self.files[file] = {"stat": stat, "digest": digest, "inventory": inventory}
+            parsed.append(file)
+        return parsed
+
+    def ready(self):
+        return all(file in self.files for file in self.file_name)
+
+    def inventory(self, dedup=None, output_path=None):
+        '''Combines the cached per-file inventories, removing duplicates across files if desired.'''
+        vm_data_df = pd.concat([self.files[file]['inventory'] for file in self.file_name], axis=0, ignore_index=True)
+        if dedup is not None:
+            vm_data_df = dedup_workloads(vmdata_df = vm_data_df, dedup_key = dedup, output_path = output_path).reset_index(drop = True)
+        return vm_data_df
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - test configuration
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import os
+import sys
+
+# the modules live at the top of the repository, beside sizer-cli.py; the mock Sizer and the inventory generator in bench/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench'))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - access token tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import os
+import stat
+import requests
+from requests.adapters import BaseAdapter
+import sizer_json
+from sizer_json import AccessTokenManager, sizer_post, get_recommendation_api
+
+
+class TokenCheckingAdapter(BaseAdapter):
+    """ Answers 401 to any token the CSP has not issued, or has revoked """
+    def __init__(self, issued, revoked):
+        super().__init__()
+        self.issued = issued
+        self.revoked = revoked
+        self.tokens_seen = []
+
+    def send(self, request, **kwargs):
+        token = request.headers['csp-auth-token']
+        self.tokens_seen.append(token)
+        response = requests.Response()
+        response.status_code = 200 if token in self.issued and token not in self.revoked else 401
+        response._content = b'{}'
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def sizer_session(monkeypatch, revoke_all=False):
+    issued = []
+    revoked = set()
+
+    def access_token_response(refresh_token):
+        issued.append(f'token-{len(issued) + 1}')
+        if revoke_all is True:
+            revoked.add(issued[-1])
+        return {"access_token": issued[-1], "expires_in": 1800}
+
+    monkeypatch.setattr(sizer_json, 'get_access_token_response_api', access_token_response)
+    session = requests.Session()
+    adapter = TokenCheckingAdapter(issued, revoked)
+    session.mount('https://', adapter)
+    session.auth = AccessTokenManager('refresh-token')
+    monkeypatch.setattr(sizer_json, 'get_sizer_session', lambda: session)
+    return session, adapter
+
+
+def test_rejected_token_is_refreshed_once(monkeypatch):
+    session, adapter = sizer_session(monkeypatch)
+    # the CSP revokes the token before it expires
+    adapter.revoked.add(session.auth.token())
+
+    response = sizer_post('https://sizer.example/api', data = '{}')
+    assert response.status_code == 200
+    assert adapter.tokens_seen == ['token-1', 'token-2']
+    assert session.auth.refresh_count == 2
+
+
+def test_token_rejected_twice_is_not_retried_again(monkeypatch):
+    session, adapter = sizer_session(monkeypatch, revoke_all=True)
+
+    response = sizer_post('https://sizer.example/api', data = '{}')
+    assert response.status_code == 401
+    assert adapter.tokens_seen == ['token-1', 'token-2']
+
+
+def test_token_replaced_by_another_caller_is_kept(monkeypatch):
+    session, adapter = sizer_session(monkeypatch)
+    session.auth.token()
+    session.auth.invalidate('token-0')
+    assert session.auth.access_token == 'token-1'
+    session.auth.invalidate('token-1')
+    assert session.auth.access_token is None
+
+
+def test_cache_file_is_replaced_whole_and_private(tmp_path, monkeypatch):
+    cache_file = tmp_path / 'token_cache.json'
+    cache_file.write_text('{}')
+    os.chmod(cache_file, 0o644)
+    session, adapter = sizer_session(monkeypatch)
+    token_manager = AccessTokenManager('refresh-token', str(cache_file))
+    token_manager.token()
+
+    assert stat.S_IMODE(os.stat(cache_file).st_mode) == 0o600
+    assert os.listdir(tmp_path) == ['token_cache.json']
+    assert AccessTokenManager('refresh-token', str(cache_file)).access_token == 'token-1'
+
+
+def test_refused_refresh_token_fails_the_call_without_raising(monkeypatch):
+    session, adapter = sizer_session(monkeypatch)
+    monkeypatch.setattr(sizer_json, 'get_access_token_response_api', lambda refresh_token: None)
+
+    assert sizer_post('https://sizer.example/api', data = '{}') is None
+    assert get_recommendation_api(vp = False, json_data = '{}') is None
+    assert adapter.tokens_seen == []
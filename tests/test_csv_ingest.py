@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - per-tab csv export tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import gzip
+import os
+import zipfile
+import numpy as np
+import pandas as pd
+import pytest
+from data_transform import rvtools_inventory, lova_inventory, read_sheet, sheet_chunks
+from generate_inventory import rvtools_workbook, liveoptics_workbook
+
+# each tab, the name of its csv export, and a column left empty in some rows
+TABS = {
+    "rv-tools": [('vInfo', 'RVTools_tabvInfo.csv', 'OS according to the VMware Tools'), ('vDisk', 'RVTools_tabvDisk.csv', 'Capacity MiB'), ('vPartition', 'RVTools_tabvPartition.csv', 'Consumed MiB')],
+    "live-optics": [('VMs', 'VMs.csv', 'VM OS'), ('VM Performance', 'VM Performance.csv', 'Avg Read IOPS')]
+    }
+
+
+def exports(path, file_type):
+    '''Writes a workbook with empty cells, and its tabs as csv exports in each of the forms accepted; returns the file names.'''
+    match file_type:
+        case 'rv-tools':
+            rvtools_workbook(os.path.join(path, 'export.xlsx'), 25)
+        case 'live-optics':
+            liveoptics_workbook(os.path.join(path, 'export.xlsx'), 25)
+    tabs = pd.read_excel(os.path.join(path, 'export.xlsx'), sheet_name = None)
+    for tab, csv_name, column in TABS[file_type]:
+        tabs[tab][column] = tabs[tab][column].astype(object)
+        tabs[tab].loc[[2, 7], column] = np.nan
+    with pd.ExcelWriter(os.path.join(path, 'export.xlsx')) as writer:
+        for tab, tab_df in tabs.items():
+            tab_df.to_excel(writer, sheet_name = tab, index = False)
+
+    os.makedirs(os.path.join(path, 'csv'))
+    os.makedirs(os.path.join(path, 'gzip'))
+    with zipfile.ZipFile(os.path.join(path, 'bundle.zip'), "w") as bundle, zipfile.ZipFile(os.path.join(path, 'gzip_bundle.zip'), "w") as gzip_bundle:
+        for tab, csv_name, column in TABS[file_type]:
+            text = tabs[tab].to_csv(index = False)
+            with open(os.path.join(path, 'csv', csv_name), "w") as f:
+                f.write(text)
+            with gzip.open(os.path.join(path, 'gzip', f'{csv_name}.gz'), "wt") as f:
+                f.write(text)
+            bundle.writestr(f'export/{csv_name}', text)
+            gzip_bundle.writestr(f'{csv_name}.gz', gzip.compress(text.encode()))
+    return ['csv', 'gzip', 'bundle.zip', 'gzip_bundle.zip']
+
+
+def inventory(path, file_type, file):
+    match file_type:
+        case 'rv-tools':
+            vm_data_df = rvtools_inventory(input_path = f'{path}{os.sep}', file_name = [file])
+        case 'live-optics':
+            vm_data_df = lova_inventory(input_path = f'{path}{os.sep}', file_name = [file])
+    return vm_data_df.assign(sourceFile = 'export')
+
+
+@pytest.mark.parametrize('file_type', ['rv-tools', 'live-optics'])
+def test_csv_exports_match_the_workbook(tmp_path, file_type):
+    csv_forms = exports(str(tmp_path), file_type)
+    workbook = inventory(str(tmp_path), file_type, 'export.xlsx')
+    assert workbook['os'].eq('none specified').sum() == 2
+
+    for form in csv_forms:
+        # csv columns are read as float64 where the workbook gives int64
+        pd.testing.assert_frame_equal(inventory(str(tmp_path), file_type, form), workbook, check_dtype = False, obj = form)
+
+
+def test_csv_export_read_in_chunks(tmp_path):
+    exports(str(tmp_path), 'rv-tools')
+    for form in ['gzip', 'bundle.zip']:
+        whole = read_sheet(str(tmp_path / form), 'vInfo')
+        chunks = list(sheet_chunks(str(tmp_path / form), 'vInfo', 10))
+        assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index = True), whole)
+
+
+def test_missing_tab_exits(tmp_path):
+    exports(str(tmp_path), 'rv-tools')
+    os.remove(tmp_path / 'csv' / 'RVTools_tabvDisk.csv')
+    with pytest.raises(SystemExit):
+        read_sheet(str(tmp_path / 'csv'), 'vDisk')
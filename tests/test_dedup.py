@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - duplicate VM tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import pandas as pd
+import pytest
+from data_transform import dedup_workloads, resolve_dedup_key
+
+
+def two_exports():
+    # vm-1 on vc1 is exported twice; vm-1 on vc2 is a different VM with the same vmId
+    return pd.DataFrame({
+        "vmId": ['vm-1', 'vm-2', 'vm-1', 'vm-1', 'vm-3'],
+        "vCenter": ['vc1', 'vc1', 'vc1', 'vc2', 'vc1'],
+        "vmName": ['app', 'db', 'app', 'app', 'db'],
+        "sourceFile": ['rv1.xlsx', 'rv1.xlsx', 'rv2.xlsx', 'rv2.xlsx', 'rv2.xlsx']
+        })
+
+
+def test_default_key_is_vmid_per_vcenter(tmp_path):
+    vmdata_df = two_exports()
+    assert resolve_dedup_key(vmdata_df, []) == ['vmId', 'vCenter']
+    assert resolve_dedup_key(vmdata_df.drop(columns = 'vCenter'), []) == ['vmId', 'vmName']
+
+    deduped = dedup_workloads(vmdata_df = vmdata_df, dedup_key = [], output_path = f'{tmp_path}/')
+    assert deduped.index.tolist() == [0, 1, 3, 4]
+
+    removed = pd.read_csv(tmp_path / '0_duplicate_vms.csv', index_col = 0)
+    assert removed.index.tolist() == [2]
+    assert removed['sourceFile'].tolist() == ['rv2.xlsx']
+
+
+def test_custom_key(tmp_path):
+    deduped = dedup_workloads(vmdata_df = two_exports(), dedup_key = ['vmName'], output_path = None)
+    assert deduped['vmName'].tolist() == ['app', 'db']
+    assert deduped['sourceFile'].tolist() == ['rv1.xlsx', 'rv1.xlsx']
+
+
+def test_duplicate_count_is_reported(capsys):
+    dedup_workloads(vmdata_df = two_exports(), dedup_key = ['vmName'], output_path = None)
+    out = capsys.readouterr().out
+    assert '3 duplicate VM(s) collapsed' in out
+    assert 'rv2.xlsx    3' in out
+
+    dedup_workloads(vmdata_df = two_exports().iloc[:2], dedup_key = [], output_path = None)
+    assert 'No duplicate VMs found.' in capsys.readouterr().out
+
+
+def test_missing_key_field_exits():
+    with pytest.raises(SystemExit):
+        resolve_dedup_key(two_exports(), ['vmUuid'])
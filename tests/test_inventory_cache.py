@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - converted inventory cache tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import os
+import pandas as pd
+import pytest
+from data_transform import inventory_cache_current, read_inventory_cache, write_inventory_cache, lova_conversion
+from generate_inventory import liveoptics_workbook
+
+
+def cache_params(tmp_path, **kwargs):
+    return dict(output_path = f'{tmp_path}{os.sep}', csv_file = '1_vmdata_df_rvtools.csv', **kwargs)
+
+
+def test_cache_round_trip(tmp_path):
+    inventory = pd.DataFrame({"vmId": ['vm-1', 'vm-2'], "vCpu": [2, 4]})
+    write_inventory_cache(**cache_params(tmp_path, signature = 'a', inventory = inventory))
+    assert inventory_cache_current(**cache_params(tmp_path, signature = 'a'))
+    assert not inventory_cache_current(**cache_params(tmp_path, signature = 'b'))
+    assert read_inventory_cache(**cache_params(tmp_path)).equals(inventory)
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+
+def test_interrupted_write_is_not_a_hit(tmp_path, monkeypatch):
+    write_inventory_cache(**cache_params(tmp_path, signature = 'a', inventory = pd.DataFrame({"vmId": ['vm-1']})))
+
+    def interrupted(self, path, *args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(pd.DataFrame, 'to_pickle', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        write_inventory_cache(**cache_params(tmp_path, signature = 'b', inventory = pd.DataFrame({"vmId": ['vm-2']})))
+
+    # neither the old nor the new signature may now claim the cache
+    assert not inventory_cache_current(**cache_params(tmp_path, signature = 'a'))
+    assert not inventory_cache_current(**cache_params(tmp_path, signature = 'b'))
+
+
+def test_unreadable_pickle_is_a_miss(tmp_path):
+    write_inventory_cache(**cache_params(tmp_path, signature = 'a', inventory = pd.DataFrame({"vmId": ['vm-1']})))
+    with open(tmp_path / '1_vmdata_df_rvtools.csv.pkl', "wb") as f:
+        f.write(b'not a pickle')
+    assert read_inventory_cache(**cache_params(tmp_path)) is None
+
+
+def test_describe_and_custom_share_the_cache(tmp_path, capsys):
+    os.makedirs(tmp_path / 'input')
+    liveoptics_workbook(str(tmp_path / 'input' / 'liveoptics.xlsx'), 20)
+    params = dict(input_path = f'{tmp_path / "input"}{os.sep}', file_name = ['liveoptics.xlsx'], output_path = f'{tmp_path}{os.sep}', dedup = None)
+
+    # describe, then custom, then describe again: only the first parses the file
+    for run in range(3):
+        assert lova_conversion(**params) == '1_vmdata_df_lova.csv'
+        assert ('using cached inventory' in capsys.readouterr().out) is (run > 0)
+    assert 'ip_addresses' in read_inventory_cache(output_path = params['output_path'], csv_file = '1_vmdata_df_lova.csv')
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - inventory store tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import os
+import numpy as np
+import pandas as pd
+from inventory_store import InventoryStore
+
+
+def stored(store):
+    return pd.concat(store.read_chunks(2), axis=0)
+
+
+def test_round_trip(tmp_path):
+    store = InventoryStore(str(tmp_path))
+    store.append(pd.DataFrame({"vmId": ['vm-1', 'vm-2', None], "vCpu": [2, 4, np.nan]}), source='a.xlsx', signature='1')
+    result = stored(InventoryStore(str(tmp_path)))
+    assert result['vmId'].tolist()[:2] == ['vm-1', 'vm-2'] and pd.isna(result['vmId'].iloc[2])
+    assert result['vCpu'].tolist()[:2] == [2.0, 4.0]
+    assert store.sources == {"a.xlsx": '1'}
+
+
+def test_text_after_empty_column_is_kept(tmp_path):
+    # the first file has no cluster or vCenter, so pandas reads those columns as float64
+    store = InventoryStore(str(tmp_path))
+    store.append(pd.DataFrame({"vmId": ['vm-1', 'vm-2'], "cluster": [np.nan, np.nan], "vCenter": [np.nan, np.nan], "vCpu": [2, 4]}))
+    assert store.manifest['columns']['cluster'] == 'numeric'
+
+    store.append(pd.DataFrame({"vmId": ['vm-3', 'vm-4', 'vm-5'], "cluster": ['prod', None, 'dev'], "vCenter": ['vc1', 'vc1', 'vc2'], "vCpu": [1, 8, 2]}))
+    assert store.manifest['columns']['cluster'] == 'string'
+
+    result = stored(InventoryStore(str(tmp_path)))
+    assert len(result) == 5
+    assert result['cluster'].isna().tolist() == [True, True, False, True, False]
+    assert result['cluster'].dropna().tolist() == ['prod', 'dev']
+    assert result['vCenter'].dropna().tolist() == ['vc1', 'vc1', 'vc2']
+    assert result['vCpu'].tolist() == [2.0, 4.0, 1.0, 8.0, 2.0]
+
+
+def test_numbers_stored_before_promotion_are_kept(tmp_path):
+    store = InventoryStore(str(tmp_path))
+    store.append(pd.DataFrame({"vmId": [101, 102.5]}))
+    store.append(pd.DataFrame({"vmId": ['vm-3']}))
+    assert stored(store)['vmId'].tolist() == ['101', '102.5', 'vm-3']
+
+
+def test_interrupted_append_is_discarded(tmp_path, monkeypatch):
+    store = InventoryStore(str(tmp_path))
+    store.append(pd.DataFrame({"vmId": ['vm-1', 'vm-2'], "vCpu": [2, 4]}), source='a.xlsx', signature='1')
+    with open(store.column_file('dedup', 'keys'), "wb") as f:
+        np.arange(2, dtype=np.uint64).tofile(f)
+
+    # every column file is written, then the append stops before the manifest records it
+    def interrupted(self):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(InventoryStore, 'write_manifest', interrupted)
+    try:
+        store.append(pd.DataFrame({"vmId": ['vm-3-long-name'], "vCpu": [8]}), source='b.xlsx', signature='2')
+    except KeyboardInterrupt:
+        pass
+    with open(store.column_file('dedup', 'keys'), "ab") as f:
+        np.arange(1, dtype=np.uint64).tofile(f)
+    monkeypatch.undo()
+
+    store = InventoryStore(str(tmp_path))
+    assert len(store) == 2 and store.sources == {"a.xlsx": '1'}
+    assert os.path.getsize(store.column_file('vmId', 'data')) == len('vm-1vm-2')
+    assert os.path.getsize(store.column_file('dedup', 'keys')) == 2 * 8
+
+    store.append(pd.DataFrame({"vmId": ['vm-3'], "vCpu": [1]}), source='b.xlsx', signature='2')
+    result = stored(InventoryStore(str(tmp_path)))
+    assert result['vmId'].tolist() == ['vm-1', 'vm-2', 'vm-3']
+    assert result['vCpu'].tolist() == [2.0, 4.0, 1.0]
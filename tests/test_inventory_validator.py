@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - inventory validation tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import pandas as pd
+import pytest
+from data_transform import InventoryValidator, validate_workloads
+
+
+def inventory():
+    # vm-1 is exported twice, and vm-3 has a negative vCPU count
+    return pd.DataFrame({
+        "vmId": ['vm-1', 'vm-2', 'vm-3', 'vm-1'],
+        "vCenter": 'vc1',
+        "vmName": ['app', 'db', 'web', 'app'],
+        "sourceFile": ['rv1.xlsx', 'rv1.xlsx', 'rv1.xlsx', 'rv2.xlsx'],
+        "vCpu": [2, 4, -1, 2],
+        "vRam": 4096,
+        "vmdkTotal": 100.0,
+        "vmdkUsed": 50.0
+        })
+
+
+def test_duplicates_without_dedup_are_sized(tmp_path):
+    validator = InventoryValidator()
+    vm_data_df = inventory().drop(index = 2)
+    assert validator.check(vm_data_df) is vm_data_df
+    assert validator.report(f'{tmp_path}/') is True
+    assert validator.bad_vms == 0
+
+    issues = pd.read_csv(tmp_path / 'invalid_vms.csv')
+    assert issues[['row', 'vmId', 'problem']].values.tolist() == [[2, 'vm-1', 'duplicate vmId/vCenter']]
+
+
+def test_duplicates_under_the_dedup_key_stop_the_sizing():
+    validator = InventoryValidator(dedup_key = ['vmName'])
+    validator.check(inventory().drop(index = 2))
+    assert validator.report() is False
+    assert validator.issue_list()['problem'].tolist() == ['duplicate vmName']
+
+
+def test_quarantine_sets_aside_only_the_vms_with_problems(tmp_path):
+    validator = InventoryValidator(quarantine = True)
+    # the duplicate of vm-1 falls in the second chunk
+    sized = pd.concat([validator.check(inventory().iloc[:2]), validator.check(inventory().iloc[2:])])
+    assert validator.report(f'{tmp_path}/') is True
+    assert sized['vmId'].tolist() == ['vm-1', 'vm-2', 'vm-1']
+
+    quarantined = pd.read_csv(tmp_path / 'quarantined_vms.csv', index_col = 0)
+    assert quarantined.index.tolist() == [2]
+    assert quarantined['vmId'].tolist() == ['vm-3']
+    assert quarantined['vCpu'].tolist() == [-1]
+
+    issues = pd.read_csv(tmp_path / 'invalid_vms.csv')
+    assert issues[['row', 'field', 'problem']].values.tolist() == [[2, 'vCpu', 'negative'], [3, 'vmId', 'duplicate vmId/vCenter']]
+
+
+def test_nothing_left_to_size_after_quarantine():
+    validator = InventoryValidator(quarantine = True)
+    validator.check(inventory().iloc[[2]])
+    assert validator.report() is False
+
+
+def test_validation_exits_or_continues(tmp_path):
+    output_path = f'{tmp_path}/'
+    inventory().drop(index = 2).to_csv(tmp_path / 'inventory.csv')
+    params = {"output_path": output_path, "csv_file": 'inventory.csv', "quarantine": False, "cluster_profiles": False}
+
+    # duplicates only: sized as they stand, from the file as it was
+    assert validate_workloads(dedup = None, **params) == 'inventory.csv'
+    with pytest.raises(SystemExit):
+        validate_workloads(dedup = [], **params)
+
+    inventory().to_csv(tmp_path / 'inventory.csv')
+    with pytest.raises(SystemExit):
+        validate_workloads(dedup = None, **params)
+    params['quarantine'] = True
+    assert validate_workloads(dedup = None, **params) == '1_vmdata_df_validated.csv'
+    assert pd.read_csv(tmp_path / '1_vmdata_df_validated.csv', index_col = 0)['vmId'].tolist() == ['vm-1', 'vm-2', 'vm-1']
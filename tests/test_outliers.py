@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - outlier prediction tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import pandas as pd
+from sizer_estimate import predict_outliers, route_outliers
+
+HOST_TYPES = ['I3', 'I3EN', 'I4I']
+
+
+def inventory():
+    # the outlier limits, with the default configurations (75% of CPU threads and memory, 50% of usable vSAN capacity):
+    #   I3    33.75 vCPU, 384 GiB, 5973 GiB utilized
+    #   I3EN  45 vCPU,    576 GiB, 26404 GiB utilized
+    #   I4I   60 vCPU,    768 GiB, 11785 GiB utilized
+    return pd.DataFrame({
+        "vmName": ['small', 'wide', 'memory', 'disk', 'huge', 'edge'],
+        "vCpu": [4, 40, 8, 8, 70, 60.9],
+        "vRam": [16, 64, 600, 64, 800, 64],
+        "vmdkUsed": [100, 100, 100, 12000, 100, 100],
+        "vmdkTotal": [200, 200, 200, 12000, 30000, 200]
+        }, index = [10, 11, 12, 13, 14, 15])
+
+
+def test_outliers_by_host_type():
+    outliers = predict_outliers(inventory(), HOST_TYPES)
+    assert outliers.index.tolist() == [10, 11, 12, 13, 14, 15]
+    assert outliers.to_dict('list') == {
+        "I3": ['', 'cpu', 'memory', 'storage', 'cpu, memory', 'cpu'],
+        "I3EN": ['', '', 'memory', '', 'cpu, memory', 'cpu'],
+        # 60.9 vCPU is sent as 60, within the limit
+        "I4I": ['', '', '', 'storage', 'cpu, memory', '']
+        }
+
+
+def test_storage_limits_follow_the_storage_settings():
+    outliers = predict_outliers(inventory(), HOST_TYPES, storage_capacity = "PROVISIONED")
+    assert outliers.loc[14].tolist() == ['cpu, memory, storage', 'cpu, memory, storage', 'cpu, memory, storage']
+    outliers = predict_outliers(inventory(), HOST_TYPES, storage_type = "EXT_STORAGE_ONLY")
+    assert outliers.loc[13].tolist() == ['', '', '']
+    # RAID1 doubles the raw capacity written, against the 4/3 of RAID5 assumed for AUTO
+    outliers = predict_outliers(inventory().assign(vmdkUsed = 8000), ['I4I'], data_protection = "FTT1_RAID1")
+    assert (outliers['I4I'].str.contains('storage')).all()
+
+
+def test_outliers_routed_to_a_profile_of_their_own():
+    vm_data_df = inventory()
+    profiles = {
+        "5_cluster_a.csv": vm_data_df.loc[[10, 11, 12]],
+        "5_cluster_b.csv": vm_data_df.loc[[13, 14]],
+        "5_cluster_c.csv": vm_data_df.loc[[14, 15]]
+        }
+    flagged = predict_outliers(vm_data_df, HOST_TYPES)['I4I'] != ''
+    routed = route_outliers(profiles, flagged)
+
+    # a profile left with no VMs is dropped, and a VM in two profiles is sized once
+    assert {profile: profile_df.index.tolist() for profile, profile_df in routed.items()} == {
+        "5_cluster_a.csv": [10, 11, 12],
+        "5_cluster_c.csv": [15],
+        "5_outliers.csv": [13, 14]
+        }
+
+    # without outliers, the profiles are left as they are
+    routed = route_outliers(profiles, flagged & False)
+    assert list(routed) == list(profiles)
+    assert all(routed[profile].equals(profile_df) for profile, profile_df in profiles.items())
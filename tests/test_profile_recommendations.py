@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - per-profile sizing tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import json
+import os
+import random
+import time
+import sizer_fxns
+import sizer_json
+from sizer_fxns import get_profile_recommendations
+from mock_sizer import mock_recommendation
+
+
+def sizer_request(profiles):
+    workload_profiles = [{"profileName": f'{name}.csv', "vmList": [{"vmId": f'{name}-{count}'} for count in range(vms)]} for name, vms in profiles.items()]
+    return json.dumps({"configurations": {"cloudType": "VMC_ON_AWS", "sddcHostType": "I4I"}, "workloadProfiles": workload_profiles})
+
+
+def recommendation(vp, json_data):
+    # answers in a random order when called concurrently; one host per VM, and the 'broken' profile fails
+    time.sleep(random.uniform(0, 0.05))
+    profile = json.loads(json_data)['workloadProfiles'][0]
+    if profile['profileName'] == 'broken.csv':
+        return None
+    return mock_recommendation(hosts = len(profile['vmList']), host_type = "I3EN" if profile['profileName'].startswith('db') else "I4I")
+
+
+def sized(tmp_path, monkeypatch, workers):
+    merged = []
+    monkeypatch.setattr(sizer_json, 'get_recommendation_api', recommendation)
+    monkeypatch.setattr(sizer_fxns, 'merged_terminal_output', lambda **kwargs: merged.append(kwargs['merged']))
+    output_path = f'{tmp_path}{os.sep}workers_{workers}{os.sep}'
+    os.makedirs(output_path)
+    request = sizer_request({"web": 3, "db": 2, "broken": 1, "app": 5, "batch": 1, "dbarchive": 4})
+    get_profile_recommendations(sizer_request = request, vm_placement = False, workers = workers, output_path = output_path)
+
+    summary = [{k: v for k, v in row.items() if k != 'latency (s)'} for row in merged[0]['summary']]
+    saved = {}
+    for file in sorted(os.listdir(output_path)):
+        with open(f'{output_path}{file}', "r") as f:
+            saved[file] = json.load(f)
+    return summary, merged[0]['totals'], saved
+
+
+def test_parallel_and_serial_results_match(tmp_path, monkeypatch):
+    serial = sized(tmp_path, monkeypatch, 1)
+    parallel = sized(tmp_path, monkeypatch, 4)
+
+    assert parallel[0] == serial[0]
+    assert parallel[1].equals(serial[1])
+    assert parallel[2] == serial[2]
+
+    # results are reported in profile order, whatever order the Sizer answered in
+    assert [(row['request'], row['status'], row['hosts']) for row in serial[0]] == [('web.csv', 'ok', 3), ('db.csv', 'ok', 2), ('broken.csv', 'failed', 0), ('app.csv', 'ok', 5), ('batch.csv', 'ok', 1), ('dbarchive.csv', 'ok', 4)]
+    assert serial[1]['hostCount'].to_dict() == {"I3EN": 6, "I4I": 9}
+    assert sorted(serial[2]) == ['app_response.json', 'batch_response.json', 'db_response.json', 'dbarchive_response.json', 'web_response.json']
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - replayed request patching tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+from data_transform import payload_configurations, patch_recommendation_payload
+
+
+def saved_request(cloud_type, host_type='I3EN', cluster_type='MAZ'):
+    configurations = payload_configurations(cloud_type = cloud_type, host_type = host_type, cluster_type = cluster_type, pct_cpu = .3, pct_mem = 1, fttFtmType = 'AUTO_AUTO')
+    return {"configurations": configurations, "workloadProfiles": [{"profileName": 'all', "vmList": [{"vmId": 'vm-1'}]}]}
+
+
+def test_switching_to_gcve_clears_the_host_fields():
+    sizer_request = saved_request('VMC_ON_AWS')
+    assert patch_recommendation_payload(sizer_request = sizer_request, cloud_type = 'GCVE', host_type = 'I4I') is True
+    assert sizer_request == saved_request('GCVE')
+
+
+def test_switching_to_vmc_sets_the_host_fields():
+    sizer_request = saved_request('GCVE')
+    patch_recommendation_payload(sizer_request = sizer_request, cloud_type = 'VMC_ON_AWS')
+    assert sizer_request == saved_request('VMC_ON_AWS', 'I4I', 'SAZ')
+
+    sizer_request = saved_request('GCVE')
+    patch_recommendation_payload(sizer_request = sizer_request, cloud_type = 'VMC_ON_AWS', host_type = 'I3', cluster_type = 'MAZ')
+    assert sizer_request == saved_request('VMC_ON_AWS', 'I3', 'MAZ')
+
+
+def test_host_type_alone_is_not_added_to_gcve():
+    sizer_request = saved_request('GCVE')
+    assert patch_recommendation_payload(sizer_request = sizer_request, host_type = 'I3') is False
+    assert sizer_request == saved_request('GCVE')
+
+    sizer_request = saved_request('VMC_ON_AWS')
+    assert patch_recommendation_payload(sizer_request = sizer_request, host_type = 'I3', percent_cpu = .5) is True
+    assert sizer_request['configurations']['sddcHostType'] == 'I3'
+    assert sizer_request['configurations']['clusterType'] == 'MAZ'
+    assert sizer_request['configurations']['cpuUtilization'] == .5
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - sharded request tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import json
+from data_transform import shard_recommendation_payload
+from sizer_output import recommendation_merger
+from mock_sizer import mock_recommendation
+
+
+def sizer_request(profile_sizes):
+    profiles = []
+    for name, vms in profile_sizes.items():
+        profiles.append({"profileName": name, "isEnabled": True, "vmList": [{"vmId": f'{name}-{count}', "vmName": f'{name}{count}'} for count in range(vms)]})
+    return {"configurations": {"cloudType": "VMC_ON_AWS", "sddcHostType": "I4I"}, "workloadProfiles": profiles}
+
+
+def shards_of(request, shard_vms=None, shard_bytes=None):
+    return [json.loads(shard) for shard in shard_recommendation_payload(sizer_request = json.dumps(request), shard_vms = shard_vms, shard_bytes = shard_bytes)]
+
+
+def layout(shards):
+    return [[(profile['profileName'], len(profile['vmList'])) for profile in shard['workloadProfiles']] for shard in shards]
+
+
+def reassembled(shards):
+    return [vm for shard in shards for profile in shard['workloadProfiles'] for vm in profile['vmList']]
+
+
+def test_profiles_split_and_packed_by_vm_count():
+    request = sizer_request({"A": 7, "B": 2, "C": 3})
+    shards = shards_of(request, shard_vms = 3)
+    # a full part starts a new shard; the last part of A and all of B fit together
+    assert layout(shards) == [[('A_part1', 3)], [('A_part2', 3)], [('A_part3', 1), ('B', 2)], [('C', 3)]]
+    assert all(shard['configurations'] == request['configurations'] for shard in shards)
+    assert reassembled(shards) == reassembled([request])
+    assert shards[2]['workloadProfiles'][1]['isEnabled'] is True
+
+
+def test_profiles_split_by_bytes():
+    request = sizer_request({"A": 10, "B": 1})
+    vm_bytes = len(json.dumps(request['workloadProfiles'][0]['vmList'][0]))
+    shards = shards_of(request, shard_bytes = 4 * vm_bytes)
+    assert layout(shards) == [[('A_part1', 4)], [('A_part2', 4)], [('A_part3', 2), ('B', 1)]]
+    assert reassembled(shards) == reassembled([request])
+
+    # a VM larger than the limit is sent on its own rather than dropped
+    shards = shards_of(request, shard_bytes = vm_bytes // 2)
+    assert len(shards) == 11 and reassembled(shards) == reassembled([request])
+
+
+def test_request_under_the_limits_is_one_shard():
+    request = sizer_request({"A": 3, "B": 2})
+    shards = shards_of(request, shard_vms = 5)
+    assert shards == [request]
+
+
+def test_shard_recommendations_are_merged():
+    responses = [
+        {"request": 'shard_1', "recommendation": mock_recommendation(hosts = 3)},
+        {"request": 'shard_2', "recommendation": mock_recommendation(hosts = 2, host_type = "I3EN")},
+        {"request": 'shard_3', "recommendation": mock_recommendation(hosts = 4)},
+        {"request": 'shard_4', "recommendation": None}
+        ]
+    merged = recommendation_merger(responses)
+    assert [(row['request'], row['status'], row['hosts']) for row in merged['summary']] == [('shard_1', 'ok', 3), ('shard_2', 'ok', 2), ('shard_3', 'ok', 4), ('shard_4', 'failed', 0)]
+    assert merged['totals']['hostCount'].to_dict() == {"I3EN": 2, "I4I": 7}
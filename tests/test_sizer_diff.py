@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - inventory diff tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import numpy as np
+import pandas as pd
+from sizer_diff import inventory_diff
+
+
+def inventory(clusters, vcpu=(2, 4, 8)):
+    return pd.DataFrame({"vmId": ['vm-1', 'vm-2', 'vm-3'], "vmName": ['a', 'b', 'c'], "cluster": clusters, "vCpu": list(vcpu), "vRam": [4, 8, 16], "vmdkUsed": [10, 20, 30], "vmdkTotal": [20, 40, 60]})
+
+
+def test_identical_inventories_have_no_changes():
+    result = inventory_diff(inventory(['clA', 'clB', 'clA']), inventory(['clA', 'clB', 'clA']))
+    assert result['summary']['unchanged'] == 3 and result['summary']['moved'] == 0
+    assert len(result['changes']) == 0
+
+
+def test_vm_without_a_cluster_in_either_inventory_has_not_moved():
+    result = inventory_diff(inventory(['clA', np.nan, 'clA']), inventory(['clA', np.nan, 'clA']))
+    assert result['summary']['moved'] == 0 and result['summary']['unchanged'] == 3
+    assert len(result['changes']) == 0
+
+
+def test_cluster_move_and_resize_are_reported():
+    result = inventory_diff(inventory(['clA', np.nan, 'clA']), inventory(['clB', 'clB', 'clA'], vcpu = (2, 4, 12)))
+    changes = result['changes'].set_index('vmId')
+    assert result['summary']['moved'] == 2
+    assert changes.loc['vm-1', 'moved'] and changes.loc['vm-1', 'change'] == 'unchanged'
+    assert changes.loc['vm-2', 'moved']
+    assert changes.loc['vm-3', 'change'] == 'resized' and changes.loc['vm-3', 'vCpu_delta'] == 4
+    assert not changes.loc['vm-3', 'moved']
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - local estimate tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import pandas as pd
+from sizer_estimate import profile_totals, estimate_variants, estimate_hosts, sweep_values
+
+
+def profiles():
+    # values are sent as whole numbers, so the fractions are dropped before the totals
+    return profile_totals({
+        "large.csv": pd.DataFrame({"vCpu": [600, 400.9], "vRam": [12000, 8000], "vmdkUsed": [100000, 200000.5], "vmdkTotal": [200000, 400000]}),
+        "small.csv": pd.DataFrame({"vCpu": [4], "vRam": [16], "vmdkUsed": [10], "vmdkTotal": [20]}),
+        "empty.csv": pd.DataFrame({"vCpu": [], "vRam": [], "vmdkUsed": [], "vmdkTotal": []})
+        })
+
+
+def test_sweep_ranges_include_the_stop():
+    assert sweep_values(['.2:.4:.1', '1']) == [.2, .3, .4, 1.0]
+
+
+def test_host_counts_match_a_hand_computed_sizing():
+    variants = estimate_variants(cloud_type = 'VMC_ON_AWS', host_type = ['I4I', 'I3EN'], cluster_type = ['SAZ', 'MAZ'], percent_cpu = ['.3', '1'], percent_memory = ['1'], data_protection = ['AUTO_AUTO', 'FTT2_RAID6'], storage_capacity = ['UTILIZED', 'PROVISIONED'])
+    assert len(variants) == 32
+    estimate = estimate_hosts(profiles(), variants).set_index(['host_type', 'cluster_type', 'percent_cpu', 'data_protection', 'storage_capacity'])
+
+    # I4I (64 cores, 1024 GiB, 20.46 TiB), the default overcommit, headroom and data reduction settings:
+    #   large: CPU    1000 vCPU x .3 / (64 x 1.25 x .85) = 4.4 -> 5, and 1000 / (64 x 4) = 3.9 -> 4
+    #          memory 20000 GiB / 1.25 / 1024 = 15.6 -> 16
+    #          disk   300000 GiB / (1.25 x 1.5) x 4/3 / .8 / 1024 / 20.46 = 12.7 -> 13
+    #   small: 2, the smallest cluster
+    row = estimate.loc[('I4I', 'SAZ', .3, 'AUTO_AUTO', 'UTILIZED')]
+    assert (row['cpu_hosts'], row['memory_hosts'], row['storage_hosts'], row['hosts'], row['clusters']) == (5 + 1, 16 + 1, 13 + 1, 16 + 2, 2)
+
+    # I3EN (48 cores, 768 GiB, 45.84 TiB), stretched, FTT2 / RAID6, provisioned storage:
+    #   large: CPU    1000 / (48 x 1.25 x .85) = 19.6 -> 20
+    #          memory 20000 / 1.25 / 768 = 20.8 -> 21
+    #          disk   600000 / 1.875 x 1.5 / .8 / 1024 / 45.84 = 12.8 -> 13
+    #          21 hosts in each availability zone -> 42
+    #   small: 6 (RAID6) in each availability zone -> 12
+    row = estimate.loc[('I3EN', 'MAZ', 1.0, 'FTT2_RAID6', 'PROVISIONED')]
+    assert (row['cpu_hosts'], row['memory_hosts'], row['storage_hosts'], row['hosts']) == (20 + 1, 21 + 1, 13 + 1, 42 + 12)
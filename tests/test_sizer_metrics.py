@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - metrics and logging tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sizer_metrics import SizingMetrics, log, in_context
+from sizer_api import captured_output
+
+
+def test_messages_below_the_level_are_logged_but_not_shown(tmp_path, capsys):
+    metrics = SizingMetrics()
+    metrics.configure(log_level = 'warning', log_file = str(tmp_path / 'metrics.jsonl'))
+    metrics.log('debug', "detail")
+    metrics.log('info', "progress")
+    metrics.log('warning', "problem")
+    metrics.log('error', "failure")
+
+    shown = capsys.readouterr()
+    assert shown.out == ''
+    assert shown.err == "problem\nfailure\n"
+    with open(tmp_path / 'metrics.jsonl', "r") as f:
+        events = [json.loads(line) for line in f]
+    assert [(event['level'], event['message']) for event in events] == [('debug', "detail"), ('info', "progress"), ('warning', "problem"), ('error', "failure")]
+
+
+def test_quiet_sizings_collect_only_their_own_messages(capsys):
+    # two quiet sizings, each logging from its own thread and from workers it starts, while another thread logs as usual
+    both_started = threading.Barrier(3)
+    collected = {}
+
+    def sizing(name):
+        with captured_output(True) as messages:
+            both_started.wait()
+            log('info', f'{name} parsing')
+            with ThreadPoolExecutor(max_workers = 2) as executor:
+                list(executor.map(in_context(lambda part: log('warning', f'{name} part {part}')), [1, 2]))
+            both_started.wait()
+        collected[name] = sorted(messages.getvalue().splitlines())
+
+    threads = [threading.Thread(target = sizing, args = (name,)) for name in ['first', 'second']]
+    for thread in threads:
+        thread.start()
+    both_started.wait()
+    log('info', "service running")
+    both_started.wait()
+    for thread in threads:
+        thread.join()
+
+    assert collected == {name: [f'{name} parsing', f'{name} part 1', f'{name} part 2'] for name in ['first', 'second']}
+    shown = capsys.readouterr()
+    assert shown.out == "service running\n"
+    assert shown.err == ''
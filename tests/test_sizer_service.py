@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - sizing service tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+import requests
+from sizer_api import SizingError, SizingInputError
+from sizer_service import LRUCache, SizingRequestHandler
+
+
+def test_concurrent_misses_create_once_and_count_as_hits():
+    cache = LRUCache(4, 'test')
+    created = []
+    started = threading.Event()
+
+    def factory():
+        started.set()
+        created.append(1)
+        time.sleep(0.2)
+        return {"value": len(created)}
+
+    def lookup(_):
+        return cache.get_or_create('key', factory)
+
+    with ThreadPoolExecutor(max_workers = 6) as executor:
+        first = executor.submit(lookup, None)
+        started.wait()
+        # the others ask while the first is still creating the value
+        waiting = [executor.submit(lookup, None) for count in range(5)]
+        results = [first.result()] + [future.result() for future in waiting]
+
+    assert len(created) == 1
+    assert all(value == {"value": 1} for value, hit in results)
+    assert [hit for value, hit in results].count(True) == 5
+    assert cache.stats()['hits'] == 5 and cache.stats()['misses'] == 1
+    assert cache.key_locks == {}
+
+
+def test_failed_creation_is_tried_again():
+    cache = LRUCache(4, 'test')
+    assert cache.get_or_create('key', lambda: None) == (None, False)
+    assert cache.get_or_create('key', lambda: 'value') == ('value', False)
+    assert cache.get_or_create('key', lambda: 'other') == ('value', True)
+    assert cache.stats()['misses'] == 2 and cache.stats()['hits'] == 1
+    assert cache.key_locks == {}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(2, 'test')
+    cache.get_or_create('a', lambda: 1)
+    cache.get_or_create('b', lambda: 2)
+    cache.get_or_create('a', lambda: None)
+    cache.get_or_create('c', lambda: 3)
+    assert list(cache.entries) == ['a', 'c']
+
+
+class FailingService:
+    '''Raises whatever exception the request body names.'''
+    def custom(self, params):
+        raise {"input": SizingInputError("The filter stage could not be completed.", 'filter'),
+               "sizer": SizingError("The Sizer did not return a recommendation.", 'request'),
+               "exit": SystemExit(1),
+               "other": TypeError("unexpected")}[params['fail']]
+
+    describe = default = custom
+
+
+def test_errors_are_answered_with_a_status_and_a_json_body():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SizingRequestHandler)
+    server.service = FailingService()
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    try:
+        for fail, status in [("input", 400), ("sizer", 502), ("exit", 400), ("other", 500)]:
+            response = requests.post(f'http://127.0.0.1:{server.server_address[1]}/custom', json = {"fail": fail})
+            assert response.status_code == status
+            assert 'error' in response.json()
+    finally:
+        server.shutdown()
+        server.server_close()
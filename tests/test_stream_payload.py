@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - streamed sizing request tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from generate_inventory import rvtools_workbook, liveoptics_workbook
+
+MOCK_SIZER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench', 'mock_sizer.py')
+
+# cells left empty in each tab - (tab, column, rows) - and VMs missing from a tab altogether - (tab, rows)
+BLANKS = {
+    "rv-tools": {
+        "cells": [('vInfo', 'OS according to the VMware Tools', [1, 11]), ('vInfo', 'Cluster', [2]), ('vInfo', 'CPUs', [3]), ('vInfo', 'Powerstate', [4]), ('vInfo', 'In Use MiB', [5]), ('vDisk', 'Capacity MiB', [6, 7])],
+        "rows": [('vPartition', [8, 9])]
+        },
+    "live-optics": {
+        "cells": [('VMs', 'VM OS', [1, 11]), ('VMs', 'Cluster', [2]), ('VMs', 'Virtual CPU', [3]), ('VMs', 'Guest IP1', [4]), ('VMs', 'Virtual Disk Used (MiB)', [5]), ('VM Performance', 'Avg Read IOPS', [6])],
+        "rows": [('VM Performance', [8, 9])]
+        }
+    }
+
+
+def workbook_with_blanks(path, file_type, vms):
+    match file_type:
+        case 'rv-tools':
+            rvtools_workbook(path, vms)
+        case 'live-optics':
+            liveoptics_workbook(path, vms)
+    tabs = pd.read_excel(path, sheet_name = None)
+    for tab, column, rows in BLANKS[file_type]["cells"]:
+        tabs[tab][column] = tabs[tab][column].astype(object)
+        tabs[tab].loc[rows, column] = np.nan
+    for tab, rows in BLANKS[file_type]["rows"]:
+        tabs[tab] = tabs[tab].drop(index = rows)
+    with pd.ExcelWriter(path) as writer:
+        for tab, tab_df in tabs.items():
+            tab_df.to_excel(writer, sheet_name = tab, index = False)
+
+
+def sized_request(input_path, output_path, file_type, file_name, options):
+    args = [sys.executable, MOCK_SIZER, 'custom', '-ft', file_type, '-fn'] + file_name + ['-in', input_path, '-out', output_path, '-qr', '-dd', '-chunk', '7'] + options
+    result = subprocess.run(args, capture_output = True, text = True, env = dict(os.environ, MOCK_SIZER_LATENCY = '0'))
+    assert result.returncode == 0, result.stdout + result.stderr
+    with open(os.path.join(output_path, 'custom_recommendation_request.txt'), "r") as f:
+        return json.load(f)
+
+
+@pytest.mark.parametrize('file_type', ['rv-tools', 'live-optics'])
+@pytest.mark.parametrize('options', [['-wp', 'all_clusters', '-ps', 'p'], ['-exfil', 'name29', '-eff', 'vmName']])
+def test_streamed_request_matches_batch(tmp_path, file_type, options):
+    input_path = str(tmp_path / 'input')
+    os.makedirs(input_path)
+    workbook_with_blanks(os.path.join(input_path, 'first.xlsx'), file_type, 30)
+    workbook_with_blanks(os.path.join(input_path, 'second.xlsx'), file_type, 30)
+    file_name = ['first.xlsx', 'second.xlsx']
+
+    batch = sized_request(input_path, str(tmp_path / 'batch'), file_type, file_name, options)
+    streamed = sized_request(input_path, str(tmp_path / 'stream'), file_type, file_name, options + ['-stream'])
+    assert streamed == batch
+    assert sum(len(profile['vmList']) for profile in batch['workloadProfiles']) > 0
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+# VMware Cloud Sizer Companion CLI - concurrent workspace tests
+################################################################################
+### Copyright 2023 VMware, Inc.
+### SPDX-License-Identifier: MIT License
+################################################################################
+
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from generate_inventory import rvtools_workbook
+
+MOCK_SIZER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench', 'mock_sizer.py')
+
+# settings that each build a different sizing request from the same files
+VARIANTS = [
+    ['-wp', 'all_clusters'],
+    ['-ps', 'p'],
+    ['-ps', 'p', '-wp', 'all_clusters'],
+    ['-pct_cpu', '.5'],
+    ['-infil', 'clA', '-iff', 'cluster'],
+    ['-exfil', 'clB', '-eff', 'cluster', '-wp', 'all_clusters'],
+    ['-ht', 'I3EN']
+    ]
+
+
+def size(input_path, output_dir, variant, workspace):
+    args = [sys.executable, MOCK_SIZER, 'custom', '-ft', 'rv-tools', '-fn', 'rv1.xlsx', 'rv2.xlsx', '-dd', '-in', input_path, '-out', output_dir] + variant
+    if workspace is True:
+        args.append('-ws')
+    result = subprocess.run(args, capture_output = True, text = True, env = dict(os.environ, MOCK_SIZER_LATENCY = '0.05'))
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def saved_request(output_path):
+    with open(os.path.join(output_path, 'custom_recommendation_request.txt'), "r") as f:
+        return f.read()
+
+
+def test_concurrent_runs_stay_isolated(tmp_path):
+    input_path = str(tmp_path / 'input')
+    os.makedirs(input_path)
+    rvtools_workbook(os.path.join(input_path, 'rv1.xlsx'), 50)
+    rvtools_workbook(os.path.join(input_path, 'rv2.xlsx'), 50, start = 30, seed = 1)
+
+    # each variant sized alone, in an output directory of its own
+    expected = []
+    for count, variant in enumerate(VARIANTS):
+        size(input_path, str(tmp_path / f'alone_{count}'), variant, False)
+        expected.append(saved_request(str(tmp_path / f'alone_{count}')))
+    assert len(set(expected)) == len(VARIANTS)
+
+    # every variant sized twice at once, all sharing one output directory
+    shared = str(tmp_path / 'shared')
+    runs = VARIANTS * 2
+    with ThreadPoolExecutor(max_workers = len(runs)) as executor:
+        outputs = list(executor.map(lambda variant: size(input_path, shared, variant, True), runs))
+
+    workspaces = []
+    for count, output in enumerate(outputs):
+        workspace = [line for line in output.splitlines() if line.startswith('Output of this run is written to ')][0].split(' to ', 1)[1]
+        workspaces.append(workspace)
+        assert saved_request(workspace) == expected[count % len(VARIANTS)]
+    assert len(set(workspaces)) == len(runs)
+    assert sorted(os.listdir(os.path.join(shared, 'runs'))) == sorted(os.path.basename(os.path.normpath(workspace)) for workspace in workspaces)